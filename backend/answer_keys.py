@@ -0,0 +1,59 @@
+"""
+Answer Keys - compact, precompiled quiz answer keys
+Grades quiz submissions without parsing the full course document
+"""
+
+import json
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+
+class AnswerKey(NamedTuple):
+    correct_answers: Tuple[Any, ...]
+    questions: Tuple[str, ...]
+    explanations: Tuple[str, ...]
+
+    @classmethod
+    def from_course(cls, content: Dict[str, Any]) -> "AnswerKey":
+        """Extract the key from a generated course document"""
+        questions = content.get("quiz", {}).get("questions", [])
+        return cls(
+            correct_answers=tuple(question.get("correct_answer", -1) for question in questions),
+            questions=tuple(question.get("question", "") for question in questions),
+            explanations=tuple(question.get("explanation", "") for question in questions),
+        )
+
+    @classmethod
+    def from_json(cls, correct_answers: str, questions: str, explanations: str) -> "AnswerKey":
+        """Rebuild a key from its stored columns"""
+        return cls(tuple(json.loads(correct_answers)), tuple(json.loads(questions)), tuple(json.loads(explanations)))
+
+    def to_json(self) -> Tuple[str, str, str]:
+        """Serialize the key into its stored columns"""
+        return json.dumps(self.correct_answers), json.dumps(self.questions), json.dumps(self.explanations)
+
+
+def grade(key: AnswerKey, answers: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare submitted answers against the key in one pass"""
+    submitted = [answers.get(str(i), -1) for i in range(len(key.correct_answers))]
+    matches = [given == correct for given, correct in zip(submitted, key.correct_answers)]
+
+    total_questions = len(matches)
+    correct_answers = sum(matches)
+    results: List[Dict[str, Any]] = [
+        {
+            "question": question,
+            "user_answer": given,
+            "correct_answer": correct,
+            "is_correct": is_correct,
+            "explanation": explanation
+        }
+        for question, given, correct, is_correct, explanation
+        in zip(key.questions, submitted, key.correct_answers, matches, key.explanations)
+    ]
+
+    return {
+        "score": (correct_answers / total_questions) * 100 if total_questions > 0 else 0,
+        "correct_answers": correct_answers,
+        "total_questions": total_questions,
+        "results": results
+    }
@@ -1,18 +1,39 @@
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Callable
 import os
-import re
-import random
-from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text
+import asyncio
+import json
+import base64
+import hashlib
+import importlib
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text, UniqueConstraint, Index, LargeBinary, select, func, update, delete, text, inspect, or_, and_, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-import google.generativeai as genai
+from sqlalchemy.orm import sessionmaker, deferred, undefer
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
+from llm_pool import create_pool_from_env, LLMTimeoutError
+from course_cache import create_cache_from_env, personalization_signature, age_band, normalize_interests
+from lru_cache import LRUTTLCache
+from content_store import encode_document, decode_document
+from answer_keys import AnswerKey, grade
+from password_strength import validate_password_strength, common_passwords
+from static_assets import AssetIndex, StaticAssets, SPAShell, IMMUTABLE
+from tts_cache import get_tts_cache
+from voice_pack import get_voice_pack
+from phishing_detector import validate_email_safety, load_rules as load_phishing_rules
+from singleflight import SingleFlight
+from course_stream import CourseStreamParser
+from llm_json import parse_course, clean_section
+from pregeneration import JobQueue
+import ayora_routes
+from metrics import MetricsMiddleware, instrument_engine, track_cache, record_llm_tokens, record_course_response, monitor_event_loop, write_snapshots, collect, render
 
 # Load environment variables from .env file
 load_dotenv()
@@ -23,6 +44,24 @@ engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} i
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+def async_database_url(url: str) -> str:
+    """Pick the async driver matching DATABASE_URL (aiosqlite or asyncpg)"""
+    if url.startswith("sqlite:///"):
+        return url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    for prefix in ("postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return url.replace(prefix, "postgresql+asyncpg://", 1)
+    return url
+
+# Async engine used by the API routes so DB round trips don't block the event loop
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_database_url(DATABASE_URL))
+# aiosqlite defaults to NullPool, which reopens the database file for every session
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **({"poolclass": AsyncAdaptedQueuePool} if ASYNC_DATABASE_URL.startswith("sqlite+aiosqlite") else {})
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Database Models
 class User(Base):
     __tablename__ = "users"
@@ -32,10 +71,12 @@ class User(Base):
     age = Column(Integer)
     experience_level = Column(String)
     interests = Column(Text)  # JSON string of interests
+    cohort = Column(String, nullable=True, index=True)  # Class or group code for cohort leaderboards
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class CourseProgress(Base):
     __tablename__ = "course_progress"
+    __table_args__ = (UniqueConstraint("user_id", "course_id", name="uq_course_progress_user_course"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, index=True)
@@ -43,10 +84,36 @@ class CourseProgress(Base):
     completed = Column(Boolean, default=False)
     score = Column(Float, default=0.0)
     completion_date = Column(DateTime, nullable=True)
-    course_content = Column(Text)  # AI-generated course content
+    course_content = deferred(Column(Text))  # Legacy inline content, moved to course_content_blobs at startup; never loaded
+    content_hash = Column(String, nullable=True, index=True)  # AI-generated course in course_content_blobs
     quiz_attempts = Column(Integer, default=0)
     best_quiz_score = Column(Float, default=0.0)
 
+class QuizAttempt(Base):
+    __tablename__ = "quiz_attempts"
+    __table_args__ = (Index("ix_quiz_attempts_user_course", "user_id", "course_id", "id"),)
+
+    # Append-only history; course_progress keeps the running totals
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, index=True)
+    course_id = Column(String)
+    score = Column(Float)
+    correct_answers = Column(Integer)
+    total_questions = Column(Integer)
+    passed = Column(Boolean)
+    answers = Column(Text)  # JSON object of submitted answers
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ProcessedSubmission(Base):
+    __tablename__ = "processed_submissions"
+
+    # Client-supplied ids of synced submissions, so replays return the original result; ids are only unique per user
+    user_id = Column(Integer, primary_key=True)
+    submission_id = Column(String, primary_key=True)
+    kind = Column(String)  # quiz or exercise
+    result = Column(Text)  # JSON of the response returned the first time
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Certificate(Base):
     __tablename__ = "certificates"
 
@@ -55,16 +122,198 @@ class Certificate(Base):
     issued_date = Column(DateTime, default=datetime.utcnow)
     certificate_id = Column(String, unique=True, index=True)
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+class LeaderboardEntry(Base):
+    __tablename__ = "leaderboard_rankings"
+    __table_args__ = (
+        # Each index matches a board's ORDER BY so page and rank reads walk the index
+        Index("ix_leaderboard_rank", "period", text("completed_courses DESC"), text("average_score DESC"), "user_id"),
+        Index("ix_leaderboard_level_rank", "period", "experience_level",
+              text("completed_courses DESC"), text("average_score DESC"), "user_id"),
+        Index("ix_leaderboard_cohort_rank", "period", "cohort",
+              text("completed_courses DESC"), text("average_score DESC"), "user_id"),
+    )
 
-# Dependency to get DB session
-def get_db():
+    period = Column(String, primary_key=True)  # "all", "week:2026-W42" or "month:2026-10"
+    user_id = Column(Integer, primary_key=True)
+    name = Column(String)
+    experience_level = Column(String)
+    cohort = Column(String, nullable=True)
+    completed_courses = Column(Integer, default=0)
+    total_score = Column(Float, default=0.0)
+    average_score = Column(Float, default=0.0)
+    has_certificate = Column(Boolean, default=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class CourseGenerationJob(Base):
+    __tablename__ = "course_generation_jobs"
+    __table_args__ = (UniqueConstraint("user_id", "course_id", name="uq_course_generation_jobs_user_course"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, index=True)
+    course_id = Column(String)
+    priority = Column(Integer, default=0)  # Lower runs first
+    status = Column(String, default="pending", index=True)  # pending, running, done, failed
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class CourseContentBlob(Base):
+    __tablename__ = "course_content_blobs"
+
+    content_hash = Column(String, primary_key=True)  # sha256 of the canonical JSON document
+    encoding = Column(String)  # zstd or zlib
+    payload = Column(LargeBinary)
+    raw_size = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class QuizAnswerKey(Base):
+    __tablename__ = "quiz_answer_keys"
+
+    content_hash = Column(String, primary_key=True)  # Course document the key was extracted from
+    correct_answers = Column(Text)  # JSON list, one entry per question
+    questions = Column(Text)
+    explanations = Column(Text)
+
+    @classmethod
+    def from_key(cls, content_hash: str, key: AnswerKey) -> "QuizAnswerKey":
+        correct_answers, questions, explanations = key.to_json()
+        return cls(content_hash=content_hash, correct_answers=correct_answers, questions=questions, explanations=explanations)
+
+    def to_key(self) -> AnswerKey:
+        return AnswerKey.from_json(self.correct_answers, self.questions, self.explanations)
+
+class CourseContentCache(Base):
+    __tablename__ = "course_content_cache"
+
+    signature = Column(String, primary_key=True)  # Hash of the personalization profile
+    course_id = Column(String, index=True)
+    course_content = deferred(Column(Text))  # Legacy inline content, moved to course_content_blobs at startup; never loaded
+    content_hash = Column(String, nullable=True)  # AI-generated course shared by matching learners
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+    hit_count = Column(Integer, default=0)
+
+def add_missing_columns(bind):
+    """Add nullable columns introduced after a table was first created"""
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable or column.primary_key:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+def rekey_processed_submissions(bind):
+    """Rebuild processed_submissions from older releases, which keyed it by submission_id alone"""
+    inspector = inspect(bind)
+    if inspector.get_pk_constraint(ProcessedSubmission.__tablename__)["constrained_columns"] != ["submission_id"]:
+        return
+    with bind.begin() as conn:
+        conn.execute(text("ALTER TABLE processed_submissions RENAME TO processed_submissions_old"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_processed_submissions_user_id"))
+        ProcessedSubmission.__table__.create(conn)
+        conn.execute(text(
+            "INSERT INTO processed_submissions (user_id, submission_id, kind, result, created_at) "
+            "SELECT user_id, submission_id, kind, result, created_at FROM processed_submissions_old "
+            "WHERE user_id IS NOT NULL"
+        ))
+        conn.execute(text("DROP TABLE processed_submissions_old"))
+
+def add_course_progress_unique_index(bind):
+    """Merge duplicate progress rows from older releases, then enforce one row per user and course"""
+    inspector = inspect(bind)
+    columns = ["user_id", "course_id"]
+    if any(constraint["column_names"] == columns for constraint in inspector.get_unique_constraints("course_progress")) \
+            or any(index["unique"] and index["column_names"] == columns for index in inspector.get_indexes("course_progress")):
+        return
+    table = CourseProgress.__table__
+    with bind.begin() as conn:
+        duplicates = conn.execute(select(table.c.user_id, table.c.course_id).group_by(
+            table.c.user_id, table.c.course_id
+        ).having(func.count() > 1)).all()
+        for user_id, course_id in duplicates:
+            rows = conn.execute(select(table).where(
+                table.c.user_id == user_id, table.c.course_id == course_id
+            ).order_by(table.c.id)).mappings().all()
+            # Keep the oldest row, folding in the best results and the generated content of the others
+            keep = rows[0]
+            completion_dates = [row["completion_date"] for row in rows if row["completion_date"]]
+            conn.execute(update(table).where(table.c.id == keep["id"]).values(
+                completed=any(row["completed"] for row in rows),
+                score=max(row["score"] or 0.0 for row in rows),
+                completion_date=min(completion_dates) if completion_dates else None,
+                content_hash=next((row["content_hash"] for row in rows if row["content_hash"]), None),
+                course_content=next((row["course_content"] for row in rows if row["course_content"]), None),
+                quiz_attempts=sum(row["quiz_attempts"] or 0 for row in rows),
+                best_quiz_score=max(row["best_quiz_score"] or 0.0 for row in rows)
+            ))
+            conn.execute(delete(table).where(table.c.id.in_([row["id"] for row in rows[1:]])))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_course_progress_user_course ON course_progress (user_id, course_id)"
+        ))
+
+def migrate_inline_course_content(batch_size: int = 200) -> int:
+    """Move course JSON stored inline on rows into the deduplicated content store; returns the rows moved"""
     db = SessionLocal()
+    moved = 0
     try:
-        yield db
+        for model, key in ((CourseProgress, CourseProgress.id), (CourseContentCache, CourseContentCache.signature)):
+            while True:
+                rows = db.query(model).options(undefer(model.course_content)).filter(
+                    model.course_content.isnot(None)
+                ).order_by(key).limit(batch_size).all()
+                if not rows:
+                    break
+                moved += len(rows)
+                for row in rows:
+                    try:
+                        content = json.loads(row.course_content)
+                    except json.JSONDecodeError:
+                        content = None
+                    if content is not None:
+                        digest, encoding, payload, raw_size = encode_document(content)
+                        if not db.get(CourseContentBlob, digest):
+                            db.add(CourseContentBlob(content_hash=digest, encoding=encoding, payload=payload, raw_size=raw_size))
+                            db.add(QuizAnswerKey.from_key(digest, AnswerKey.from_course(content)))
+                            db.flush()
+                        row.content_hash = digest
+                    row.course_content = None
+                db.commit()
     finally:
         db.close()
+    return moved
+
+def vacuum_database():
+    """Give the space freed by migrations back to the filesystem; SQLite keeps it in the file otherwise"""
+    if engine.dialect.name != "sqlite":
+        return
+    # VACUUM can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+
+def migrate_database() -> int:
+    """Create tables and bring databases from older releases up to the current schema
+
+    Returns how many rows had inline course content moved out; on SQLite, vacuum_database then shrinks the file
+    """
+    Base.metadata.create_all(bind=engine)
+    rekey_processed_submissions(engine)
+    add_missing_columns(engine)
+    add_course_progress_unique_index(engine)
+    moved = migrate_inline_course_content()
+    if moved and engine.dialect.name == "sqlite":
+        print(f"🗜️ Moved inline content out of {moved} rows; run `python migrate.py --vacuum` to shrink the database file")
+    return moved
+
+# Dependency to get DB session
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
 # Pydantic models
 class UserCreate(BaseModel):
@@ -72,6 +321,7 @@ class UserCreate(BaseModel):
     age: int
     experience_level: str
     interests: List[str]
+    cohort: Optional[str] = None
 
 class UserResponse(BaseModel):
     id: int
@@ -79,6 +329,7 @@ class UserResponse(BaseModel):
     age: int
     experience_level: str
     interests: List[str]
+    cohort: Optional[str] = None
 
 class CourseRequest(BaseModel):
     user_id: int
@@ -89,6 +340,17 @@ class QuizAnswer(BaseModel):
     course_id: str
     answers: Dict[str, Any]
 
+class SyncSubmission(BaseModel):
+    submission_id: str
+    type: str  # quiz or exercise
+    course_id: Optional[str] = None  # quiz submissions
+    answers: Dict[str, Any] = {}  # quiz submissions
+    exercise: Optional[Dict[str, Any]] = None  # exercise submissions, same body as /api/exercises/validate
+
+class SyncBatch(BaseModel):
+    user_id: int
+    submissions: List[SyncSubmission]
+
 class CourseContent(BaseModel):
     content: str
     exercises: List[Dict[str, Any]]
@@ -151,22 +413,122 @@ app = FastAPI(title="CyberQuest Jr", description="AI-Powered Cybersecurity Educa
 
 # Mount static files FIRST to ensure they take priority over route handlers
 if os.path.exists("static"):
+    # One index for both mounts, hashed on the first request rather than at import
+    static_index = AssetIndex("static")
     # Mount assets at root level for proper frontend serving
     if os.path.exists("static/assets"):
-        app.mount("/assets", StaticFiles(directory="static/assets"), name="assets")
+        app.mount("/assets", StaticAssets("static/assets", hashed_names=True, index=static_index), name="assets")
     # Mount static directory for other files
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+    app.mount("/static", StaticAssets("static", index=static_index), name="static")
+
+# index.html for every client-side route, held in memory
+spa_shell = SPAShell("static/index.html")
 
-# Initialize Gemini AI
+# Gemini AI is configured on first use; importing the SDK alone takes most of a second
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
-    print("🤖 Google Gemini AI initialized successfully!")
-else:
-    gemini_model = None
+# Point the SDK at another host, such as the fake providers in benchmarks/
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+gemini_model = None
+gemini_model_lock = threading.Lock()
+if not GEMINI_API_KEY:
     print("⚠️ Warning: GEMINI_API_KEY not found. AI features will use fallback content.")
 
+def gemini_available() -> bool:
+    """Whether course generation can use Gemini, without initializing it"""
+    return gemini_model is not None or bool(GEMINI_API_KEY)
+
+def get_gemini_model():
+    """Import and configure the Gemini SDK once, returning None without an API key"""
+    global gemini_model
+    if gemini_model is None and GEMINI_API_KEY:
+        with gemini_model_lock:
+            if gemini_model is None:
+                import google.generativeai as genai
+                if GEMINI_API_ENDPOINT:
+                    genai.configure(api_key=GEMINI_API_KEY, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+                else:
+                    genai.configure(api_key=GEMINI_API_KEY)
+                gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
+                print("🤖 Google Gemini AI initialized successfully!")
+    return gemini_model
+
+# Gemini calls are blocking, so run them in a bounded pool off the event loop
+# (configure with GEMINI_MAX_CONCURRENCY and GEMINI_TIMEOUT_SECONDS)
+gemini_pool = create_pool_from_env("gemini", default_concurrency=8, default_timeout=60.0)
+GEMINI_STREAM_TIMEOUT = float(os.getenv("GEMINI_STREAM_TIMEOUT_SECONDS", 300))
+
+# Generated courses shared between learners with the same profile
+# (configure with COURSE_CACHE_MAX_ENTRIES and COURSE_CACHE_TTL_SECONDS)
+course_cache = create_cache_from_env()
+
+# In-flight course generations, keyed by profile signature and by (user, course)
+course_flights = SingleFlight()
+
+# Decompressed course documents by content hash
+document_cache = LRUTTLCache(max_entries=int(os.getenv("DOCUMENT_CACHE_MAX_ENTRIES", 256)), ttl_seconds=3600)
+
+# Quiz answer keys by content hash; keys never change, so only size bounds them
+answer_key_cache = LRUTTLCache(max_entries=int(os.getenv("ANSWER_KEY_CACHE_MAX_ENTRIES", 4096)), ttl_seconds=24 * 3600)
+
+# Per-user progress summaries for dashboard polling. Writes in this process invalidate
+# their user's entry; the TTL bounds staleness from writes served by other workers.
+progress_cache = LRUTTLCache(
+    max_entries=int(os.getenv("PROGRESS_CACHE_MAX_ENTRIES", 4096)),
+    ttl_seconds=float(os.getenv("PROGRESS_CACHE_TTL_SECONDS", 15))
+)
+
+# Metrics served on /metrics. With several workers, set METRICS_DIR to a shared
+# directory so each worker publishes snapshots that every scrape merges.
+METRICS_DIR = os.getenv("METRICS_DIR")
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+for cache_name, cache in (("course", course_cache), ("document", document_cache),
+                          ("answer_key", answer_key_cache), ("progress", progress_cache), ("tts", get_tts_cache())):
+    track_cache(cache_name, cache)
+metrics_tasks: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def start_metrics():
+    """Sample event-loop lag and, with METRICS_DIR set, publish snapshots for other workers"""
+    metrics_tasks.append(asyncio.ensure_future(monitor_event_loop()))
+    if METRICS_DIR:
+        interval = float(os.getenv("METRICS_SNAPSHOT_SECONDS", 5))
+        metrics_tasks.append(asyncio.ensure_future(write_snapshots(METRICS_DIR, interval)))
+
+@app.on_event("shutdown")
+async def stop_metrics():
+    for task in metrics_tasks:
+        task.cancel()
+    await asyncio.gather(*metrics_tasks, return_exceptions=True)
+    metrics_tasks.clear()
+
+@app.on_event("startup")
+async def prepare_database():
+    """Migrate before serving; with AUTO_MIGRATE=false run python migrate.py once per deploy instead"""
+    if os.getenv("AUTO_MIGRATE", "true").lower() == "true":
+        await asyncio.to_thread(migrate_database)
+
+@app.on_event("startup")
+async def warm_gemini_model():
+    """Initialize Gemini in the background so startup does not wait on the SDK import"""
+    if gemini_available():
+        asyncio.get_running_loop().run_in_executor(None, get_gemini_model)
+
+@app.on_event("startup")
+async def warm_ayora():
+    """Load the Ayora voice engine in the background when a companion provider is configured"""
+    if os.getenv("OPENAI_API_KEY") or os.getenv("ELEVENLABS_API_KEY"):
+        asyncio.get_running_loop().run_in_executor(None, ayora_routes.load_ayora)
+
+@app.on_event("shutdown")
+async def shutdown_llm_pools():
+    """Release LLM worker threads on shutdown"""
+    gemini_pool.shutdown()
+    if ayora_routes.ayora is not None:
+        ayora_routes.ayora.openai_pool.shutdown()
+        ayora_routes.ayora.elevenlabs_pool.shutdown()
+    await async_engine.dispose()
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -175,80 +537,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
-# Utility functions
-def validate_password_strength(password: str) -> Dict[str, Any]:
-    """Validate password strength with detailed feedback"""
-    score = 0
-    feedback = []
-
-    if len(password) >= 8:
-        score += 2
-    else:
-        feedback.append("Password should be at least 8 characters long")
-
-    if re.search(r'[A-Z]', password):
-        score += 1
-    else:
-        feedback.append("Include at least one uppercase letter")
-
-    if re.search(r'[a-z]', password):
-        score += 1
-    else:
-        feedback.append("Include at least one lowercase letter")
-
-    if re.search(r'\d', password):
-        score += 1
-    else:
-        feedback.append("Include at least one number")
-
-    if re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
-        score += 1
-    else:
-        feedback.append("Include at least one special character")
-
-    strength = "Weak"
-    if score >= 5:
-        strength = "Strong"
-    elif score >= 3:
-        strength = "Medium"
-
-    return {
-        "score": score,
-        "max_score": 6,
-        "strength": strength,
-        "feedback": feedback,
-        "is_strong": score >= 5
-    }
-
-def validate_email_safety(email: str) -> Dict[str, Any]:
-    """Check if an email looks suspicious"""
-    suspicious_domains = ["fakeemail.com", "phishing.net", "suspicious.org", "scam.biz"]
-    suspicious_keywords = ["urgent", "winner", "prize", "click now", "verify account", "suspended"]
-
-    is_suspicious = False
-    warnings = []
-
-    # Check domain
-    if "@" in email:
-        domain = email.split("@")[1].lower()
-        if domain in suspicious_domains:
-            is_suspicious = True
-            warnings.append(f"Domain '{domain}' is known to be suspicious")
-
-    # Check for suspicious keywords
-    email_lower = email.lower()
-    for keyword in suspicious_keywords:
-        if keyword in email_lower:
-            is_suspicious = True
-            warnings.append(f"Contains suspicious keyword: '{keyword}'")
-
-    return {
-        "is_suspicious": is_suspicious,
-        "warnings": warnings,
-        "safety_score": 0 if is_suspicious else 100
-    }
+# Ayora companion endpoints, registered before the SPA catch-all route
+app.include_router(ayora_routes.router)
 
+# Utility functions
 def generate_certificate_id() -> str:
     """Generate a unique certificate ID"""
     import uuid
@@ -257,30 +551,35 @@ def generate_certificate_id() -> str:
 # API Routes
 
 @app.post("/api/users", response_model=UserResponse)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """Create a new user profile"""
     db_user = User(
         name=user.name,
         age=user.age,
         experience_level=user.experience_level,
-        interests=",".join(user.interests)
+        interests=",".join(user.interests),
+        cohort=user.cohort
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+
+    # Warm every course in the background so the first one is ready on click
+    await enqueue_course_pregeneration(db, db_user.id)
 
     return UserResponse(
         id=db_user.id,
         name=db_user.name,
         age=db_user.age,
         experience_level=db_user.experience_level,
-        interests=db_user.interests.split(",") if db_user.interests else []
+        interests=db_user.interests.split(",") if db_user.interests else [],
+        cohort=db_user.cohort
     )
 
 @app.get("/api/users/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int, db: Session = Depends(get_db)):
+async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
     """Get user profile"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -289,7 +588,8 @@ async def get_user(user_id: int, db: Session = Depends(get_db)):
         name=user.name,
         age=user.age,
         experience_level=user.experience_level,
-        interests=user.interests.split(",") if user.interests else []
+        interests=user.interests.split(",") if user.interests else [],
+        cohort=user.cohort
     )
 
 @app.get("/api/courses")
@@ -297,39 +597,14 @@ async def get_courses():
     """Get all available courses"""
     return {"courses": COURSES}
 
-@app.post("/api/courses/generate")
-async def generate_course_content(request: CourseRequest, db: Session = Depends(get_db)):
-    """Generate AI-powered course content"""
-    user = db.query(User).filter(User.id == request.user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    if request.course_id not in COURSES:
-        raise HTTPException(status_code=404, detail="Course not found")
-
-    course_info = COURSES[request.course_id]
-
-    # Check if content already exists
-    existing_progress = db.query(CourseProgress).filter(
-        CourseProgress.user_id == request.user_id,
-        CourseProgress.course_id == request.course_id
-    ).first()
-
-    if existing_progress and existing_progress.course_content:
-        # Return existing content
-        import json
-        return json.loads(existing_progress.course_content)
-
-    # Generate new content using AI
-    try:
-        user_interests = user.interests.split(",") if user.interests else []
-
-        prompt = f"""
-        Create educational content for a cybersecurity course for children aged {user.age}.
+def build_course_prompt(course_info: Dict[str, Any], band: str, experience_level: str, interests: List[str]) -> str:
+    """Build the Gemini prompt for a course from the learner's personalization profile"""
+    return f"""
+        Create educational content for a cybersecurity course for children aged {band}.
 
         Course: {course_info['title']} - {course_info['description']}
-        User Experience Level: {user.experience_level}
-        User Interests: {', '.join(user_interests)}
+        User Experience Level: {experience_level}
+        User Interests: {', '.join(interests)}
 
         Generate a comprehensive course with:
         1. Educational content (explanation, examples, tips) - make it engaging and age-appropriate
@@ -359,131 +634,701 @@ async def generate_course_content(request: CourseRequest, db: Session = Depends(
             }}
         }}
 
-        Make it fun, educational, and appropriate for a {user.age}-year-old with {user.experience_level} experience.
+        Make it fun, educational, and appropriate for {band} year olds with {experience_level} experience.
         """
 
-        if gemini_model:
-            response = gemini_model.generate_content(prompt)
-        else:
-            # Fallback if AI is not available
-            response = type('obj', (object,), {'text': '{"content": "Course content not available", "exercises": [], "quiz": {"questions": []}}'})
-
-        response_text = response.text if hasattr(response, 'text') else str(response)
-
-        # Parse AI response
-        import json
-        try:
-            course_content = json.loads(response_text)
-        except json.JSONDecodeError:
-            # Fallback content if AI response isn't valid JSON
-            course_content = {
-                "content": f"Welcome to {course_info['title']}! This course will teach you about {course_info['description'].lower()}.",
-                "exercises": [
+# JSON shape of each section that can be requested on its own
+SECTION_FORMATS = {
+    "exercises": """"exercises": [
+                {
+                    "title": "exercise title",
+                    "description": "what to do",
+                    "type": "password|email|scenario",
+                    "instructions": "step by step instructions"
+                }
+            ]""",
+    "quiz": """"quiz": {
+                "questions": [
                     {
-                        "title": "Basic Understanding",
-                        "description": "Complete this exercise to test your understanding",
-                        "type": "scenario",
-                        "instructions": "Read the scenario and choose the best response"
+                        "question": "question text",
+                        "options": ["A", "B", "C", "D"],
+                        "correct_answer": 0,
+                        "explanation": "why this is correct"
                     }
-                ],
-                "quiz": {
-                    "questions": [
-                        {
-                            "question": f"What is the main goal of {course_info['title']}?",
-                            "options": ["To have fun", "To learn cybersecurity", "To use computers", "To play games"],
-                            "correct_answer": 1,
-                            "explanation": "The main goal is to learn cybersecurity concepts"
-                        }
-                    ]
-                }
+                ]
+            }"""
+}
+
+SECTION_TASKS = {
+    "exercises": "3 practical exercises with clear instructions",
+    "quiz": "A quiz with 5 multiple-choice questions"
+}
+
+def build_sections_prompt(course_info: Dict[str, Any], band: str, experience_level: str, interests: List[str],
+                          lesson: str, sections: List[str]) -> str:
+    """Ask Gemini for only the sections a response lost, based on the lesson we kept"""
+    tasks = "\n".join(f"        {i}. {SECTION_TASKS[section]}" for i, section in enumerate(sections, 1))
+    formats = ",\n            ".join(SECTION_FORMATS[section] for section in sections)
+    return f"""
+        You wrote this lesson for a cybersecurity course for children aged {band}.
+
+        Course: {course_info['title']} - {course_info['description']}
+        User Experience Level: {experience_level}
+        User Interests: {', '.join(interests)}
+
+        Lesson:
+        {lesson[:4000]}
+
+        Based on the lesson, generate:
+{tasks}
+
+        Format the response as JSON with this structure:
+        {{
+            {formats}
+        }}
+        """
+
+def fallback_course_content(course_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Static course used when the AI response can't be parsed"""
+    return {
+        "content": f"Welcome to {course_info['title']}! This course will teach you about {course_info['description'].lower()}.",
+        "exercises": [
+            {
+                "title": "Basic Understanding",
+                "description": "Complete this exercise to test your understanding",
+                "type": "scenario",
+                "instructions": "Read the scenario and choose the best response"
             }
+        ],
+        "quiz": {
+            "questions": [
+                {
+                    "question": f"What is the main goal of {course_info['title']}?",
+                    "options": ["To have fun", "To learn cybersecurity", "To use computers", "To play games"],
+                    "correct_answer": 1,
+                    "explanation": "The main goal is to learn cybersecurity concepts"
+                }
+            ]
+        }
+    }
 
-        # Save content to database
-        if existing_progress:
-            existing_progress.course_content = json.dumps(course_content)
-        else:
-            progress = CourseProgress(
-                user_id=request.user_id,
-                course_id=request.course_id,
-                course_content=json.dumps(course_content)
-            )
-            db.add(progress)
+async def generate_course_with_ai(course_info: Dict[str, Any], age: int, experience_level: str, interests: List[str],
+                                  on_text: Optional[Callable[[str], None]] = None) -> Tuple[Dict[str, Any], bool]:
+    """Generate a course with Gemini, returning the content and whether it is safe to share via the cache"""
+    prompt = build_course_prompt(course_info, age_band(age), experience_level, normalize_interests(interests))
+
+    if not gemini_available():
+        # Fallback if AI is not available
+        return {"content": "Course content not available", "exercises": [], "quiz": {"questions": []}}, False
+
+    # First use imports the SDK, so do it on a worker thread rather than the event loop
+    model = gemini_model or await gemini_pool.run(get_gemini_model)
+
+    if on_text:
+        # Stream the response, handing each chunk to the caller as it arrives
+        def consume_stream(progress: Callable[[], None]) -> Tuple[str, Any]:
+            parts = []
+            usage = None
+            for chunk in model.generate_content(prompt, stream=True):
+                progress()
+                text = getattr(chunk, 'text', '')
+                parts.append(text)
+                on_text(text)
+                usage = getattr(chunk, 'usage_metadata', None) or usage  # Totals arrive on the last chunk
+            return "".join(parts), usage
+
+        # The call timeout applies between chunks; the whole stream gets its own, longer limit
+        response_text, usage = await gemini_pool.run_stream(consume_stream, total_timeout=GEMINI_STREAM_TIMEOUT)
+    else:
+        response = await gemini_pool.run(model.generate_content, prompt)
+        response_text = response.text if hasattr(response, 'text') else str(response)
+        usage = getattr(response, 'usage_metadata', None)
+
+    record_llm_tokens("gemini", getattr(usage, 'prompt_token_count', None), getattr(usage, 'candidates_token_count', None))
+
+    # Recover what we can from fenced, malformed or truncated output
+    parsed = parse_course(response_text)
+    if parsed.course is None:
+        # Not even the lesson survived
+        print(f"⚠️ Unusable course response: {'; '.join(parsed.problems[:3])}")
+        record_course_response("fallback")
+        return fallback_course_content(course_info), False
+
+    course = parsed.course
+    if not parsed.missing:
+        record_course_response("repaired" if parsed.repairs or parsed.problems else "valid")
+        return course, True
+
+    # Keep the lesson and pay only for the sections that were lost
+    print(f"🩹 Requesting {', '.join(parsed.missing)} again: {'; '.join(parsed.problems[:3])}")
+    sections_prompt = build_sections_prompt(course_info, age_band(age), experience_level, normalize_interests(interests),
+                                            course["content"], parsed.missing)
+    try:
+        response = await gemini_pool.run(model.generate_content, sections_prompt)
+        usage = getattr(response, 'usage_metadata', None)
+        record_llm_tokens("gemini", getattr(usage, 'prompt_token_count', None), getattr(usage, 'candidates_token_count', None))
+        sections = parse_course(response.text, tuple(parsed.missing))
+    except Exception as e:
+        print(f"⚠️ Could not regenerate {', '.join(parsed.missing)}: {e}")
+        sections = None
+
+    if sections and sections.course is not None and not sections.missing:
+        course.update({section: sections.course[section] for section in parsed.missing})
+        record_course_response("salvaged")
+        return course, True
+
+    # Fill the gaps with the static sections; keep the lesson but don't share this course
+    fallback = fallback_course_content(course_info)
+    recovered = sections.course if sections and sections.course else {}
+    for section in parsed.missing:
+        course[section] = recovered.get(section) or fallback[section]
+    record_course_response("partial")
+    return course, False
+
+async def store_course_document(content: Dict[str, Any]) -> str:
+    """Store a course once in the content store and return its hash"""
+    digest, encoding, payload, raw_size = encode_document(content)
+    if document_cache.get(digest) is None:
+        async with AsyncSessionLocal() as db:
+            if not await db.get(CourseContentBlob, digest):
+                db.add(CourseContentBlob(content_hash=digest, encoding=encoding, payload=payload, raw_size=raw_size))
+                db.add(QuizAnswerKey.from_key(digest, AnswerKey.from_course(content)))
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    # Identical content stored concurrently; the existing blob is the same document
+                    await db.rollback()
+        document_cache.put(digest, content)
+    return digest
+
+async def load_course_document(db: AsyncSession, content_hash: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Fetch and decompress a course from the content store"""
+    if not content_hash:
+        return None
+
+    content = document_cache.get(content_hash)
+    if content is not None:
+        return content
+
+    blob = await db.get(CourseContentBlob, content_hash)
+    if not blob:
+        return None
+    content = decode_document(blob.encoding, blob.payload)
+    document_cache.put(content_hash, content)
+    return content
+
+async def load_answer_key(db: AsyncSession, content_hash: Optional[str]) -> Optional[AnswerKey]:
+    """Fetch the precompiled quiz key for a course, extracting it once for older documents"""
+    if not content_hash:
+        return None
+
+    key = answer_key_cache.get(content_hash)
+    if key is not None:
+        return key
+
+    row = await db.get(QuizAnswerKey, content_hash)
+    if row:
+        key = row.to_key()
+    else:
+        content = await load_course_document(db, content_hash)
+        if content is None:
+            return None
+        key = AnswerKey.from_course(content)
+        async with AsyncSessionLocal() as writer:
+            writer.add(QuizAnswerKey.from_key(content_hash, key))
+            try:
+                await writer.commit()
+            except IntegrityError:
+                # Another request extracted the same key first
+                await writer.rollback()
+    answer_key_cache.put(content_hash, key)
+    return key
+
+async def lookup_cached_course(db: AsyncSession, signature: str) -> Optional[Dict[str, Any]]:
+    """Check the memory tier, then the database tier, for a shared course"""
+    content = course_cache.get(signature)
+    if content is not None:
+        return content
+
+    cached = await db.get(CourseContentCache, signature)
+    if not cached:
+        return None
+
+    if (datetime.utcnow() - cached.created_at).total_seconds() > course_cache.ttl_seconds:
+        await db.delete(cached)
+        return None
+
+    content = await load_course_document(db, cached.content_hash)
+    if content is None:
+        return None
+
+    cached.hit_count += 1
+    cached.last_used_at = datetime.utcnow()
+    course_cache.put(signature, content)
+    return content
+
+async def store_cached_course(db: AsyncSession, signature: str, course_id: str, content_hash: str, content: Dict[str, Any]):
+    """Point both cache tiers at a freshly generated course"""
+    course_cache.put(signature, content)
+    cached = await db.get(CourseContentCache, signature)
+    if cached:
+        cached.content_hash = content_hash
+        cached.created_at = datetime.utcnow()
+    else:
+        db.add(CourseContentCache(
+            signature=signature,
+            course_id=course_id,
+            content_hash=content_hash
+        ))
+
+async def get_shared_course(course_id: str, age: int, experience_level: str, interests: List[str],
+                            on_text: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Return the shared course for a profile, generating it at most once at a time
+
+    on_text is called on the event loop with every chunk of generated text, including any sent before this call
+    """
+    # Learners with the same profile share one generated course
+    signature = personalization_signature(course_id, age, experience_level, interests)
+
+    async def generate(publish: Callable[[str], None]):
+        async with AsyncSessionLocal() as db:
+            content = await lookup_cached_course(db, signature)
+            await db.commit()
+        if content is not None:
+            return content
+
+        # Generate new content using AI, without holding a connection while we wait
+        loop = asyncio.get_running_loop()
+        content, cacheable = await generate_course_with_ai(
+            COURSES[course_id], age, experience_level, interests,
+            lambda chunk: loop.call_soon_threadsafe(publish, chunk)  # Called from the Gemini worker thread
+        )
+        if cacheable:
+            content_hash = await store_course_document(content)
+            async with AsyncSessionLocal() as db:
+                await store_cached_course(db, signature, course_id, content_hash, content)
+                await db.commit()
+        return content
+
+    return await course_flights.do_streaming(("signature", signature), generate, on_text)
+
+async def get_course_progress(db: AsyncSession, user_id: int, course_id: str) -> Optional[CourseProgress]:
+    """Load a user's progress row for one course"""
+    result = await db.execute(select(CourseProgress).where(
+        CourseProgress.user_id == user_id,
+        CourseProgress.course_id == course_id
+    ))
+    return result.scalars().first()
+
+async def save_course_progress(db: AsyncSession, user_id: int, course_id: str, content: Dict[str, Any]):
+    """Attach content to the user's progress row, tolerating a concurrent insert"""
+    content_hash = await store_course_document(content)
+    progress = await get_course_progress(db, user_id, course_id)
+    progress_cache.invalidate(user_id)
+
+    if progress:
+        progress.content_hash = content_hash
+        await db.commit()
+        return
+
+    db.add(CourseProgress(
+        user_id=user_id,
+        course_id=course_id,
+        content_hash=content_hash
+    ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Another request created the row first; the unique constraint kept it single
+        await db.rollback()
+        progress = await get_course_progress(db, user_id, course_id)
+        if not progress.content_hash:
+            progress.content_hash = content_hash
+            await db.commit()
+
+async def build_course_for_user(user_id: int, course_id: str, age: int, experience_level: str, interests: List[str],
+                                on_text: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Produce and persist a user's course once, however many requests ask for it
+
+    on_text gets the generated text from the start, even when this request joins a generation already running
+    """
+
+    async def build(publish: Callable[[str], None]):
+        content = await get_shared_course(course_id, age, experience_level, interests, publish)
+        async with AsyncSessionLocal() as db:
+            await save_course_progress(db, user_id, course_id, content)
+        return content
+
+    return await course_flights.do_streaming(("progress", user_id, course_id), build, on_text)
 
-        db.commit()
+@app.post("/api/courses/generate")
+async def generate_course_content(request: CourseRequest, db: AsyncSession = Depends(get_db)):
+    """Generate AI-powered course content"""
+    user = await db.get(User, request.user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
 
-        return course_content
+    if request.course_id not in COURSES:
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    # Check if content already exists
+    existing_progress = await get_course_progress(db, request.user_id, request.course_id)
+
+    if existing_progress and existing_progress.content_hash:
+        # Return existing content
+        existing_content = await load_course_document(db, existing_progress.content_hash)
+        if existing_content is not None:
+            return existing_content
+
+    # Hand the connection back to the pool while Gemini works; generation opens its own sessions
+    profile = (user.age, user.experience_level, user.interests.split(",") if user.interests else [])
+    await db.close()
 
+    try:
+        # Concurrent requests for the same course join one in-flight generation
+        return await build_course_for_user(request.user_id, request.course_id, *profile)
+
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=f"Course generation timed out: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate course content: {str(e)}")
 
-@app.post("/api/courses/submit-quiz")
-async def submit_quiz(answer: QuizAnswer, db: Session = Depends(get_db)):
-    """Submit quiz answers and get results"""
-    user = db.query(User).filter(User.id == answer.user_id).first()
+def pregeneration_enabled() -> bool:
+    """Only warm courses when Gemini is configured; fallback content isn't worth storing up front"""
+    return gemini_available() and os.getenv("PREGENERATE_COURSES", "true").lower() == "true"
+
+async def enqueue_course_pregeneration(db: AsyncSession, user_id: int):
+    """Persist and queue a generation job for every course, easiest first"""
+    if not pregeneration_enabled():
+        return
+
+    ordered = sorted(enumerate(COURSES.items()), key=lambda item: (item[1][1]["difficulty"], item[0]))
+    jobs = []
+    for priority, (_, (course_id, _)) in enumerate(ordered):
+        job = CourseGenerationJob(user_id=user_id, course_id=course_id, priority=priority)
+        db.add(job)
+        jobs.append(job)
+    await db.commit()
+
+    for job in jobs:
+        pregeneration_queue.enqueue(job.id, job.priority)
+
+async def run_course_generation_job(job_id: int):
+    """Worker handler: generate one user's course through the shared single-flight path"""
+    async with AsyncSessionLocal() as db:
+        job = await db.get(CourseGenerationJob, job_id)
+        if not job or job.status == "done":
+            return
+
+        user = await db.get(User, job.user_id)
+        existing_progress = (await db.execute(select(CourseProgress.id).where(
+            CourseProgress.user_id == job.user_id,
+            CourseProgress.course_id == job.course_id,
+            CourseProgress.content_hash.isnot(None)
+        ))).first()
+
+        if not user or job.course_id not in COURSES or existing_progress:
+            # Nothing left to do: the user is gone or the course was generated on demand
+            job.status = "done"
+            job.finished_at = datetime.utcnow()
+            await db.commit()
+            return
+
+        # Claim the job; every worker process enqueues the pending jobs, and only one of them may run each
+        claimed = await db.execute(update(CourseGenerationJob).where(
+            CourseGenerationJob.id == job_id,
+            CourseGenerationJob.status == "pending"
+        ).values(status="running", started_at=datetime.utcnow()))
+        await db.commit()
+        if claimed.rowcount == 0:
+            return
+        await db.refresh(job)
+
+        try:
+            # Requests for the same course attach to this in-flight generation
+            await build_course_for_user(
+                job.user_id,
+                job.course_id,
+                user.age,
+                user.experience_level,
+                user.interests.split(",") if user.interests else []
+            )
+            job.status = "done"
+            job.error = None
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+
+        job.finished_at = datetime.utcnow()
+        await db.commit()
+
+# Background course warming (configure with PREGENERATION_WORKERS and PREGENERATE_COURSES)
+pregeneration_queue = JobQueue(run_course_generation_job, workers=int(os.getenv("PREGENERATION_WORKERS", 2)))
+
+# A job running longer than this was left behind by a process that stopped, and is run again
+PREGENERATION_STALE_SECONDS = float(os.getenv("PREGENERATION_STALE_SECONDS", 900))
+
+@app.on_event("startup")
+async def start_pregeneration_workers():
+    """Start the workers and resume jobs left unfinished by the last run"""
+    pregeneration_queue.start()
+
+    async with AsyncSessionLocal() as db:
+        # Jobs another live worker process is running are left alone; only stale ones are reset
+        stale = datetime.utcnow() - timedelta(seconds=PREGENERATION_STALE_SECONDS)
+        await db.execute(update(CourseGenerationJob).where(
+            CourseGenerationJob.status == "running",
+            or_(CourseGenerationJob.started_at.is_(None), CourseGenerationJob.started_at < stale)
+        ).values(status="pending"))
+        await db.commit()
+        pending = (await db.execute(select(CourseGenerationJob.id, CourseGenerationJob.priority).where(
+            CourseGenerationJob.status == "pending"
+        ).order_by(CourseGenerationJob.priority, CourseGenerationJob.id))).all()
+        for job_id, priority in pending:
+            pregeneration_queue.enqueue(job_id, priority)
+
+@app.on_event("shutdown")
+async def stop_pregeneration_workers():
+    """Stop the workers; unfinished jobs resume on the next startup"""
+    await pregeneration_queue.stop()
+
+def sse_event(event: str, data: Any) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def remaining_course_events(content: Dict[str, Any], parser: CourseStreamParser, streamed_text: str, sent: Dict[str, Any]):
+    """Emit whatever parts of the final course the stream didn't already deliver"""
+    final_text = content.get("content", "")
+    if not parser.content_streamed:
+        yield sse_event("content", {"delta": final_text})
+    elif streamed_text != final_text:
+        # The streamed text was unusable (e.g. invalid JSON) and got replaced
+        yield sse_event("content", {"replace": final_text})
+
+    # Sections that never streamed, or were regenerated after a bad response
+    if sent.get("exercises") != content.get("exercises"):
+        yield sse_event("exercises", content.get("exercises", []))
+    if sent.get("quiz") != content.get("quiz"):
+        yield sse_event("quiz", content.get("quiz", {"questions": []}))
+
+@app.get("/api/courses/generate/stream")
+async def stream_course_content(user_id: int, course_id: str, db: AsyncSession = Depends(get_db)):
+    """Generate course content, streaming the lesson text and each section as Server-Sent Events"""
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    progress = db.query(CourseProgress).filter(
-        CourseProgress.user_id == answer.user_id,
-        CourseProgress.course_id == answer.course_id
-    ).first()
+    if course_id not in COURSES:
+        raise HTTPException(status_code=404, detail="Course not found")
 
-    if not progress or not progress.course_content:
-        raise HTTPException(status_code=404, detail="Course content not found")
+    existing_progress = await get_course_progress(db, user_id, course_id)
 
-    import json
-    course_content = json.loads(progress.course_content)
-    quiz = course_content.get("quiz", {})
-    questions = quiz.get("questions", [])
+    loop = asyncio.get_running_loop()
+    chunks: asyncio.Queue = asyncio.Queue()
 
-    # Calculate score
-    correct_answers = 0
-    total_questions = len(questions)
-    results = []
+    existing_content = await load_course_document(db, existing_progress.content_hash) if existing_progress else None
+    profile = (user.age, user.experience_level, user.interests.split(",") if user.interests else [])
+    # The session would otherwise hold a connection until the whole stream is sent
+    await db.close()
 
-    for i, question in enumerate(questions):
-        user_answer = answer.answers.get(str(i), -1)
-        correct_answer = question.get("correct_answer", -1)
-        is_correct = user_answer == correct_answer
+    if existing_content is not None:
+        task = loop.create_future()
+        task.set_result(existing_content)
+        chunks.put_nowait(None)
+    else:
+        # Chunks generated before this request joined are replayed first, then the rest as they arrive
+        task = asyncio.ensure_future(build_course_for_user(user_id, course_id, *profile, on_text=chunks.put_nowait))
+        task.add_done_callback(lambda _: chunks.put_nowait(None))
+
+    async def events():
+        parser = CourseStreamParser()
+        streamed = []
+        sent: Dict[str, Any] = {}
+
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                break
+            for name, value in parser.feed(chunk):
+                if name == "content":
+                    streamed.append(value)
+                    yield sse_event("content", {"delta": value})
+                    continue
+                # Hold back sections that fail the schema; the final course replaces them
+                value = clean_section(name, value)
+                if value is not None:
+                    sent[name] = value
+                    yield sse_event(name, value)
+
+        try:
+            content = task.result()
+        except LLMTimeoutError as e:
+            yield sse_event("error", {"detail": f"Course generation timed out: {str(e)}"})
+            return
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Failed to generate course content: {str(e)}"})
+            return
+
+        for event in remaining_course_events(content, parser, "".join(streamed), sent):
+            yield event
+        yield sse_event("done", {"user_id": user_id, "course_id": course_id})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        if is_correct:
-            correct_answers += 1
+@app.get("/api/users/{user_id}/courses/status")
+async def get_course_readiness(user_id: int, db: AsyncSession = Depends(get_db)):
+    """Report which of the user's courses are generated and ready to open"""
+    user = (await db.execute(select(User.id).where(User.id == user_id))).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
 
-        results.append({
-            "question": question.get("question", ""),
-            "user_answer": user_answer,
-            "correct_answer": correct_answer,
-            "is_correct": is_correct,
-            "explanation": question.get("explanation", "")
-        })
+    ready = set((await db.execute(select(CourseProgress.course_id).where(
+        CourseProgress.user_id == user_id,
+        CourseProgress.content_hash.isnot(None)
+    ))).scalars())
+    jobs = {
+        job.course_id: job for job in (await db.execute(
+            select(CourseGenerationJob).where(CourseGenerationJob.user_id == user_id)
+        )).scalars()
+    }
 
-    score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
-    passed = score >= 70  # 70% passing grade
+    courses = {}
+    for course_id in COURSES:
+        job = jobs.get(course_id)
+        courses[course_id] = {
+            "ready": course_id in ready,
+            "status": "done" if course_id in ready else (job.status if job else "not_started"),
+            "error": job.error if job and job.status == "failed" else None
+        }
 
-    # Update progress
-    progress.quiz_attempts += 1
-    if score > progress.best_quiz_score:
-        progress.best_quiz_score = score
+    return {
+        "user_id": user_id,
+        "ready_courses": len(ready),
+        "total_courses": len(COURSES),
+        "courses": courses
+    }
 
-    if passed and not progress.completed:
-        progress.completed = True
-        progress.completion_date = datetime.utcnow()
-        progress.score = score
+async def record_quiz_submission(
+    db: AsyncSession,
+    user_id: int,
+    course_id: str,
+    answers: Dict[str, Any],
+    content_hash: Optional[str]
+) -> Optional[Dict[str, Any]]:
+    """Grade a quiz and record the attempt without committing; None if the course has no content"""
+    key = await load_answer_key(db, content_hash)
+    if key is None:
+        return None
+
+    graded = grade(key, answers)
+    score = graded["score"]
+    passed = score >= 70  # 70% passing grade
+    now = datetime.utcnow()
+
+    # Update progress in place so concurrent submissions cannot lose attempts or scores
+    this_course = and_(CourseProgress.user_id == user_id, CourseProgress.course_id == course_id)
+    attempts = (await db.execute(
+        update(CourseProgress)
+        .where(this_course)
+        .values(
+            quiz_attempts=func.coalesce(CourseProgress.quiz_attempts, 0) + 1,
+            best_quiz_score=case(
+                (func.coalesce(CourseProgress.best_quiz_score, 0) < score, score),
+                else_=CourseProgress.best_quiz_score
+            )
+        )
+        .returning(CourseProgress.quiz_attempts)
+    )).scalar()
 
-    db.commit()
+    db.add(QuizAttempt(
+        user_id=user_id,
+        course_id=course_id,
+        score=score,
+        correct_answers=graded["correct_answers"],
+        total_questions=graded["total_questions"],
+        passed=passed,
+        answers=json.dumps(answers),
+        created_at=now
+    ))
+
+    if passed:
+        # Only the submission that flips completed gets a row back, so the course counts once
+        newly_completed = await db.execute(
+            update(CourseProgress)
+            .where(this_course, CourseProgress.completed.isnot(True))
+            .values(completed=True, completion_date=now, score=score)
+        )
+        if newly_completed.rowcount:
+            await record_leaderboard_completion(db, user_id, score)
 
     return {
         "score": score,
         "passed": passed,
-        "correct_answers": correct_answers,
-        "total_questions": total_questions,
-        "results": results,
-        "attempts": progress.quiz_attempts
+        "correct_answers": graded["correct_answers"],
+        "total_questions": graded["total_questions"],
+        "results": graded["results"],
+        "attempts": attempts
     }
 
-@app.post("/api/exercises/validate")
-async def validate_exercise(data: Dict[str, Any]):
-    """Validate exercise answers"""
+@app.post("/api/courses/submit-quiz")
+async def submit_quiz(answer: QuizAnswer, db: AsyncSession = Depends(get_db)):
+    """Submit quiz answers and get results"""
+    content_hash = (await db.execute(
+        select(CourseProgress.content_hash)
+        .where(CourseProgress.user_id == answer.user_id, CourseProgress.course_id == answer.course_id)
+    )).scalar()
+
+    result = await record_quiz_submission(db, answer.user_id, answer.course_id, answer.answers, content_hash)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Course content not found")
+
+    await db.commit()
+    progress_cache.invalidate(answer.user_id)
+
+    return result
+
+@app.get("/api/users/{user_id}/quiz-attempts")
+async def get_quiz_attempts(
+    user_id: int,
+    course_id: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a user's quiz attempts, newest first, optionally for one course"""
+    limit = max(1, min(limit, 100))
+    query = select(QuizAttempt).where(QuizAttempt.user_id == user_id)
+    if course_id:
+        query = query.where(QuizAttempt.course_id == course_id)
+    if cursor:
+        query = query.where(QuizAttempt.id < cursor)
+
+    attempts = (await db.execute(query.order_by(QuizAttempt.id.desc()).limit(limit + 1))).scalars().all()
+    page = attempts[:limit]
+
+    return {
+        "attempts": [
+            {
+                "id": attempt.id,
+                "course_id": attempt.course_id,
+                "score": attempt.score,
+                "correct_answers": attempt.correct_answers,
+                "total_questions": attempt.total_questions,
+                "passed": attempt.passed,
+                "answers": json.loads(attempt.answers) if attempt.answers else {},
+                "created_at": attempt.created_at.isoformat()
+            }
+            for attempt in page
+        ],
+        "next_cursor": page[-1].id if len(attempts) > limit else None
+    }
+
+def check_exercise(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Grade one exercise answer"""
     exercise_type = data.get("type", "")
     answer = data.get("answer", "")
 
@@ -501,44 +1346,138 @@ async def validate_exercise(data: Dict[str, Any]):
     else:
         return {"error": "Unknown exercise type"}
 
-@app.get("/api/users/{user_id}/progress")
-async def get_user_progress(user_id: int, db: Session = Depends(get_db)):
-    """Get user's progress across all courses"""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+@app.on_event("startup")
+async def load_exercise_rules():
+    """Compile the phishing rules and open the password filter before the first exercise"""
+    load_phishing_rules()
+    common_passwords()
+
+@app.post("/api/exercises/validate")
+async def validate_exercise(data: Dict[str, Any]):
+    """Validate exercise answers"""
+    return check_exercise(data)
+
+# Largest batch a reconnecting device may replay in one request
+SYNC_MAX_SUBMISSIONS = int(os.getenv("SYNC_MAX_SUBMISSIONS", 500))
+
+async def process_sync_batch(db: AsyncSession, batch: SyncBatch) -> List[Dict[str, Any]]:
+    """Grade every new submission in the batch and record it; replays get their stored result"""
+    submission_ids = {submission.submission_id for submission in batch.submissions}
+    processed = {
+        row.submission_id: json.loads(row.result)
+        for row in (await db.execute(
+            select(ProcessedSubmission.submission_id, ProcessedSubmission.result)
+            .where(ProcessedSubmission.user_id == batch.user_id, ProcessedSubmission.submission_id.in_(submission_ids))
+        )).all()
+    }
 
-    progress_records = db.query(CourseProgress).filter(CourseProgress.user_id == user_id).all()
+    course_ids = {submission.course_id for submission in batch.submissions if submission.type == "quiz"}
+    content_hashes = dict((await db.execute(
+        select(CourseProgress.course_id, CourseProgress.content_hash)
+        .where(CourseProgress.user_id == batch.user_id, CourseProgress.course_id.in_(course_ids))
+    )).all()) if course_ids else {}
+
+    results = []
+    for submission in batch.submissions:
+        item = {"submission_id": submission.submission_id, "type": submission.type}
+
+        if submission.submission_id in processed:
+            results.append({**item, "status": "replayed", "result": processed[submission.submission_id]})
+            continue
+
+        if submission.type == "quiz":
+            result = await record_quiz_submission(
+                db, batch.user_id, submission.course_id, submission.answers, content_hashes.get(submission.course_id)
+            )
+            if result is None:
+                results.append({**item, "status": "error", "detail": "Course content not found"})
+                continue
+        elif submission.type == "exercise":
+            result = check_exercise(submission.exercise or {})
+        else:
+            results.append({**item, "status": "error", "detail": "Unknown submission type"})
+            continue
+
+        db.add(ProcessedSubmission(
+            submission_id=submission.submission_id,
+            user_id=batch.user_id,
+            kind=submission.type,
+            result=json.dumps(result)
+        ))
+        processed[submission.submission_id] = result
+        results.append({**item, "status": "processed", "result": result})
+
+    await db.commit()
+    return results
+
+@app.post("/api/sync/submissions")
+async def sync_submissions(batch: SyncBatch, db: AsyncSession = Depends(get_db)):
+    """Replay quiz and exercise submissions queued while a device was offline"""
+    if len(batch.submissions) > SYNC_MAX_SUBMISSIONS:
+        raise HTTPException(status_code=400, detail=f"At most {SYNC_MAX_SUBMISSIONS} submissions per batch")
+
+    try:
+        results = await process_sync_batch(db, batch)
+    except IntegrityError:
+        # The same submissions were synced concurrently; rerun so they come back as replays
+        await db.rollback()
+        results = await process_sync_batch(db, batch)
+    progress_cache.invalidate(batch.user_id)
+
+    return {"results": results}
+
+async def load_user_progress(db: AsyncSession, user_id: int) -> Dict[str, Any]:
+    """Build the progress summary from one projected query that never touches course_content"""
+    rows = (await db.execute(
+        select(
+            User.id,
+            CourseProgress.course_id,
+            CourseProgress.completed,
+            CourseProgress.score,
+            CourseProgress.completion_date,
+            CourseProgress.quiz_attempts,
+            CourseProgress.best_quiz_score,
+            Certificate.certificate_id,
+            Certificate.issued_date
+        )
+        .outerjoin(CourseProgress, CourseProgress.user_id == User.id)
+        .outerjoin(Certificate, Certificate.user_id == User.id)
+        .where(User.id == user_id)
+    )).all()
+
+    if not rows:
+        raise HTTPException(status_code=404, detail="User not found")
 
     progress = {}
     completed_courses = 0
     total_score = 0
 
-    for record in progress_records:
-        progress[record.course_id] = {
-            "completed": record.completed,
-            "score": record.score,
-            "completion_date": record.completion_date.isoformat() if record.completion_date else None,
-            "quiz_attempts": record.quiz_attempts,
-            "best_quiz_score": record.best_quiz_score
+    for row in rows:
+        if row.course_id is None or row.course_id in progress:
+            continue
+
+        progress[row.course_id] = {
+            "completed": row.completed,
+            "score": row.score,
+            "completion_date": row.completion_date.isoformat() if row.completion_date else None,
+            "quiz_attempts": row.quiz_attempts,
+            "best_quiz_score": row.best_quiz_score
         }
 
-        if record.completed:
+        if row.completed:
             completed_courses += 1
-            total_score += record.score
+            total_score += row.score
 
     # Check if eligible for certificate
     eligible_for_certificate = completed_courses == len(COURSES)
 
     # Check if certificate already issued
     certificate = None
-    if eligible_for_certificate:
-        cert_record = db.query(Certificate).filter(Certificate.user_id == user_id).first()
-        if cert_record:
-            certificate = {
-                "certificate_id": cert_record.certificate_id,
-                "issued_date": cert_record.issued_date.isoformat()
-            }
+    if eligible_for_certificate and rows[0].certificate_id:
+        certificate = {
+            "certificate_id": rows[0].certificate_id,
+            "issued_date": rows[0].issued_date.isoformat()
+        }
 
     return {
         "user_id": user_id,
@@ -550,24 +1489,51 @@ async def get_user_progress(user_id: int, db: Session = Depends(get_db)):
         "certificate": certificate
     }
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers the given ETag"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+@app.get("/api/users/{user_id}/progress")
+async def get_user_progress(user_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Get user's progress across all courses"""
+    cached = progress_cache.get(user_id)
+    if cached is None:
+        payload = await load_user_progress(db, user_id)
+        etag = '"' + hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest() + '"'
+        cached = (payload, etag)
+        progress_cache.put(user_id, cached)
+
+    payload, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    # Repeat dashboard polls with an unchanged summary get an empty 304
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
 @app.post("/api/users/{user_id}/certificate")
-async def issue_certificate(user_id: int, db: Session = Depends(get_db)):
+async def issue_certificate(user_id: int, db: AsyncSession = Depends(get_db)):
     """Issue a certificate to a user who completed all courses"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Check if user completed all courses
-    completed_courses = db.query(CourseProgress).filter(
+    completed_courses = await db.scalar(select(func.count()).select_from(CourseProgress).where(
         CourseProgress.user_id == user_id,
         CourseProgress.completed == True
-    ).count()
+    ))
 
     if completed_courses != len(COURSES):
         raise HTTPException(status_code=400, detail="User must complete all courses to receive certificate")
 
     # Check if certificate already exists
-    existing_cert = db.query(Certificate).filter(Certificate.user_id == user_id).first()
+    existing_cert = (await db.execute(
+        select(Certificate).where(Certificate.user_id == user_id)
+    )).scalars().first()
     if existing_cert:
         return {
             "certificate_id": existing_cert.certificate_id,
@@ -583,7 +1549,11 @@ async def issue_certificate(user_id: int, db: Session = Depends(get_db)):
     )
 
     db.add(certificate)
-    db.commit()
+    await db.execute(
+        update(LeaderboardEntry).where(LeaderboardEntry.user_id == user_id).values(has_certificate=True)
+    )
+    await db.commit()
+    progress_cache.invalidate(user_id)
 
     return {
         "certificate_id": certificate_id,
@@ -591,50 +1561,278 @@ async def issue_certificate(user_id: int, db: Session = Depends(get_db)):
         "message": "Congratulations! You've completed all CyberQuest Jr courses!"
     }
 
+LEADERBOARD_WINDOWS = ("all", "week", "month")
+
+def leaderboard_period(window: str, when: datetime) -> str:
+    """Period key of the board a completion at `when` counts towards"""
+    if window == "week":
+        year, week, _ = when.isocalendar()
+        return f"week:{year}-W{week:02d}"
+    if window == "month":
+        return f"month:{when.year}-{when.month:02d}"
+    return "all"
+
+# Databases whose dialect has INSERT ... ON CONFLICT, so a row is created or updated in one statement;
+# the dialect module is imported on first use, as only the one in use is ever needed
+UPSERT_DIALECTS = ("sqlite", "postgresql")
+
+async def record_leaderboard_completion(db: AsyncSession, user_id: int, score: float):
+    """Fold a newly completed course into the user's all-time, weekly and monthly entries"""
+    now = datetime.utcnow()
+    user = await db.get(User, user_id)
+    if user is None:
+        return  # Deleted since the quiz was graded; there is no one to rank
+
+    fold = {
+        "completed_courses": LeaderboardEntry.completed_courses + 1,
+        "total_score": LeaderboardEntry.total_score + score,
+        "average_score": (LeaderboardEntry.total_score + score) / (LeaderboardEntry.completed_courses + 1),
+        "updated_at": now
+    }
+    dialect = db.get_bind().dialect.name
+    for window in LEADERBOARD_WINDOWS:
+        values = dict(
+            period=leaderboard_period(window, now),
+            user_id=user_id,
+            name=user.name,
+            experience_level=(user.experience_level or "").lower(),
+            cohort=user.cohort,
+            completed_courses=1,
+            total_score=score,
+            average_score=score,
+            updated_at=now
+        )
+        if dialect in UPSERT_DIALECTS:
+            # Concurrent first completions in a period both land here; the conflict clause folds the second in
+            insert = importlib.import_module(f"sqlalchemy.dialects.{dialect}").insert
+            await db.execute(insert(LeaderboardEntry).values(**values).on_conflict_do_update(
+                index_elements=[LeaderboardEntry.period, LeaderboardEntry.user_id],
+                set_=fold
+            ))
+            continue
+
+        # Elsewhere: update, insert if there was no row, and update again if a concurrent insert won the race
+        entry = (LeaderboardEntry.period == values["period"]) & (LeaderboardEntry.user_id == user_id)
+        if (await db.execute(update(LeaderboardEntry).where(entry).values(**fold))).rowcount:
+            continue
+        try:
+            async with db.begin_nested():
+                db.add(LeaderboardEntry(**values))
+        except IntegrityError:
+            await db.execute(update(LeaderboardEntry).where(entry).values(**fold))
+
+async def rebuild_leaderboard(db: AsyncSession):
+    """Recompute every board from course progress"""
+    users = {
+        user_id: (name, experience_level, cohort)
+        for user_id, name, experience_level, cohort in (await db.execute(
+            select(User.id, User.name, User.experience_level, User.cohort)
+        )).all()
+    }
+    completions = (await db.execute(
+        select(CourseProgress.user_id, CourseProgress.score, CourseProgress.completion_date)
+        .where(CourseProgress.completed == True)
+    )).all()
+    certified = set((await db.execute(select(Certificate.user_id))).scalars())
+
+    totals: Dict[Tuple[str, int], List[float]] = {}
+    for user_id, score, completion_date in completions:
+        if user_id not in users:
+            continue
+        for window in LEADERBOARD_WINDOWS:
+            period = leaderboard_period(window, completion_date or datetime.utcnow())
+            totals.setdefault((period, user_id), []).append(score)
+
+    await db.execute(delete(LeaderboardEntry))
+    db.add_all([
+        LeaderboardEntry(
+            period=period,
+            user_id=user_id,
+            name=users[user_id][0],
+            experience_level=(users[user_id][1] or "").lower(),
+            cohort=users[user_id][2],
+            completed_courses=len(scores),
+            total_score=sum(scores),
+            average_score=sum(scores) / len(scores),
+            has_certificate=user_id in certified
+        )
+        for (period, user_id), scores in totals.items()
+    ])
+    await db.commit()
+
+@app.on_event("startup")
+async def backfill_leaderboard():
+    """Build the leaderboard projection for databases created before it existed"""
+    async with AsyncSessionLocal() as db:
+        has_entries = (await db.execute(select(LeaderboardEntry.user_id).limit(1))).first()
+        has_completions = (await db.execute(
+            select(CourseProgress.id).where(CourseProgress.completed == True).limit(1)
+        )).first()
+        if has_completions and not has_entries:
+            await rebuild_leaderboard(db)
+
+LEADERBOARD_ORDER = (
+    LeaderboardEntry.completed_courses.desc(),
+    LeaderboardEntry.average_score.desc(),
+    LeaderboardEntry.user_id
+)
+
+def leaderboard_board(window: str, experience_level: Optional[str], cohort: Optional[str]) -> list:
+    """Filters selecting one board: a time window, optionally narrowed to a cohort"""
+    if window not in LEADERBOARD_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Invalid window: {window}")
+
+    conditions = [LeaderboardEntry.period == leaderboard_period(window, datetime.utcnow())]
+    if experience_level:
+        conditions.append(LeaderboardEntry.experience_level == experience_level.lower())
+    if cohort:
+        conditions.append(LeaderboardEntry.cohort == cohort)
+    return conditions
+
+def ranked_after(completed_courses: int, average_score: float, user_id: int):
+    """Entries ranked strictly below the given position"""
+    return or_(
+        LeaderboardEntry.completed_courses < completed_courses,
+        and_(LeaderboardEntry.completed_courses == completed_courses, LeaderboardEntry.average_score < average_score),
+        and_(
+            LeaderboardEntry.completed_courses == completed_courses,
+            LeaderboardEntry.average_score == average_score,
+            LeaderboardEntry.user_id > user_id
+        )
+    )
+
+def ranked_before(completed_courses: int, average_score: float, user_id: int):
+    """Entries ranked strictly above the given position"""
+    return or_(
+        LeaderboardEntry.completed_courses > completed_courses,
+        and_(LeaderboardEntry.completed_courses == completed_courses, LeaderboardEntry.average_score > average_score),
+        and_(
+            LeaderboardEntry.completed_courses == completed_courses,
+            LeaderboardEntry.average_score == average_score,
+            LeaderboardEntry.user_id < user_id
+        )
+    )
+
+def leaderboard_row(entry: LeaderboardEntry, rank: int) -> Dict[str, Any]:
+    return {
+        "rank": rank,
+        "user_id": entry.user_id,
+        "name": entry.name,
+        "completed_courses": entry.completed_courses,
+        "average_score": round(entry.average_score, 1),
+        "total_score": round(entry.total_score, 1),
+        "has_certificate": entry.has_certificate
+    }
+
+def encode_leaderboard_cursor(entry: LeaderboardEntry, rank: int) -> str:
+    payload = json.dumps([entry.completed_courses, entry.average_score, entry.user_id, rank])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_leaderboard_cursor(cursor: str) -> Tuple[int, float, int, int]:
+    try:
+        completed_courses, average_score, user_id, rank = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(completed_courses), float(average_score), int(user_id), int(rank)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/leaderboard")
-async def get_leaderboard(db: Session = Depends(get_db)):
-    """Get leaderboard of top performers"""
-    # Get users with their progress
-    users = db.query(User).all()
-    leaderboard = []
-
-    for user in users:
-        progress_records = db.query(CourseProgress).filter(
-            CourseProgress.user_id == user.id,
-            CourseProgress.completed == True
-        ).all()
-
-        if progress_records:
-            total_score = sum(record.score for record in progress_records)
-            avg_score = total_score / len(progress_records)
-            completed_courses = len(progress_records)
-
-            # Check for certificate
-            has_certificate = db.query(Certificate).filter(Certificate.user_id == user.id).first() is not None
-
-            leaderboard.append({
-                "name": user.name,
-                "completed_courses": completed_courses,
-                "average_score": round(avg_score, 1),
-                "total_score": round(total_score, 1),
-                "has_certificate": has_certificate
-            })
-
-    # Sort by completed courses, then by average score
-    leaderboard.sort(key=lambda x: (x["completed_courses"], x["average_score"]), reverse=True)
-
-    return {"leaderboard": leaderboard[:10]}  # Top 10
+async def get_leaderboard(
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    window: str = "all",
+    experience_level: Optional[str] = None,
+    cohort: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a page of top performers, optionally for a time window or cohort"""
+    limit = max(1, min(limit, 100))
+    query = select(LeaderboardEntry).where(*leaderboard_board(window, experience_level, cohort))
+
+    rank = 0
+    if cursor:
+        completed_courses, average_score, user_id, rank = decode_leaderboard_cursor(cursor)
+        query = query.where(ranked_after(completed_courses, average_score, user_id))
+
+    # Keyset pagination straight off the rank index
+    entries = (await db.execute(query.order_by(*LEADERBOARD_ORDER).limit(limit + 1))).scalars().all()
+    page = entries[:limit]
+
+    leaderboard = [leaderboard_row(entry, rank + i + 1) for i, entry in enumerate(page)]
+    next_cursor = encode_leaderboard_cursor(page[-1], rank + len(page)) if len(entries) > limit else None
+
+    return {"leaderboard": leaderboard, "next_cursor": next_cursor}
+
+@app.get("/api/leaderboard/users/{user_id}")
+async def get_leaderboard_rank(
+    user_id: int,
+    neighbours: int = 2,
+    window: str = "all",
+    experience_level: Optional[str] = None,
+    cohort: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a user's rank on a board plus the entries just above and below them"""
+    neighbours = max(0, min(neighbours, 25))
+    board = leaderboard_board(window, experience_level, cohort)
+
+    entry = (await db.execute(
+        select(LeaderboardEntry).where(*board, LeaderboardEntry.user_id == user_id)
+    )).scalars().first()
+    if not entry:
+        raise HTTPException(status_code=404, detail="User is not on this leaderboard")
+
+    position = (entry.completed_courses, entry.average_score, entry.user_id)
+    ahead = await db.scalar(
+        select(func.count()).select_from(LeaderboardEntry).where(*board, ranked_before(*position))
+    )
+    rank = ahead + 1
+
+    above = (await db.execute(
+        select(LeaderboardEntry).where(*board, ranked_before(*position))
+        .order_by(
+            LeaderboardEntry.completed_courses.asc(),
+            LeaderboardEntry.average_score.asc(),
+            LeaderboardEntry.user_id.desc()
+        )
+        .limit(neighbours)
+    )).scalars().all()
+    below = (await db.execute(
+        select(LeaderboardEntry).where(*board, ranked_after(*position))
+        .order_by(*LEADERBOARD_ORDER)
+        .limit(neighbours)
+    )).scalars().all()
+
+    return {
+        "rank": rank,
+        "entry": leaderboard_row(entry, rank),
+        "above": [leaderboard_row(neighbour, rank - len(above) + i) for i, neighbour in enumerate(reversed(above))],
+        "below": [leaderboard_row(neighbour, rank + i + 1) for i, neighbour in enumerate(below)]
+    }
 
 # Move static file mounting to the end, after all API routes are defined
 # This will be moved after all route definitions
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics for this worker, or for all workers when METRICS_DIR is set"""
+    return Response(render(collect(METRICS_DIR)), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/")
-async def read_root():
+async def read_root(request: Request):
     """Serve the frontend application"""
-    if os.path.exists("static/index.html"):
-        return FileResponse("static/index.html")
-    else:
+    response = spa_shell.response(request)
+    if response is None:
         return {"message": "CyberQuest Jr API is running! Please build the frontend first."}
+    return response
+
+@app.get("/Audio/{filename}")
+async def serve_audio(filename: str):
+    """Serve Ayora's synthesized speech from the voice pack or the TTS cache"""
+    path = get_voice_pack().path_for(filename) or get_tts_cache().path_for(filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    # Names are content hashes, so a file never changes
+    return FileResponse(path, media_type="audio/mpeg", headers={"cache-control": IMMUTABLE})
 
 @app.get("/favicon.ico")
 @app.get("/shield.svg")
@@ -643,16 +1841,16 @@ async def serve_favicon():
     raise HTTPException(status_code=404, detail="Favicon not found")
 
 @app.get("/{path:path}")
-async def serve_spa(path: str):
+async def serve_spa(path: str, request: Request):
     """Serve the SPA for any route (React Router support) - but not for assets"""
     # Don't serve SPA for asset requests
     if path.startswith("assets/") or path.startswith("static/"):
         raise HTTPException(status_code=404, detail="Asset not found")
 
-    if os.path.exists("static/index.html"):
-        return FileResponse("static/index.html")
-    else:
+    response = spa_shell.response(request)
+    if response is None:
         return {"message": "Frontend not found. Please build the frontend first."}
+    return response
 
 if __name__ == "__main__":
     import uvicorn
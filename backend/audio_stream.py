@@ -0,0 +1,51 @@
+"""
+Audio Stream - fans synthesized speech out to listeners while it downloads
+Listeners that join late replay the chunks already received, then follow the live stream
+"""
+
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+
+class AudioBroadcast:
+    def __init__(self):
+        """Chunks of one in-progress synthesis; must be created and fed on the event loop"""
+        self.chunks: List[bytes] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+        self._done = asyncio.Event()
+
+    def _notify(self):
+        # Wake everyone waiting on the current event, then start a fresh one for the next change
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def append(self, chunk: bytes):
+        if self.finished or not chunk:
+            return  # A timed-out download may still be delivering
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None):
+        if self.finished:
+            return
+        self.finished = True
+        self.error = error
+        self._done.set()
+        self._notify()
+
+    async def wait(self):
+        """Wait for the download to end, successfully or not"""
+        await self._done.wait()
+
+    async def listen(self) -> AsyncIterator[bytes]:
+        """Every chunk from the start, as it becomes available"""
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.finished:
+                return
+            await self._changed.wait()
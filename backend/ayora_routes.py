@@ -2,23 +2,44 @@
 Ayora AI Companion API endpoints for dynamic voice and animation integration
 """
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 import sys
 import os
-import subprocess
-import json
+import re
+import asyncio
+import threading
 
 # Add the AI directory to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", "ai"))
 
-try:
-    from ayora_voice import ayora_voice, AyoraContext, generate_landing_introduction, generate_contextual_speech
-    AYORA_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: Ayora voice engine not available: {e}")
-    AYORA_AVAILABLE = False
+# The voice engine pulls in the OpenAI and ElevenLabs SDKs, so it is imported on first use rather than with the app
+ayora = None
+AYORA_AVAILABLE = False
+ayora_loaded = False
+ayora_load_lock = threading.Lock()
+
+def load_ayora() -> bool:
+    """Import the voice engine once, returning whether it is available"""
+    global ayora, AYORA_AVAILABLE, ayora_loaded
+    with ayora_load_lock:
+        if not ayora_loaded:
+            try:
+                import ayora_voice
+                ayora = ayora_voice
+                AYORA_AVAILABLE = ayora_voice.DEPENDENCIES_AVAILABLE
+            except ImportError as e:
+                print(f"Warning: Ayora voice engine not available: {e}")
+            ayora_loaded = True
+    return AYORA_AVAILABLE
+
+async def ensure_ayora_loaded() -> bool:
+    """Load the engine on a worker thread so the import doesn't block the event loop"""
+    if ayora_loaded:
+        return AYORA_AVAILABLE
+    return await asyncio.get_running_loop().run_in_executor(None, load_ayora)
 
 router = APIRouter(prefix="/api/ayora", tags=["Ayora AI Companion"])
 
@@ -26,6 +47,7 @@ class AyoraRequest(BaseModel):
     context: str
     context_data: Optional[Dict[str, Any]] = None
     trigger_animations: bool = True
+    stream_audio: bool = False  # Return before the audio is synthesized, with an audio_url that streams it
 
 class AyoraSpeechResponse(BaseModel):
     success: bool
@@ -35,13 +57,14 @@ class AyoraSpeechResponse(BaseModel):
     context: str
     estimated_duration: float
     audio_filename: Optional[str] = None
+    audio_url: Optional[str] = None
     error: Optional[str] = None
 
 @router.post("/landing-introduction", response_model=AyoraSpeechResponse)
-async def get_landing_introduction():
+async def get_landing_introduction(stream_audio: bool = False):
     """Generate Ayora's landing page introduction with speech and animation sequence"""
     
-    if not AYORA_AVAILABLE:
+    if not await ensure_ayora_loaded():
         return AyoraSpeechResponse(
             success=False,
             speech_text="",
@@ -54,7 +77,7 @@ async def get_landing_introduction():
     
     try:
         # Generate landing introduction
-        result = await generate_landing_introduction()
+        result = await ayora.generate_landing_introduction(stream_audio=stream_audio)
         
         return AyoraSpeechResponse(
             success=result.get("success", False),
@@ -64,6 +87,7 @@ async def get_landing_introduction():
             context=result.get("context", "landing_introduction"),
             estimated_duration=result.get("estimated_duration", 0.0),
             audio_filename=result.get("audio_filename"),
+            audio_url=result.get("audio_url"),
             error=result.get("error")
         )
         
@@ -74,7 +98,7 @@ async def get_landing_introduction():
 async def generate_contextual_speech(request: AyoraRequest):
     """Generate contextual speech based on user's current activity"""
     
-    if not AYORA_AVAILABLE:
+    if not await ensure_ayora_loaded():
         return AyoraSpeechResponse(
             success=False,
             speech_text="",
@@ -88,11 +112,11 @@ async def generate_contextual_speech(request: AyoraRequest):
     try:
         # Convert string context to enum
         context_map = {
-            "landing_introduction": AyoraContext.LANDING_INTRODUCTION,
-            "module_explanation": AyoraContext.MODULE_EXPLANATION,
-            "quiz_encouragement": AyoraContext.QUIZ_ENCOURAGEMENT,
-            "achievement_celebration": AyoraContext.ACHIEVEMENT_CELEBRATION,
-            "help_guidance": AyoraContext.HELP_GUIDANCE
+            "landing_introduction": ayora.AyoraContext.LANDING_INTRODUCTION,
+            "module_explanation": ayora.AyoraContext.MODULE_EXPLANATION,
+            "quiz_encouragement": ayora.AyoraContext.QUIZ_ENCOURAGEMENT,
+            "achievement_celebration": ayora.AyoraContext.ACHIEVEMENT_CELEBRATION,
+            "help_guidance": ayora.AyoraContext.HELP_GUIDANCE
         }
         
         context_enum = context_map.get(request.context)
@@ -100,9 +124,10 @@ async def generate_contextual_speech(request: AyoraRequest):
             raise HTTPException(status_code=400, detail=f"Invalid context: {request.context}")
         
         # Generate contextual speech
-        result = await generate_contextual_speech(
+        result = await ayora.generate_contextual_speech(
             context=request.context,
-            context_data=request.context_data
+            context_data=request.context_data,
+            stream_audio=request.stream_audio
         )
         
         return AyoraSpeechResponse(
@@ -113,24 +138,44 @@ async def generate_contextual_speech(request: AyoraRequest):
             context=result.get("context", request.context),
             estimated_duration=result.get("estimated_duration", 0.0),
             audio_filename=result.get("audio_filename"),
+            audio_url=result.get("audio_url"),
             error=result.get("error")
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate contextual speech: {str(e)}")
 
+@router.get("/audio/{key}")
+async def stream_speech_audio(key: str):
+    """Stream speech audio while it is still being synthesized, or serve it once it is cached"""
+    
+    if not re.fullmatch(r"[0-9a-f]{64}", key) or not await ensure_ayora_loaded():
+        raise HTTPException(status_code=404, detail="Audio not found")
+    
+    engine = ayora.ayora_voice
+    broadcast = engine.audio_streams.get(key)
+    if broadcast is not None:
+        # Listeners joining mid-download get the chunks so far, then the rest as ElevenLabs sends them
+        return StreamingResponse(broadcast.listen(), media_type="audio/mpeg", headers={"Cache-Control": "no-store"})
+    
+    filename = engine.tts_cache.get(key, ayora.TTS_OUTPUT_FORMAT)
+    path = engine.tts_cache.path_for(filename) if filename else None
+    if not path:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    return FileResponse(path, media_type="audio/mpeg", headers={"Cache-Control": "no-store"})
+
 @router.get("/animation-config")
 async def get_animation_config():
     """Get animation configuration for frontend integration"""
     
-    if not AYORA_AVAILABLE:
+    if not await ensure_ayora_loaded():
         return {
             "available": False,
             "error": "Ayora voice engine not available"
         }
     
     try:
-        if hasattr(ayora_voice, 'animation_config'):
+        if hasattr(ayora.ayora_voice, 'animation_config'):
             config = {
                 "available": True,
                 "waving_duration": 3.0,
@@ -166,22 +211,22 @@ async def get_ayora_status():
     """Get current status of Ayora AI companion system"""
     
     status = {
-        "ayora_available": AYORA_AVAILABLE,
+        "ayora_available": await ensure_ayora_loaded(),
         "speech_generator_available": False,
         "tts_available": False,
         "openai_available": False,
         "elevenlabs_available": False
     }
     
-    if AYORA_AVAILABLE:
+    if await ensure_ayora_loaded():
         try:
             # Check speech generator
-            if hasattr(ayora_voice, 'speech_generator'):
+            if hasattr(ayora.ayora_voice, 'speech_generator'):
                 status["speech_generator_available"] = True
             
             # Check TTS
-            if hasattr(ayora_voice, 'tts_enabled'):
-                status["tts_available"] = ayora_voice.tts_enabled
+            if hasattr(ayora.ayora_voice, 'tts_enabled'):
+                status["tts_available"] = ayora.ayora_voice.tts_enabled
             
             # Check OpenAI (indirectly through speech generator)
             try:
@@ -210,17 +255,23 @@ async def test_landing_introduction():
         script_path = os.path.join(os.path.dirname(__file__), "..", "..", "frontend", "app", "text_to_speech.py")
         
         if os.path.exists(script_path):
-            result = subprocess.run(
-                ["python", script_path],
-                capture_output=True,
-                text=True,
-                timeout=30
+            # Run as an asyncio subprocess so waiting on it doesn't block other requests
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, script_path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
             )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=30)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise
             
             return {
-                "success": result.returncode == 0,
-                "stdout": result.stdout,
-                "stderr": result.stderr,
+                "success": process.returncode == 0,
+                "stdout": stdout.decode(errors="replace"),
+                "stderr": stderr.decode(errors="replace"),
                 "message": "Landing introduction test completed"
             }
         else:
@@ -230,7 +281,7 @@ async def test_landing_introduction():
                 "script_path": script_path
             }
             
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         return {
             "success": False,
             "error": "Test timed out after 30 seconds"
@@ -5,25 +5,43 @@ Integrates OpenAI for speech generation and ElevenLabs for TTS
 
 import os
 import sys
-import json
 import asyncio
-from typing import Dict, Any, Optional, List
+import threading
+from typing import Dict, Any, Optional, List, Tuple
 from enum import Enum
 from pathlib import Path
 
+from metrics import record_llm_tokens
+from llm_pool import create_pool_from_env
+from audio_stream import AudioBroadcast
+from lru_cache import LRUTTLCache
+from speech_segments import SentenceBuffer
+from tts_cache import get_tts_cache, cache_key
+from voice_pack import get_voice_pack
+
 # Add the frontend app directory to path
 frontend_app_path = Path(__file__).parent.parent.parent / "frontend" / "app"
 sys.path.append(str(frontend_app_path))
 
 try:
-    import openai
+    from openai import OpenAI
     from elevenlabs import VoiceSettings, ElevenLabs
-    from elevenlabs import stream as play_stream
     DEPENDENCIES_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: Missing dependencies for Ayora voice engine: {e}")
     DEPENDENCIES_AVAILABLE = False
 
+# Both SDKs block, so their calls run in bounded pools off the event loop with their own limits
+# (configure with OPENAI_MAX_CONCURRENCY, OPENAI_TIMEOUT_SECONDS and the ELEVENLABS_ equivalents)
+openai_pool = create_pool_from_env("openai", default_concurrency=4, default_timeout=15.0)
+elevenlabs_pool = create_pool_from_env("elevenlabs", default_concurrency=4, default_timeout=30.0)
+
+TTS_MODEL_ID = "eleven_multilingual_v2"
+TTS_OUTPUT_FORMAT = "mp3_22050_32"
+
+# Send each sentence to ElevenLabs as soon as OpenAI has written it, instead of waiting for the whole speech
+PIPELINE_TTS = os.getenv("AYORA_PIPELINE_TTS", "true").lower() == "true"
+
 class AyoraContext(Enum):
     LANDING_INTRODUCTION = "landing_introduction"
     MODULE_EXPLANATION = "module_explanation"
@@ -31,6 +49,16 @@ class AyoraContext(Enum):
     ACHIEVEMENT_CELEBRATION = "achievement_celebration"
     HELP_GUIDANCE = "help_guidance"
 
+# Spoken when OpenAI is unavailable or fails
+FALLBACK_SPEECH = {
+    AyoraContext.LANDING_INTRODUCTION: "Hi there! I'm Ayora, your friendly cybersecurity guide! 🌟 Welcome to CyberQuestJR, where learning about online safety is super fun! I'll be with you every step of the way as we explore amazing cybersecurity adventures together. Ready to become a cyber hero? Let's start your exciting journey! 🚀",
+    AyoraContext.MODULE_EXPLANATION: "Great choice! This module will teach you awesome skills to stay safe online. Let's dive in and discover something amazing together! 🎯",
+    AyoraContext.QUIZ_ENCOURAGEMENT: "You've got this! Take your time, think through each question, and remember - every answer helps you learn something new! 💪",
+    AyoraContext.ACHIEVEMENT_CELEBRATION: "Fantastic work! You're becoming an amazing cyber hero! Keep up the incredible learning! 🏆⭐",
+    AyoraContext.HELP_GUIDANCE: "No worries at all! Learning is a journey, and I'm here to help. Take it one step at a time, and you'll do great! 🤗"
+}
+DEFAULT_FALLBACK_SPEECH = "Hi! I'm Ayora, and I'm excited to learn with you!"
+
 class AnimationState(Enum):
     BREATHING_IDLE = "Breathing Idle"
     WAVING = "Waving (1)"
@@ -46,25 +74,36 @@ class AyoraVoiceEngine:
             return
             
         # OpenAI Configuration
-        try:
-            from openai import OpenAI
-            self.openai_api_key = os.getenv("OPENAI_API_KEY", "KEYHERE")
-            self.openai_client = OpenAI(api_key=self.openai_api_key)
-        except ImportError:
-            print("OpenAI package not available")
+        self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        if self.openai_api_key:
+            # The client gives up with the pool so a hung call doesn't hold a worker thread
+            self.openai_client = OpenAI(api_key=self.openai_api_key, timeout=openai_pool.timeout)
+        else:
+            print("⚠️  OpenAI API key not found - using fallback lines")
             self.openai_client = None
         
         # ElevenLabs Configuration
+        self.voice_id = "Xb7hH8MSUJpSbSDYk0k2"  # Female voice ID
+        self.voice_settings_config = {
+            "stability": 0.3,
+            "similarity_boost": 0.75,
+            "style": 1.0,
+            "speed": 1.2
+        }
+        self.voice_settings = VoiceSettings(**self.voice_settings_config)
+
+        # Synthesized audio is reused for identical text and voice; concurrent requests share one download
+        self.tts_cache = get_tts_cache()
+        self.voice_pack = get_voice_pack()  # Fallback lines recorded ahead of time
+        self.audio_streams: Dict[str, AudioBroadcast] = {}  # Cache key -> download in progress
+        # First sentence of each pipelined speech: a speech opening the same way may already be stored
+        self.known_openings = LRUTTLCache(max_entries=512, ttl_seconds=24 * 3600)
+
         self.elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY")
         if self.elevenlabs_api_key:
-            self.elevenlabs_client = ElevenLabs(api_key=self.elevenlabs_api_key)
-            self.voice_id = "Xb7hH8MSUJpSbSDYk0k2"  # Female voice ID
-            self.voice_settings = VoiceSettings(
-                stability=0.3,
-                similarity_boost=0.75,
-                style=1.0,
-                speed=1.2
-            )
+            # ELEVENLABS_BASE_URL (like OPENAI_BASE_URL for OpenAI) points the client at another host
+            self.elevenlabs_client = ElevenLabs(api_key=self.elevenlabs_api_key, base_url=os.getenv("ELEVENLABS_BASE_URL"),
+                                                timeout=elevenlabs_pool.timeout)
         else:
             print("⚠️  ElevenLabs API key not found - TTS disabled")
             self.elevenlabs_client = None
@@ -77,11 +116,8 @@ class AyoraVoiceEngine:
         
         print(f"🤖 {self.companion_name} Voice Engine initialized!")
 
-    def generate_speech_text(self, context: AyoraContext, context_data: Optional[Dict] = None) -> str:
-        """Generate speech text using OpenAI based on context"""
-        
-        if not DEPENDENCIES_AVAILABLE:
-            return "Hello! I'm Ayora, your cybersecurity companion!"
+    def speech_messages(self, context: AyoraContext, context_data: Optional[Dict] = None) -> List[Dict[str, str]]:
+        """Chat messages asking OpenAI for the speech in this context"""
         
         prompts = {
             AyoraContext.LANDING_INTRODUCTION: """
@@ -137,34 +173,127 @@ class AyoraVoiceEngine:
             """
         }
         
+        return [
+            {"role": "system", "content": "You are Ayora, an AI cybersecurity education companion for kids."},
+            {"role": "user", "content": prompts[context]}
+        ]
+
+    async def generate_speech_text(self, context: AyoraContext, context_data: Optional[Dict] = None) -> str:
+        """Generate speech text using OpenAI based on context"""
+        
+        if not DEPENDENCIES_AVAILABLE:
+            return "Hello! I'm Ayora, your cybersecurity companion!"
+        
         try:
             # OpenAI v1 API format
             if not self.openai_client:
                 raise Exception("OpenAI client not available")
                 
-            response = self.openai_client.chat.completions.create(
+            response = await openai_pool.run(
+                self.openai_client.chat.completions.create,
                 model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are Ayora, an AI cybersecurity education companion for kids."},
-                    {"role": "user", "content": prompts[context]}
-                ],
+                messages=self.speech_messages(context, context_data),
                 max_tokens=200,
                 temperature=0.7
             )
+            usage = getattr(response, "usage", None)
+            record_llm_tokens("openai", getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None))
             
             return response.choices[0].message.content.strip()
             
         except Exception as e:
             print(f"Error generating speech with OpenAI: {e}")
-            # Fallback responses
-            fallbacks = {
-                AyoraContext.LANDING_INTRODUCTION: "Hi there! I'm Ayora, your friendly cybersecurity guide! 🌟 Welcome to CyberQuestJR, where learning about online safety is super fun! I'll be with you every step of the way as we explore amazing cybersecurity adventures together. Ready to become a cyber hero? Let's start your exciting journey! 🚀",
-                AyoraContext.MODULE_EXPLANATION: "Great choice! This module will teach you awesome skills to stay safe online. Let's dive in and discover something amazing together! 🎯",
-                AyoraContext.QUIZ_ENCOURAGEMENT: "You've got this! Take your time, think through each question, and remember - every answer helps you learn something new! 💪",
-                AyoraContext.ACHIEVEMENT_CELEBRATION: "Fantastic work! You're becoming an amazing cyber hero! Keep up the incredible learning! 🏆⭐",
-                AyoraContext.HELP_GUIDANCE: "No worries at all! Learning is a journey, and I'm here to help. Take it one step at a time, and you'll do great! 🤗"
-            }
-            return fallbacks.get(context, "Hi! I'm Ayora, and I'm excited to learn with you!")
+            return FALLBACK_SPEECH.get(context, DEFAULT_FALLBACK_SPEECH)
+
+    def pipeline_ready(self) -> bool:
+        return PIPELINE_TTS and DEPENDENCIES_AVAILABLE and bool(self.openai_client and self.elevenlabs_client)
+
+    async def generate_speech_pipelined(self, context: AyoraContext,
+                                        context_data: Optional[Dict] = None) -> Tuple[str, Optional[AudioBroadcast]]:
+        """Stream the speech from OpenAI, starting TTS for each sentence as soon as it is written
+
+        Returns the text and the stitched audio of all its sentences, or no audio when OpenAI failed
+        (with the fallback text) or the speech's audio is already stored
+        """
+        loop = asyncio.get_running_loop()
+        segments: asyncio.Queue = asyncio.Queue()
+        stitched = AudioBroadcast()
+        spoken: List[str] = []
+        downloads: List[asyncio.Future] = []  # One per sentence, cancelled if the stitched audio isn't wanted
+        held: List[str] = []  # Sentences kept back until the whole text shows whether its audio is stored
+        abandoned = False
+
+        def start_sentence(sentence: str):
+            broadcast, download = self.start_segment(sentence, " ".join(spoken))
+            downloads.append(download)
+            segments.put_nowait(broadcast)
+            spoken.append(sentence)
+
+        def queue_segment(sentence: str):
+            if abandoned:
+                return  # A timed-out generation may still be handing over sentences
+            if held or (not spoken and self.known_openings.get(sentence)):
+                held.append(sentence)
+            else:
+                start_sentence(sentence)
+
+        def abandon():
+            nonlocal abandoned
+            abandoned = True
+            stitching.cancel()
+            for download in downloads:
+                download.cancel()
+
+        def generate() -> Tuple[str, Any]:
+            # Runs on a pool thread, handing each finished sentence to the event loop
+            stream = self.openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=self.speech_messages(context, context_data),
+                max_tokens=200,
+                temperature=0.7,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            buffer = SentenceBuffer()
+            parts, usage = [], None
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                parts.append(delta)
+                for sentence in buffer.feed(delta):
+                    loop.call_soon_threadsafe(queue_segment, sentence)
+            for sentence in buffer.flush():
+                loop.call_soon_threadsafe(queue_segment, sentence)
+            return "".join(parts).strip(), usage
+
+        stitching = asyncio.ensure_future(self.stitch(segments, stitched))
+        try:
+            speech_text, usage = await openai_pool.run(generate)
+        except Exception as e:
+            print(f"Error generating speech with OpenAI: {e}")
+            abandon()
+            return FALLBACK_SPEECH.get(context, DEFAULT_FALLBACK_SPEECH), None
+        record_llm_tokens("openai", getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None))
+
+        # The text, and so its cache key, is only known once generation ends. If that audio is already
+        # packed, cached or being synthesized, the sentences sent so far are cancelled and the stored copy
+        # is used. Speech opening like one synthesized before was held back rather than sent, so a repeat
+        # costs no TTS; any other repeat still pays for the sentences that were under way.
+        key = self.audio_key(speech_text)
+        if self.stored_audio(key) or key in self.audio_streams:
+            abandon()
+            return speech_text, None
+        for sentence in held:
+            start_sentence(sentence)
+        if spoken:
+            self.known_openings.put(spoken[0], True)
+
+        # The sentences were queued before the result arrived; the key marks the end and names the stitched file
+        self.audio_streams[key] = stitched
+        segments.put_nowait(key)
+        return speech_text, stitched
 
     def calculate_animation_sequence(self, speech_text: str) -> List[Dict[str, Any]]:
         """Calculate the animation sequence based on speech content"""
@@ -193,52 +322,156 @@ class AyoraVoiceEngine:
         
         return animation_sequence
 
+    def audio_key(self, speech_text: str) -> str:
+        return cache_key(speech_text, self.voice_id, TTS_MODEL_ID, self.voice_settings_config, TTS_OUTPUT_FORMAT)
+
+    def stored_audio(self, key: str) -> Optional[str]:
+        """File name of audio that is already on disk, from the voice pack or the TTS cache"""
+        return self.voice_pack.get(key, TTS_OUTPUT_FORMAT) or self.tts_cache.get(key, TTS_OUTPUT_FORMAT)
+
     async def generate_audio_stream(self, speech_text: str) -> Optional[str]:
-        """Generate audio using ElevenLabs TTS"""
-        
+        """Generate audio using ElevenLabs TTS, reusing packed or cached audio for text already spoken"""
+        key = self.audio_key(speech_text)
+        cached = self.stored_audio(key)
+        if cached:
+            return cached
+
         if not self.elevenlabs_client:
             print("ElevenLabs not available - no audio generated")
             return None
-            
+
+        broadcast = self.start_synthesis(speech_text, key)
+        await broadcast.wait()
+        if broadcast.error:
+            return None
+        return self.tts_cache.get(key, TTS_OUTPUT_FORMAT)
+
+    def audio_url_for(self, speech_text: str) -> Optional[str]:
+        """URL the browser can start playing right away: the cached file, or the synthesis as it streams in"""
+        key = self.audio_key(speech_text)
+        cached = self.stored_audio(key)
+        if cached:
+            return f"/Audio/{cached}"
+        if not self.elevenlabs_client:
+            return None
+        self.start_synthesis(speech_text, key)
+        return f"/api/ayora/audio/{key}"
+
+    def start_segment(self, sentence: str, previous_text: str) -> Tuple[AudioBroadcast, asyncio.Future]:
+        """Start the ElevenLabs download for one sentence of a longer speech, returning it and its task"""
+        broadcast = AudioBroadcast()
+        # The sentences before it keep the intonation continuous; segments aren't cached on their own
+        options = {"previous_text": previous_text} if previous_text else {}
+        return broadcast, asyncio.ensure_future(self.synthesize(sentence, None, broadcast, **options))
+
+    async def stitch(self, segments: asyncio.Queue, stitched: AudioBroadcast):
+        """Relay each sentence's audio into one stream in speaking order, then cache the whole speech"""
+        key = None
         try:
-            # Generate audio stream
+            while True:
+                segment = await segments.get()
+                if isinstance(segment, str):
+                    key = segment
+                    break
+                async for chunk in segment.listen():
+                    stitched.append(chunk)
+                if segment.error:
+                    raise segment.error
+            # MP3 frames concatenate cleanly, so the joined segments are a playable file as they are;
+            # audio stored meanwhile for the same text is kept rather than overwritten
+            if not self.stored_audio(key):
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.tts_cache.store, key, TTS_OUTPUT_FORMAT, stitched.chunks
+                )
+            stitched.finish()
+        except Exception as e:
+            print(f"Error generating audio: {e}")
+            stitched.finish(e)
+        finally:
+            if key:
+                self.audio_streams.pop(key, None)
+
+    def start_synthesis(self, speech_text: str, key: str) -> AudioBroadcast:
+        """Start the ElevenLabs download for key, or join the one already running"""
+        broadcast = self.audio_streams.get(key)
+        if broadcast is None:
+            broadcast = AudioBroadcast()
+            self.audio_streams[key] = broadcast
+            asyncio.ensure_future(self.synthesize(speech_text, key, broadcast))
+        return broadcast
+
+    async def synthesize(self, speech_text: str, key: Optional[str], broadcast: AudioBroadcast, **options):
+        """Call ElevenLabs, relaying each chunk to listeners while writing it to the cache (unless key is None)"""
+        loop = asyncio.get_running_loop()
+        cancelled = threading.Event()
+
+        def download():
+            # Runs on a pool thread: the SDK stream and the file write both block
             audio_stream = self.elevenlabs_client.text_to_speech.stream(
                 text=speech_text,
                 voice_id=self.voice_id,
-                model_id="eleven_multilingual_v2",
+                model_id=TTS_MODEL_ID,
                 voice_settings=self.voice_settings,
-                output_format="mp3_22050_32"
+                output_format=TTS_OUTPUT_FORMAT,
+                **options
             )
-            
-            # Save to file for frontend playback
-            audio_dir = Path(__file__).parent.parent.parent / "public" / "Audio"
-            audio_dir.mkdir(exist_ok=True)
-            
-            audio_filename = f"ayora_speech_{int(asyncio.get_event_loop().time())}.mp3"
-            audio_path = audio_dir / audio_filename
-            
-            with open(audio_path, "wb") as f:
+
+            def relay():
                 for chunk in audio_stream:
+                    if cancelled.is_set():
+                        raise RuntimeError("synthesis cancelled")  # Closes the download and frees the slot
                     if isinstance(chunk, bytes):
-                        f.write(chunk)
-            
-            return f"/Audio/{audio_filename}"
-            
+                        loop.call_soon_threadsafe(broadcast.append, chunk)
+                        yield chunk
+
+            if key is not None:
+                self.tts_cache.store(key, TTS_OUTPUT_FORMAT, relay())
+            elif not sum(len(chunk) for chunk in relay()):
+                raise ValueError("no audio received")
+
+        try:
+            await elevenlabs_pool.run(download)
+            # TTS is billed by character, so count characters as the tokens sent
+            record_llm_tokens("elevenlabs", len(speech_text), None)
+            broadcast.finish()
         except Exception as e:
             print(f"Error generating audio: {e}")
-            return None
+            broadcast.finish(e)
+        except asyncio.CancelledError as e:
+            cancelled.set()
+            broadcast.finish(e)
+            raise
+        finally:
+            self.audio_streams.pop(key, None)
 
-    async def generate_complete_response(self, context: AyoraContext, context_data: Optional[Dict] = None) -> Dict[str, Any]:
+    async def generate_complete_response(self, context: AyoraContext, context_data: Optional[Dict] = None,
+                                         stream_audio: bool = False) -> Dict[str, Any]:
         """Generate complete Ayora response with speech, animations, and audio"""
         
-        # Generate speech text
-        speech_text = self.generate_speech_text(context, context_data)
+        # Generate speech text, with its audio already underway when pipelined
+        stitched = None
+        if self.pipeline_ready():
+            speech_text, stitched = await self.generate_speech_pipelined(context, context_data)
+        else:
+            speech_text = await self.generate_speech_text(context, context_data)
         
         # Calculate animation sequence
         animation_sequence = self.calculate_animation_sequence(speech_text)
         
-        # Generate audio (optional)
-        audio_filename = await self.generate_audio_stream(speech_text)
+        # Generate audio (optional); when streaming, return at once with a URL the audio will play from
+        if stitched and stream_audio:
+            audio_filename = None
+            audio_url = f"/api/ayora/audio/{self.audio_key(speech_text)}"
+        elif stitched:
+            await stitched.wait()
+            audio_filename = None if stitched.error else self.tts_cache.get(self.audio_key(speech_text), TTS_OUTPUT_FORMAT)
+            audio_url = f"/Audio/{audio_filename}" if audio_filename else None
+        elif stream_audio:
+            audio_filename = None
+            audio_url = self.audio_url_for(speech_text)
+        else:
+            audio_filename = await self.generate_audio_stream(speech_text)
+            audio_url = f"/Audio/{audio_filename}" if audio_filename else None
         
         # Calculate total duration
         total_duration = self.animation_config["waving_duration"] + (len(speech_text.split()) / 150) * 60
@@ -251,6 +484,7 @@ class AyoraVoiceEngine:
             "context": context.value,
             "estimated_duration": total_duration,
             "audio_filename": audio_filename,
+            "audio_url": audio_url,
             "error": None
         }
 
@@ -258,11 +492,11 @@ class AyoraVoiceEngine:
 ayora_voice = AyoraVoiceEngine()
 
 # Convenience functions for API
-async def generate_landing_introduction() -> Dict[str, Any]:
+async def generate_landing_introduction(stream_audio: bool = False) -> Dict[str, Any]:
     """Generate landing introduction"""
-    return await ayora_voice.generate_complete_response(AyoraContext.LANDING_INTRODUCTION)
+    return await ayora_voice.generate_complete_response(AyoraContext.LANDING_INTRODUCTION, stream_audio=stream_audio)
 
-async def generate_contextual_speech(context: str, context_data: Optional[Dict] = None) -> Dict[str, Any]:
+async def generate_contextual_speech(context: str, context_data: Optional[Dict] = None, stream_audio: bool = False) -> Dict[str, Any]:
     """Generate contextual speech"""
     context_map = {
         "landing_introduction": AyoraContext.LANDING_INTRODUCTION,
@@ -276,4 +510,4 @@ async def generate_contextual_speech(context: str, context_data: Optional[Dict]
     if not context_enum:
         raise ValueError(f"Invalid context: {context}")
     
-    return await ayora_voice.generate_complete_response(context_enum, context_data)
+    return await ayora_voice.generate_complete_response(context_enum, context_data, stream_audio=stream_audio)
@@ -0,0 +1,116 @@
+"""
+DB Session Benchmark - sync Session vs AsyncSession under concurrent load
+Run from the backend directory: python benchmarks/db_sessions.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from typing import Dict, List
+
+# Point the app at a throwaway database before it is imported
+DB_DIR = tempfile.mkdtemp(prefix="cyberquest_bench_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'bench.db')}"
+os.environ["PREGENERATE_COURSES"] = "false"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import select  # noqa: E402
+from app import Base, engine, SessionLocal, AsyncSessionLocal, User, CourseProgress, COURSES  # noqa: E402
+
+
+def seed(users: int):
+    """Create users with progress on every course"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        for i in range(users):
+            user = User(name=f"bench-{i}", age=12, experience_level="beginner", interests="games")
+            db.add(user)
+            db.flush()
+            for course_id in COURSES:
+                db.add(CourseProgress(user_id=user.id, course_id=course_id, completed=True, score=80.0,
+                                      course_content="x" * 4000))
+        db.commit()
+    finally:
+        db.close()
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def measure_loop_lag(stop: asyncio.Event, samples: List[float], interval: float = 0.005):
+    """Record how late the event loop wakes a sleeping task"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append((loop.time() - start - interval) * 1000)
+
+
+async def sync_request(user_id: int):
+    # What the routes did before: blocking queries inside an async handler
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.id == user_id).first()
+        db.query(CourseProgress).filter(CourseProgress.user_id == user_id).all()
+    finally:
+        db.close()
+
+
+async def async_request(user_id: int):
+    async with AsyncSessionLocal() as db:
+        await db.get(User, user_id)
+        (await db.execute(select(CourseProgress).where(CourseProgress.user_id == user_id))).scalars().all()
+
+
+async def run(mode: str, users: int, concurrency: int, requests: int) -> Dict[str, float]:
+    handler = sync_request if mode == "sync" else async_request
+    latencies: List[float] = []
+    lag: List[float] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.ensure_future(measure_loop_lag(stop, lag))
+    counter = iter(range(requests))
+
+    async def client():
+        for n in counter:
+            start = time.perf_counter()
+            await handler(n % users + 1)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_task
+
+    return {
+        "throughput_rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": percentile(latencies, 99),
+        "loop_lag_p99_ms": percentile(lag, 99) if lag else 0.0,
+        "loop_lag_max_ms": max(lag) if lag else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sync and async DB sessions under concurrent load")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    seed(args.users)
+    print(f"📊 {args.requests} requests, concurrency {args.concurrency}, {args.users} users")
+    for mode in ("sync", "async"):
+        result = asyncio.run(run(mode, args.users, args.concurrency, args.requests))
+        print(f"{mode:>5}: " + ", ".join(f"{key}={value:.2f}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
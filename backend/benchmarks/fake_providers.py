@@ -0,0 +1,236 @@
+"""
+Fake AI Providers - local stand-ins for the Gemini, OpenAI and ElevenLabs APIs
+Run from the backend directory: python benchmarks/fake_providers.py --port 8765 --latency-ms 800
+"""
+
+import json
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+
+@dataclass
+class FaultConfig:
+    latency_ms: float = 800.0  # Time to first byte
+    jitter_ms: float = 200.0  # Uniform +/- spread on the latency
+    chunk_delay_ms: float = 40.0  # Gap between streamed chunks
+    failure_rate: float = 0.0  # Share of calls answered with a 500 or 429
+    timeout_rate: float = 0.0  # Share of calls that hang past any client timeout
+    malformed_rate: float = 0.0  # Share of Gemini courses wrapped in fences or cut short
+    audio_bytes: int = 48000  # Size of a fake MP3 (about 12 s at 32 kbps)
+    seed: int = 0
+
+
+def sample_course(topic: str, rng: random.Random) -> Dict[str, Any]:
+    """A course shaped like the one the prompt asks Gemini for"""
+    questions = []
+    for i in range(5):
+        questions.append({
+            "question": f"Question {i + 1} about {topic}?",
+            "options": ["Option A", "Option B", "Option C", "Option D"],
+            "correct_answer": rng.randrange(4),
+            "explanation": f"Explanation for question {i + 1}."
+        })
+    lesson = " ".join(f"Lesson sentence {i} about staying safe with {topic}." for i in range(120))
+    return {
+        "content": f"<h2>{topic}</h2><p>{lesson}</p>",
+        "exercises": [
+            {"type": "scenario", "title": f"{topic} challenge {i + 1}", "description": "Decide what to do.",
+             "options": ["Ask an adult", "Click the link"], "correct_answer": 0}
+            for i in range(3)
+        ],
+        "quiz": {"questions": questions}
+    }
+
+
+def malform(text: str, rng: random.Random) -> str:
+    """The ways real model output breaks json.loads"""
+    if rng.random() < 0.5:
+        return f"```json\n{text}\n```"
+    return text[:int(len(text) * rng.uniform(0.6, 0.95))]
+
+
+def split_text(text: str, pieces: int) -> List[str]:
+    size = max(1, len(text) // pieces)
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def create_app(config: FaultConfig) -> FastAPI:
+    app = FastAPI(title="Fake AI providers")
+    rng = random.Random(config.seed)
+    app.state.calls = {"gemini": 0, "openai": 0, "elevenlabs": 0}
+
+    async def inject(provider: str):
+        """Wait out the configured latency; returns an error response when a fault is drawn"""
+        app.state.calls[provider] += 1
+        draw = rng.random()
+        if draw < config.timeout_rate:
+            await asyncio.sleep(60)  # Far past the provider timeout the load test gives the app
+        delay = max(0.0, config.latency_ms + rng.uniform(-config.jitter_ms, config.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        if draw < config.timeout_rate + config.failure_rate:
+            status = 429 if rng.random() < 0.5 else 500
+            return JSONResponse({"error": {"code": status, "message": f"Injected {provider} failure"}}, status_code=status)
+        return None
+
+    def course_text(prompt: str) -> str:
+        topic = "online safety"
+        for line in prompt.splitlines():
+            if line.strip().startswith("Course:"):
+                topic = line.split(":", 1)[1].split(" - ")[0].strip() or topic
+                break
+        text = json.dumps(sample_course(topic, rng))
+        if rng.random() < config.malformed_rate:
+            text = malform(text, rng)
+        return text
+
+    @app.post("/v1beta/models/{model_action}")
+    async def gemini(model_action: str, request: Request):
+        # The SDK's REST transport calls models/<model>:generateContent or :streamGenerateContent
+        body = await request.json()
+        prompt = "".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+        error = await inject("gemini")
+        if error:
+            return error
+
+        text = course_text(prompt)
+        prompt_tokens, output_tokens = len(prompt) // 4, len(text) // 4
+
+        def chunk(piece: str, last: bool) -> Dict[str, Any]:
+            candidate = {"content": {"parts": [{"text": piece}], "role": "model"}, "index": 0}
+            result = {"candidates": [candidate]}
+            if last:
+                candidate["finishReason"] = 1  # STOP
+                result["usageMetadata"] = {"promptTokenCount": prompt_tokens, "candidatesTokenCount": output_tokens,
+                                           "totalTokenCount": prompt_tokens + output_tokens}
+            return result
+
+        if not model_action.endswith(":streamGenerateContent"):
+            return chunk(text, True)
+
+        async def stream() -> AsyncIterator[bytes]:
+            # A JSON array delivered element by element, as the REST transport expects
+            pieces = split_text(text, 20)
+            yield b"["
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(config.chunk_delay_ms / 1000)
+                    yield b",\n"
+                yield json.dumps(chunk(piece, i == len(pieces) - 1)).encode()
+            yield b"]"
+
+        return StreamingResponse(stream(), media_type="application/json")
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat(request: Request):
+        body = await request.json()
+        error = await inject("openai")
+        if error:
+            return error
+        prompt = " ".join(message.get("content", "") for message in body.get("messages", []))
+        text = ("Hi there! I'm Ayora, your cybersecurity guide. Every strong password is a shield. "
+                "Let's learn to spot tricky messages together. Ready for an adventure? Let's go!")
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if body.get("stream"):
+            async def stream() -> AsyncIterator[bytes]:
+                # Server-sent chunks a few words at a time, then usage and [DONE] as with stream_options.include_usage
+                base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0, "model": body.get("model", "fake")}
+                words = text.split(" ")
+                for i in range(0, len(words), 3):
+                    if i:
+                        await asyncio.sleep(config.chunk_delay_ms / 1000)
+                    piece = " ".join(words[i:i + 3]) + (" " if i + 3 < len(words) else "")
+                    choice = {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+                    yield f"data: {json.dumps({**base, 'choices': [choice]})}\n\n".encode()
+                choice = {"index": 0, "delta": {}, "finish_reason": "stop"}
+                yield f"data: {json.dumps({**base, 'choices': [choice]})}\n\n".encode()
+                yield f"data: {json.dumps({**base, 'choices': [], 'usage': usage})}\n\n".encode()
+                yield b"data: [DONE]\n\n"
+
+            return StreamingResponse(stream(), media_type="text/event-stream")
+
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage
+        }
+
+    @app.post("/v1/text-to-speech/{voice_id}")
+    @app.post("/v1/text-to-speech/{voice_id}/stream")
+    async def elevenlabs_tts(voice_id: str, request: Request):
+        await request.body()
+        error = await inject("elevenlabs")
+        if error:
+            return error
+
+        async def stream() -> AsyncIterator[bytes]:
+            # Frame-sync header so players accept it, then filler in 4 KB chunks
+            sent = 0
+            while sent < config.audio_bytes:
+                size = min(4096, config.audio_bytes - sent)
+                yield (b"\xff\xf3" + bytes(size - 2)) if sent == 0 else bytes(size)
+                sent += size
+                await asyncio.sleep(config.chunk_delay_ms / 1000)
+
+        return StreamingResponse(stream(), media_type="audio/mpeg")
+
+    @app.get("/calls")
+    async def calls():
+        return app.state.calls
+
+    @app.get("/health")
+    async def health():
+        return Response("ok")
+
+    return app
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser):
+    defaults = FaultConfig()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms)
+    parser.add_argument("--chunk-delay-ms", type=float, default=defaults.chunk_delay_ms)
+    parser.add_argument("--failure-rate", type=float, default=defaults.failure_rate)
+    parser.add_argument("--timeout-rate", type=float, default=defaults.timeout_rate)
+    parser.add_argument("--malformed-rate", type=float, default=defaults.malformed_rate)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def fault_arguments(args: argparse.Namespace) -> List[str]:
+    """The fault options as command-line arguments, to pass on to a fake server process"""
+    return [
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--chunk-delay-ms", str(args.chunk_delay_ms), "--failure-rate", str(args.failure_rate),
+        "--timeout-rate", str(args.timeout_rate), "--malformed-rate", str(args.malformed_rate),
+        "--seed", str(args.seed)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake Gemini, OpenAI and ElevenLabs APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    import uvicorn
+    config = FaultConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, chunk_delay_ms=args.chunk_delay_ms,
+        failure_rate=args.failure_rate, timeout_rate=args.timeout_rate, malformed_rate=args.malformed_rate,
+        seed=args.seed
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Import Time Budget - measures `import app` with python -X importtime
+Run from the backend directory: python benchmarks/import_time.py
+Exits non-zero when the import exceeds the budget or pulls in a lazily loaded SDK
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+import tempfile
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# SDKs that must only load on first use
+LAZY_MODULES = ["google.generativeai", "openai", "elevenlabs"]
+
+
+def measure(module: str) -> Tuple[int, Dict[str, Tuple[int, int]]]:
+    """Import the module in a fresh interpreter; returns its cumulative time and per-module (self, cumulative) in us"""
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='cyberquest_import_'), 'import.db')}"
+    env.pop("GEMINI_API_KEY", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules[module][1], modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the backend import time against a budget")
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", 1500)))
+    parser.add_argument("--runs", type=int, default=3, help="best of N runs, to ignore a cold disk cache")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs: List[Tuple[int, Dict[str, Tuple[int, int]]]] = [measure(args.module) for _ in range(args.runs)]
+    total_us, modules = min(runs, key=lambda run: run[0])
+
+    print(f"📊 import {args.module}: {total_us / 1000:.0f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    print("Slowest modules by self time:")
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms self {cumulative_us / 1000:8.1f} ms total  {name}")
+
+    failures = []
+    if total_us / 1000 > args.budget_ms:
+        failures.append(f"import took {total_us / 1000:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    for name in LAZY_MODULES:
+        if name in modules:
+            failures.append(f"{name} is imported eagerly; it should load on first use")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ Within budget")
+
+
+if __name__ == "__main__":
+    main()
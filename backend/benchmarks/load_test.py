@@ -0,0 +1,338 @@
+"""
+Load Test - drives a realistic traffic mix against the app backed by fake AI providers
+Run from the backend directory: python benchmarks/load_test.py --profile default
+Compares throughput and p50/p95/p99 latency with benchmarks/baselines.json and exits non-zero on a regression
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCHMARK_DIR, "..")
+BASELINES_PATH = os.path.join(BENCHMARK_DIR, "baselines.json")
+
+sys.path.insert(0, BENCHMARK_DIR)
+from fake_providers import add_fault_arguments, fault_arguments  # noqa: E402
+
+# Settings per profile; command-line options override them
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "smoke": {"users": 8, "duration": 10, "latency_ms": 100, "jitter_ms": 20},
+    "default": {"users": 32, "duration": 30, "latency_ms": 800, "jitter_ms": 200},
+    "faults": {"users": 32, "duration": 30, "latency_ms": 800, "jitter_ms": 200,
+               "failure_rate": 0.05, "timeout_rate": 0.01, "malformed_rate": 0.1},
+}
+
+# Relative weight of each action a learner takes after signing up
+MIX = {
+    "dashboard": 30,
+    "leaderboard": 20,
+    "generate_course": 15,
+    "submit_quiz": 15,
+    "validate_exercise": 10,
+    "companion": 10,
+    "create_user": 5,
+}
+
+AGES = [8, 10, 12, 14, 16]
+LEVELS = ["Beginner", "Intermediate", "Advanced"]
+INTERESTS = ["games", "art", "music", "sports", "science", "animals", "coding"]
+PASSWORDS = ["password123", "Tr0ub4dor&3", "correct horse battery staple", "qwerty!", "S3cure-Penguin-42"]
+COMPANION_CONTEXTS = ["module_explanation", "quiz_encouragement", "achievement_celebration", "help_guidance"]
+EMAILS = [
+    "From: security@paypa1.com\nSubject: URGENT verify your account\n\nClick http://paypa1-login.xyz now or lose access!",
+    "From: teacher@school.org\nSubject: Homework\n\nDon't forget the reading for Monday."
+]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited during startup with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout:.0f} s")
+
+
+def start_servers(args: argparse.Namespace, work_dir: str) -> List[subprocess.Popen]:
+    """Boot the fake providers and the app pointed at them; returns both processes"""
+    fake_port, app_port = free_port(), free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    fakes = subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARK_DIR, "fake_providers.py"), "--port", str(fake_port)] + fault_arguments(args),
+        cwd=BACKEND_DIR
+    )
+    wait_until_ready(f"{fake_url}/health", fakes)
+
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(work_dir, 'load.db')}",
+        "GEMINI_API_KEY": "fake-key",
+        "GEMINI_API_ENDPOINT": fake_url,
+        "GEMINI_TIMEOUT_SECONDS": str(args.provider_timeout),
+        "OPENAI_API_KEY": "fake-key",
+        "OPENAI_BASE_URL": f"{fake_url}/v1",
+        "ELEVENLABS_API_KEY": "fake-key",
+        "ELEVENLABS_BASE_URL": fake_url,
+        "PREGENERATE_COURSES": "true" if args.pregenerate else "false",
+        "METRICS_DIR": os.path.join(work_dir, "metrics"),
+        "TTS_CACHE_DIR": os.path.join(work_dir, "tts_cache"),
+    })
+    os.makedirs(env["METRICS_DIR"], exist_ok=True)
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(app_port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    wait_until_ready(f"http://127.0.0.1:{app_port}/api/courses", app)
+    args.app_url, args.fake_url = f"http://127.0.0.1:{app_port}", fake_url
+    return [fakes, app]
+
+
+class Learner:
+    """One simulated user clicking through the app"""
+
+    def __init__(self, client: httpx.AsyncClient, rng: random.Random, course_ids: List[str], record):
+        self.client = client
+        self.rng = rng
+        self.course_ids = course_ids
+        self.record = record
+        self.user_id: Optional[int] = None
+        self.quizzes: Dict[str, int] = {}  # Generated course -> number of questions
+
+    async def timed(self, scenario: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.record(scenario, (time.perf_counter() - start) * 1000, ok)
+        return response if ok else None
+
+    async def create_user(self):
+        response = await self.timed("create_user", "POST", "/api/users", json={
+            "name": f"load-{self.rng.randrange(10 ** 9)}",
+            "age": self.rng.choice(AGES),
+            "experience_level": self.rng.choice(LEVELS),
+            "interests": self.rng.sample(INTERESTS, 2)
+        })
+        if response is not None:
+            self.user_id = response.json()["id"]
+            self.quizzes = {}
+
+    async def generate_course(self):
+        course_id = self.rng.choice(self.course_ids)
+        response = await self.timed("generate_course", "POST", "/api/courses/generate",
+                                    json={"user_id": self.user_id, "course_id": course_id})
+        if response is not None:
+            self.quizzes[course_id] = len(response.json().get("quiz", {}).get("questions", []))
+
+    async def submit_quiz(self):
+        if not self.quizzes:
+            return await self.generate_course()
+        course_id = self.rng.choice(list(self.quizzes))
+        answers = {str(i): self.rng.randrange(4) for i in range(self.quizzes[course_id])}
+        await self.timed("submit_quiz", "POST", "/api/courses/submit-quiz",
+                         json={"user_id": self.user_id, "course_id": course_id, "answers": answers})
+
+    async def dashboard(self):
+        # The dashboard page loads progress and the course list together
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            self.client.get(f"/api/users/{self.user_id}/progress"),
+            self.client.get("/api/courses"),
+            return_exceptions=True
+        )
+        ok = all(isinstance(response, httpx.Response) and response.status_code < 400 for response in responses)
+        self.record("dashboard", (time.perf_counter() - start) * 1000, ok)
+
+    async def leaderboard(self):
+        await self.timed("leaderboard", "GET", "/api/leaderboard")
+
+    async def validate_exercise(self):
+        if self.rng.random() < 0.5:
+            body = {"type": "password", "answer": self.rng.choice(PASSWORDS)}
+        else:
+            body = {"type": "email", "answer": self.rng.choice(EMAILS)}
+        await self.timed("validate_exercise", "POST", "/api/exercises/validate", json=body)
+
+    async def companion(self):
+        # Ayora's speech goes to the fake OpenAI and ElevenLabs servers
+        await self.timed("companion", "POST", "/api/ayora/contextual-speech",
+                         json={"context": self.rng.choice(COMPANION_CONTEXTS), "context_data": {"user_id": self.user_id}})
+
+    async def run(self, deadline: float, think_ms: float):
+        await self.create_user()
+        actions, weights = list(MIX), list(MIX.values())
+        while time.monotonic() < deadline:
+            if self.user_id is None:
+                await self.create_user()
+            else:
+                await getattr(self, self.rng.choices(actions, weights)[0])()
+            await asyncio.sleep(self.rng.uniform(0, 2 * think_ms) / 1000)
+
+
+async def drive(args: argparse.Namespace) -> Dict[str, Any]:
+    samples: Dict[str, List[float]] = {name: [] for name in MIX}
+    errors: Dict[str, int] = {name: 0 for name in MIX}
+
+    def record(scenario: str, latency_ms: float, ok: bool):
+        if ok:
+            samples[scenario].append(latency_ms)
+        else:
+            errors[scenario] += 1
+
+    limits = httpx.Limits(max_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=args.app_url, timeout=args.request_timeout, limits=limits) as client:
+        course_ids = list((await client.get("/api/courses")).json()["courses"])
+        rng = random.Random(args.seed)
+        learners = [Learner(client, random.Random(rng.random()), course_ids, record) for _ in range(args.users)]
+        started = time.perf_counter()
+        await asyncio.gather(*[learner.run(time.monotonic() + args.duration, args.think_ms) for learner in learners])
+        elapsed = time.perf_counter() - started
+        provider_calls = httpx.get(f"{args.fake_url}/calls").json()
+
+    def summarize(latencies: List[float], failed: int) -> Dict[str, float]:
+        count = len(latencies) + failed
+        return {
+            "count": count,
+            "error_rate": round(failed / count, 4) if count else 0.0,
+            "throughput_rps": round(count / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50), 1) if latencies else 0.0,
+            "p95_ms": round(percentile(latencies, 95), 1) if latencies else 0.0,
+            "p99_ms": round(percentile(latencies, 99), 1) if latencies else 0.0,
+        }
+
+    everything = [latency for latencies in samples.values() for latency in latencies]
+    return {
+        "scenarios": {name: summarize(samples[name], errors[name]) for name in MIX},
+        "total": summarize(everything, sum(errors.values())),
+        "provider_calls": provider_calls,
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, slack_ms: float) -> List[str]:
+    """Regressions against the stored baseline; a small absolute slack keeps fast routes from flapping"""
+    regressions = []
+    measured = dict(result["scenarios"], total=result["total"])
+    expected = dict(baseline["scenarios"], total=baseline["total"])
+    for name, stats in expected.items():
+        current = measured.get(name)
+        if not current or not stats["count"]:
+            continue
+        # p99 is reported but too noisy over a short run to gate on
+        for key in ("p50_ms", "p95_ms"):
+            limit = stats[key] * (1 + tolerance) + slack_ms
+            if current[key] > limit:
+                regressions.append(f"{name} {key} {current[key]:.1f} > {limit:.1f} (baseline {stats[key]:.1f})")
+        if current["throughput_rps"] < stats["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name} throughput {current['throughput_rps']:.2f} rps < baseline {stats['throughput_rps']:.2f}")
+        if current["error_rate"] > stats["error_rate"] + 0.02:
+            regressions.append(f"{name} error rate {current['error_rate']:.1%} > baseline {stats['error_rate']:.1%}")
+    return regressions
+
+
+def print_report(result: Dict[str, Any]):
+    print(f"{'scenario':>18} {'count':>7} {'errors':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in list(result["scenarios"].items()) + [("total", result["total"])]:
+        print(f"{name:>18} {stats['count']:>7} {stats['error_rate']:>7.1%} {stats['throughput_rps']:>8.2f} "
+              f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+    print("Provider calls: " + ", ".join(f"{name}={count}" for name, count in result["provider_calls"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the app against fake AI providers")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    parser.add_argument("--users", type=int, help="concurrent simulated learners")
+    parser.add_argument("--duration", type=float, help="seconds to run")
+    parser.add_argument("--think-ms", type=float, default=100.0, help="mean pause between a learner's actions")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--pregenerate", action="store_true", help="leave course pregeneration on")
+    parser.add_argument("--provider-timeout", type=float, default=10.0, help="GEMINI_TIMEOUT_SECONDS for the app")
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown against the baseline")
+    parser.add_argument("--slack-ms", type=float, default=25.0, help="allowed absolute slowdown against the baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the profile's baseline")
+    parser.add_argument("--json", help="also write the results to this file")
+    add_fault_arguments(parser)
+    parser.set_defaults(latency_ms=None, jitter_ms=None, failure_rate=None, timeout_rate=None, malformed_rate=None)
+    args = parser.parse_args()
+
+    # Fill anything not given on the command line from the profile, then the fake server defaults
+    defaults = {"users": 32, "duration": 30, "latency_ms": 800, "jitter_ms": 200,
+                "failure_rate": 0.0, "timeout_rate": 0.0, "malformed_rate": 0.0}
+    defaults.update(PROFILES[args.profile])
+    for key, value in defaults.items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+
+    processes = start_servers(args, tempfile.mkdtemp(prefix="cyberquest_load_"))
+    try:
+        print(f"📊 {args.profile}: {args.users} learners for {args.duration:.0f} s, provider latency "
+              f"{args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, failures {args.failure_rate:.0%}, "
+              f"timeouts {args.timeout_rate:.0%}, malformed {args.malformed_rate:.0%}")
+        result = asyncio.run(drive(args))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    baselines = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH) as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        result["settings"] = {key: getattr(args, key) for key in ("users", "duration", "think_ms", "workers", *defaults)}
+        baselines[args.profile] = result
+        with open(BASELINES_PATH, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"✅ Saved the {args.profile} baseline to {BASELINES_PATH}")
+        return
+
+    if args.profile not in baselines:
+        print(f"⚠️ No {args.profile} baseline yet; run with --save-baseline to record one")
+        return
+    regressions = compare(result, baselines[args.profile], args.tolerance, args.slack_ms)
+    for regression in regressions:
+        print(f"❌ {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"✅ No regressions against the {args.profile} baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Content Store - content-addressed, compressed course documents
+Identical generated courses are stored once and referenced by hash
+"""
+
+import json
+import zlib
+import hashlib
+from typing import Any, Dict, Tuple
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+if ZSTD_AVAILABLE:
+    _zstd_compressor = zstandard.ZstdCompressor(level=10)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+
+
+def canonical_json(content: Dict[str, Any]) -> bytes:
+    """Serialize a document so equal content always yields equal bytes"""
+    return json.dumps(content, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def content_hash(data: bytes) -> str:
+    """Address of a serialized document"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def compress(data: bytes) -> Tuple[str, bytes]:
+    """Compress with zstd when installed, otherwise zlib; returns (encoding, payload)"""
+    if ZSTD_AVAILABLE:
+        return "zstd", _zstd_compressor.compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def decompress(encoding: str, payload: bytes) -> bytes:
+    """Reverse compress() for either encoding"""
+    if encoding == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Course content is zstd-compressed but the zstandard package is not installed")
+        return _zstd_decompressor.decompress(payload)
+    if encoding == "zlib":
+        return zlib.decompress(payload)
+    return payload
+
+
+def encode_document(content: Dict[str, Any]) -> Tuple[str, str, bytes, int]:
+    """Prepare a document for storage; returns (hash, encoding, payload, raw size)"""
+    data = canonical_json(content)
+    encoding, payload = compress(data)
+    return content_hash(data), encoding, payload, len(data)
+
+
+def decode_document(encoding: str, payload: bytes) -> Dict[str, Any]:
+    """Load a stored document"""
+    return json.loads(decompress(encoding, payload))
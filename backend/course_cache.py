@@ -0,0 +1,54 @@
+"""
+Course Content Cache - shares generated courses between similar learners
+Keys courses by a normalized personalization signature with LRU/TTL eviction
+"""
+
+import os
+import json
+import hashlib
+from typing import List
+
+from lru_cache import LRUTTLCache
+
+# Bump when the course prompt changes so stale generations stop matching
+PROMPT_VERSION = 1
+
+AGE_BANDS = [
+    (0, 9, "8-9"),
+    (10, 12, "10-12"),
+    (13, 15, "13-15"),
+    (16, 200, "16-18"),
+]
+
+
+def age_band(age: int) -> str:
+    """Map an exact age onto the band used for content generation"""
+    for low, high, label in AGE_BANDS:
+        if low <= age <= high:
+            return label
+    return AGE_BANDS[-1][2]
+
+
+def normalize_interests(interests: List[str]) -> List[str]:
+    """Lowercase, trim and de-duplicate interests into a stable order"""
+    return sorted({interest.strip().lower() for interest in interests if interest and interest.strip()})
+
+
+def personalization_signature(course_id: str, age: int, experience_level: str, interests: List[str]) -> str:
+    """Content-address a course by everything that shapes its prompt"""
+    profile = {
+        "v": PROMPT_VERSION,
+        "course_id": course_id,
+        "age_band": age_band(age),
+        "experience_level": (experience_level or "").strip().lower(),
+        "interests": normalize_interests(interests),
+    }
+    encoded = json.dumps(profile, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def create_cache_from_env() -> LRUTTLCache:
+    """Build a cache configured by COURSE_CACHE_MAX_ENTRIES and COURSE_CACHE_TTL_SECONDS"""
+    max_entries = int(os.getenv("COURSE_CACHE_MAX_ENTRIES", 512))
+    ttl_seconds = float(os.getenv("COURSE_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+    return LRUTTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
@@ -0,0 +1,216 @@
+"""
+Course Stream Parser - incremental parsing of streamed course JSON
+Emits lesson text as it arrives and each other section once it is complete
+"""
+
+import json
+from typing import Any, List, Tuple
+
+WHITESPACE = " \t\r\n"
+
+# Top-level keys whose values are emitted as soon as they are complete
+SECTION_KEYS = ("exercises", "quiz")
+
+
+class CourseStreamParser:
+    def __init__(self):
+        """Scan a course document chunk by chunk without re-parsing the prefix"""
+        self._buffer = ""
+        self._pos = 0
+        self._state = "seek_object"
+        self._key = None
+        self._value_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.content_streamed = False
+        self.sections_emitted = set()
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk of model output and return the events it completes"""
+        self._buffer += chunk
+        events: List[Tuple[str, Any]] = []
+
+        while self._pos < len(self._buffer) and self._state != "finished":
+            before = (self._state, self._pos)
+            getattr(self, f"_step_{self._state}")(events)
+            if (self._state, self._pos) == before:
+                break  # Need more input
+
+        return events
+
+    @property
+    def finished(self) -> bool:
+        return self._state == "finished"
+
+    def _skip_whitespace(self):
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+            self._pos += 1
+
+    def _step_seek_object(self, events):
+        # Anything before the first brace (markdown fences, chatter) is ignored
+        brace = self._buffer.find("{", self._pos)
+        if brace == -1:
+            self._pos = len(self._buffer)
+            return
+        self._pos = brace + 1
+        self._state = "key"
+
+    def _step_key(self, events):
+        self._skip_whitespace()
+        if self._pos >= len(self._buffer):
+            return
+
+        char = self._buffer[self._pos]
+        if char == "}":
+            self._pos += 1
+            self._state = "finished"
+            return
+        if char == ",":
+            self._pos += 1
+            return
+        if char != '"':
+            # Not valid JSON; stop scanning and leave recovery to the final parse
+            self._state = "finished"
+            return
+
+        end = self._find_string_end(self._pos + 1)
+        if end == -1:
+            return
+        self._key = json.loads(self._buffer[self._pos:end + 1])
+        self._pos = end + 1
+        self._state = "colon"
+
+    def _step_colon(self, events):
+        self._skip_whitespace()
+        if self._pos >= len(self._buffer):
+            return
+        if self._buffer[self._pos] != ":":
+            self._state = "finished"
+            return
+        self._pos += 1
+        self._state = "value_start"
+
+    def _step_value_start(self, events):
+        self._skip_whitespace()
+        if self._pos >= len(self._buffer):
+            return
+
+        if self._key == "content" and self._buffer[self._pos] == '"':
+            self._pos += 1
+            self._state = "content_string"
+            return
+
+        self._value_start = self._pos
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._state = "value"
+
+    def _step_content_string(self, events):
+        text = []
+        buffer = self._buffer
+
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+            if char == '"':
+                self._pos += 1
+                self._state = "key"
+                break
+            if char != "\\":
+                text.append(char)
+                self._pos += 1
+                continue
+
+            escape_length = self._escape_length(self._pos)
+            if escape_length == -1:
+                break  # Escape sequence split across chunks
+            escape = buffer[self._pos:self._pos + escape_length]
+            try:
+                text.append(json.loads('"' + escape + '"'))
+            except ValueError:
+                text.append(escape)
+            self._pos += escape_length
+
+        if text:
+            self.content_streamed = True
+            events.append(("content", "".join(text)))
+
+    def _step_value(self, events):
+        buffer = self._buffer
+
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                if self._depth == 0:
+                    # Closing brace of the document ends a primitive value
+                    self._finish_value(self._pos, events)
+                    return
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pos += 1
+                    self._finish_value(self._pos, events)
+                    return
+            elif char == "," and self._depth == 0:
+                self._finish_value(self._pos, events)
+                return
+
+            self._pos += 1
+
+    def _finish_value(self, end: int, events):
+        self._state = "key"
+        if self._key not in SECTION_KEYS:
+            return
+        try:
+            value = json.loads(self._buffer[self._value_start:end])
+        except ValueError:
+            return
+        self.sections_emitted.add(self._key)
+        events.append((self._key, value))
+
+    def _find_string_end(self, start: int) -> int:
+        """Index of the closing quote of a string starting at start, or -1"""
+        pos = start
+        while pos < len(self._buffer):
+            char = self._buffer[pos]
+            if char == "\\":
+                pos += 2
+                continue
+            if char == '"':
+                return pos
+            pos += 1
+        return -1
+
+    def _escape_length(self, pos: int) -> int:
+        """Length of the escape sequence at pos, or -1 if it isn't complete yet"""
+        buffer = self._buffer
+        if pos + 1 >= len(buffer):
+            return -1
+        if buffer[pos + 1] != "u":
+            return 2
+        if pos + 6 > len(buffer):
+            return -1
+
+        # A high surrogate must be decoded together with its low surrogate
+        try:
+            code_point = int(buffer[pos + 2:pos + 6], 16)
+        except ValueError:
+            return 6
+        if 0xD800 <= code_point <= 0xDBFF:
+            if pos + 12 > len(buffer):
+                return -1
+            if buffer[pos + 6:pos + 8] == "\\u":
+                return 12
+        return 6
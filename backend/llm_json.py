@@ -0,0 +1,391 @@
+"""
+LLM JSON - tolerant extraction, repair and schema checks for model output
+Recovers JSON wrapped in markdown fences or chatter, with trailing commas or cut off mid-document
+"""
+
+import json
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+WHITESPACE = " \t\r\n"
+LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+NUMBER_CHARS = set("+-0123456789.eE")
+
+_decoder = json.JSONDecoder()
+
+# Braces in chatter before the document are skipped, up to this many
+MAX_STARTS = 16
+
+
+class Truncated(Exception):
+    """The text ended inside a value"""
+
+
+class Extraction(NamedTuple):
+    value: Any
+    repairs: List[str]  # What had to be fixed; empty when the text was valid JSON
+    truncated: Set[str]  # Top-level keys whose values were cut off
+
+
+class TolerantParser:
+    def __init__(self, text: str):
+        """Recursive-descent JSON parser that closes whatever the text leaves open"""
+        self.text = text
+        self.pos = 0
+        self.repairs: List[str] = []
+        self.truncated: Set[str] = set()
+        self.depth = 0
+        self.cut = False  # Set once the text has run out inside a container
+
+    def repair(self, note: str):
+        if note not in self.repairs:
+            self.repairs.append(note)
+
+    def skip(self):
+        text, pos = self.text, self.pos
+        while pos < len(text):
+            if text[pos] in WHITESPACE:
+                pos += 1
+            elif text.startswith("//", pos):
+                end = text.find("\n", pos)
+                pos = len(text) if end == -1 else end
+                self.repair("removed comments")
+            else:
+                break
+        self.pos = pos
+
+    def peek(self) -> str:
+        self.skip()
+        if self.pos >= len(self.text):
+            raise Truncated()
+        return self.text[self.pos]
+
+    def value(self) -> Any:
+        char = self.peek()
+        if char == "{":
+            return self.object()
+        if char == "[":
+            return self.array()
+        if char in "\"'":
+            return self.string()
+        return self.primitive()
+
+    def object(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        self.pos += 1
+        self.depth += 1
+        key = None
+        try:
+            while True:
+                char = self.peek()
+                if char == "}":
+                    self.pos += 1
+                    return result
+                if char == ",":
+                    self.pos += 1
+                    if self.peek() == "}":
+                        self.repair("removed trailing commas")
+                    continue
+                if char not in "\"'":
+                    raise ValueError(f"expected a key at {self.pos}")
+                key = self.string()
+                if self.peek() != ":":
+                    raise ValueError(f"expected ':' at {self.pos}")
+                self.pos += 1
+                result[key] = self.value()
+                if self.cut and self.depth == 1:
+                    self.truncated.add(key)
+                key = None
+                if self.peek() not in ",}":
+                    self.repair("inserted missing commas")
+        except Truncated:
+            # Keep the members that arrived; a member cut off before its value is dropped
+            if key is not None and self.depth == 1:
+                self.truncated.add(key)
+            self.cut = True
+            self.repair("closed truncated document")
+            return result
+        finally:
+            self.depth -= 1
+
+    def array(self) -> List[Any]:
+        result: List[Any] = []
+        self.pos += 1
+        self.depth += 1
+        try:
+            while True:
+                char = self.peek()
+                if char == "]":
+                    self.pos += 1
+                    return result
+                if char == ",":
+                    self.pos += 1
+                    if self.peek() == "]":
+                        self.repair("removed trailing commas")
+                    continue
+                result.append(self.value())
+                if self.peek() not in ",]":
+                    self.repair("inserted missing commas")
+        except Truncated:
+            # A partly received object or list stays in; the schema check decides whether it is usable
+            self.cut = True
+            self.repair("closed truncated document")
+            return result
+        finally:
+            self.depth -= 1
+
+    def string(self) -> str:
+        quote = self.text[self.pos]
+        if quote == "'":
+            self.repair("replaced single quotes")
+        start = end = self.pos + 1
+        text = self.text
+        escaped = False
+        while end < len(text):
+            char = text[end]
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                break
+            end += 1
+        else:
+            self.pos = len(text)
+            raise Truncated()
+        self.pos = end + 1
+        return self.decode(text[start:end], quote)
+
+    def decode(self, raw: str, quote: str) -> str:
+        if quote == "'":
+            raw = raw.replace("\\'", "'").replace('"', '\\"')
+        try:
+            return _decoder.decode(f'"{raw}"')
+        except ValueError:
+            # Raw newlines and tabs are the usual culprits inside model-written strings
+            self.repair("escaped control characters")
+            cleaned = raw.replace("\r", "\\r").replace("\n", "\\n").replace("\t", "\\t")
+            try:
+                return _decoder.decode(f'"{cleaned}"')
+            except ValueError:
+                return raw
+
+    def primitive(self) -> Any:
+        text, start = self.text, self.pos
+        end = start
+        while end < len(text) and (text[end].isalnum() or text[end] in NUMBER_CHARS):
+            end += 1
+        token = text[start:end]
+        if end >= len(text):
+            # A number or literal running into the end of the text may be incomplete
+            raise Truncated()
+        self.pos = end
+        if token in LITERALS:
+            if token[0].isupper():
+                self.repair("converted Python literals")
+            return LITERALS[token]
+        try:
+            return json.loads(token)
+        except ValueError:
+            raise ValueError(f"unexpected token {token!r} at {start}")
+
+
+def find_starts(text: str) -> Iterator[int]:
+    """Indexes of each '{' or '[' in order, the places a document could begin"""
+    pos = 0
+    while True:
+        starts = [index for index in (text.find("{", pos), text.find("[", pos)) if index != -1]
+        if not starts:
+            return
+        pos = min(starts)
+        yield pos
+        pos += 1
+
+
+def extract_from(text: str, start: int) -> Extraction:
+    """Parse the JSON document beginning at start, repairing it if needed"""
+    try:
+        # Fenced or chatty but otherwise valid: decode in place and ignore what follows
+        value, _ = _decoder.raw_decode(text, start)
+        return Extraction(value, ["stripped surrounding text"], set())
+    except ValueError:
+        pass
+
+    parser = TolerantParser(text)
+    parser.pos = start
+    if start:
+        parser.repair("stripped surrounding text")
+    try:
+        value = parser.value()
+    except Truncated:
+        raise ValueError("the text ended before any value was complete")
+    return Extraction(value, parser.repairs, parser.truncated)
+
+
+def extract_json(text: str, expected: Optional[type] = None) -> Extraction:
+    """Parse the first JSON document (of the expected type, if given) in model output, repairing it if needed"""
+    try:
+        value = json.loads(text)
+        if expected is None or isinstance(value, expected):
+            return Extraction(value, [], set())
+    except ValueError:
+        pass
+
+    # Chatter such as "Here is {your} course:" can hold braces of its own, so try later starts too
+    error: Optional[ValueError] = None
+    for attempt, start in enumerate(find_starts(text)):
+        if attempt == MAX_STARTS:
+            break
+        try:
+            extraction = extract_from(text, start)
+        except ValueError as e:
+            error = error or e
+            continue
+        if expected is None or isinstance(extraction.value, expected):
+            return extraction
+        error = error or ValueError(f"expected JSON of type {expected.__name__} at {start}")
+    raise error or ValueError("no JSON object or array in the text")
+
+
+# A subset of JSON Schema: type, properties, required, items, minItems, minLength
+Schema = Dict[str, Any]
+
+TYPES = {"object": dict, "array": list, "string": str, "integer": int, "number": (int, float), "boolean": bool}
+
+
+def conform(value: Any, schema: Schema, path: str, problems: List[str]) -> Optional[Any]:
+    """Return the value cleaned to fit the schema, or None if it can't be made to fit"""
+    expected = schema.get("type")
+    if expected == "integer" and isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        value = int(value)  # Models often quote numbers
+    if expected == "integer" and isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if expected and (not isinstance(value, TYPES[expected]) or (expected in ("integer", "number") and isinstance(value, bool))):
+        problems.append(f"{path or '$'}: expected {expected}")
+        return None
+
+    if expected == "string" and len(value.strip()) < schema.get("minLength", 0):
+        problems.append(f"{path or '$'}: too short")
+        return None
+
+    if expected == "object":
+        cleaned = {}
+        properties = schema.get("properties", {})
+        for key, item in value.items():
+            if key not in properties:
+                cleaned[key] = item
+                continue
+            conformed = conform(item, properties[key], f"{path}.{key}", problems)
+            if conformed is not None:
+                cleaned[key] = conformed
+        for key in schema.get("required", []):
+            if key not in cleaned:
+                if key not in value:
+                    problems.append(f"{path}.{key}: missing")
+                return None
+        return cleaned
+
+    if expected == "array":
+        item_schema = schema.get("items")
+        cleaned = value
+        if item_schema:
+            # Drop the items that don't fit rather than the whole list
+            cleaned = []
+            for index, item in enumerate(value):
+                conformed = conform(item, item_schema, f"{path}[{index}]", problems)
+                if conformed is not None:
+                    cleaned.append(conformed)
+        if len(cleaned) < schema.get("minItems", 0):
+            problems.append(f"{path or '$'}: fewer than {schema['minItems']} items")
+            return None
+        return cleaned
+
+    return value
+
+
+QUESTION_SCHEMA: Schema = {
+    "type": "object",
+    "required": ["question", "options", "correct_answer"],
+    "properties": {
+        "question": {"type": "string", "minLength": 1},
+        "options": {"type": "array", "minItems": 2, "items": {"type": "string"}},
+        "correct_answer": {"type": "integer"},
+        "explanation": {"type": "string"},
+    },
+}
+
+EXERCISE_SCHEMA: Schema = {
+    "type": "object",
+    "required": ["title", "description"],
+    "properties": {
+        "title": {"type": "string", "minLength": 1},
+        "description": {"type": "string"},
+        "type": {"type": "string"},
+        "instructions": {"type": "string"},
+    },
+}
+
+COURSE_SCHEMA: Schema = {
+    "type": "object",
+    "properties": {
+        "content": {"type": "string", "minLength": 1},
+        "exercises": {"type": "array", "minItems": 1, "items": EXERCISE_SCHEMA},
+        "quiz": {
+            "type": "object",
+            "required": ["questions"],
+            "properties": {"questions": {"type": "array", "minItems": 1, "items": QUESTION_SCHEMA}},
+        },
+    },
+}
+
+# Sections that can be requested again on their own, keeping the lesson
+SECTIONS = ("exercises", "quiz")
+
+
+def check_answers(course: Dict[str, Any], problems: List[str]):
+    """Drop questions whose correct answer isn't one of their options"""
+    quiz = course.get("quiz")
+    if not quiz:
+        return
+    questions = [q for q in quiz["questions"] if 0 <= q["correct_answer"] < len(q["options"])]
+    if len(questions) < len(quiz["questions"]):
+        problems.append("quiz.questions: correct_answer out of range")
+    if questions:
+        quiz["questions"] = questions
+    else:
+        del course["quiz"]
+
+
+class CourseParse(NamedTuple):
+    course: Optional[Dict[str, Any]]  # None when not even the lesson could be recovered
+    missing: List[str]  # Sections to request again
+    repairs: List[str]
+    problems: List[str]
+
+
+def parse_course(text: str, expected: Tuple[str, ...] = ("content",) + SECTIONS) -> CourseParse:
+    """Recover a course, or the expected sections of one, and list the sections that must be requested again"""
+    try:
+        extraction = extract_json(text, dict)
+    except ValueError as e:
+        return CourseParse(None, list(SECTIONS), [], [str(e)])
+
+    problems: List[str] = []
+    value = {key: item for key, item in extraction.value.items()
+             if key not in extraction.truncated or key not in ("content",) + SECTIONS}
+    for key in extraction.truncated:
+        problems.append(f".{key}: truncated")
+    course = conform(value, COURSE_SCHEMA, "", problems) or {}
+    check_answers(course, problems)
+
+    if "content" in expected and "content" not in course:
+        return CourseParse(None, list(SECTIONS), extraction.repairs, problems)
+    missing = [section for section in SECTIONS if section in expected and section not in course]
+    return CourseParse(course, missing, extraction.repairs, problems)
+
+
+def clean_section(name: str, value: Any) -> Optional[Any]:
+    """Check one streamed section against the course schema, returning None if it is unusable"""
+    problems: List[str] = []
+    course = conform({name: value}, COURSE_SCHEMA, "", problems) or {}
+    check_answers(course, problems)
+    return course.get(name)
@@ -0,0 +1,108 @@
+"""
+LLM Client Pool - runs blocking AI SDK calls off the event loop
+Bounded thread pool with configurable concurrency and per-call timeouts
+"""
+
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from metrics import track_llm_call
+
+
+class LLMTimeoutError(Exception):
+    """Raised when an LLM call does not finish within its timeout"""
+
+
+class LLMClientPool:
+    def __init__(self, name: str, max_concurrency: int = 8, timeout: float = 60.0):
+        """Create a pool that allows at most max_concurrency calls in flight"""
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"llm-{name}")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _submit(self, func: Callable[..., Any], *args, **kwargs) -> "asyncio.Future[Any]":
+        """Start a call on a worker thread once a slot is free"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore()
+        await semaphore.acquire()
+        try:
+            future = self._executor.submit(func, *args, **kwargs)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        def release(_):
+            # The slot is held until the thread is free, even after the caller gives up on a hung call;
+            # otherwise later calls would sit in the executor queue and time out there
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                pass  # The event loop has already closed
+
+        future.add_done_callback(release)
+        return asyncio.wrap_future(future)
+
+    async def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a blocking call in the pool and await its result"""
+        call_timeout = timeout if timeout is not None else self.timeout
+        future = await self._submit(func, *args, **kwargs)
+        try:
+            with track_llm_call(self.name):
+                return await asyncio.wait_for(future, timeout=call_timeout)
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"{self.name} call timed out after {call_timeout:.0f}s")
+
+    async def run_stream(self, func: Callable[..., Any], *args, chunk_timeout: Optional[float] = None,
+                         total_timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a blocking streaming call, passing it a callback to invoke for every chunk received
+
+        The call fails when chunk_timeout (the pool timeout by default) passes without a chunk, or when
+        total_timeout is reached, so a long but steady generation isn't cut off by a single-call limit
+        """
+        idle_timeout = chunk_timeout if chunk_timeout is not None else self.timeout
+        last_chunk = [time.monotonic()]
+
+        def progress():
+            last_chunk[0] = time.monotonic()
+
+        started = time.monotonic()
+        future = await self._submit(func, progress, *args, **kwargs)
+        try:
+            with track_llm_call(self.name):
+                while True:
+                    deadline = last_chunk[0] + idle_timeout
+                    if total_timeout is not None:
+                        deadline = min(deadline, started + total_timeout)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    done, _ = await asyncio.wait({future}, timeout=remaining)
+                    if done:
+                        return future.result()
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"{self.name} stream stalled or ran past its time limit")
+        finally:
+            future.cancel()
+
+    def shutdown(self):
+        """Stop accepting work and release the worker threads"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_pool_from_env(name: str, default_concurrency: int = 8, default_timeout: float = 60.0) -> LLMClientPool:
+    """Build a pool configured by <NAME>_MAX_CONCURRENCY and <NAME>_TIMEOUT_SECONDS"""
+    prefix = name.upper()
+    max_concurrency = int(os.getenv(f"{prefix}_MAX_CONCURRENCY", default_concurrency))
+    timeout = float(os.getenv(f"{prefix}_TIMEOUT_SECONDS", default_timeout))
+    return LLMClientPool(name, max_concurrency=max_concurrency, timeout=timeout)
@@ -0,0 +1,352 @@
+"""
+Metrics - low-overhead Prometheus-style counters, gauges and histograms
+Samples live in process memory; with METRICS_DIR set, each worker also writes snapshots that /metrics merges
+"""
+
+import os
+import json
+import time
+import asyncio
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Gauges from a worker that stopped writing snapshots this long ago are dropped
+STALE_SNAPSHOT_SECONDS = 60
+
+Labels = Tuple[str, ...]
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, Any] = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            values = [[list(labels), value if not isinstance(value, list) else list(value)] for labels, value in self._values.items()]
+        return {"kind": self.kind, "help": self.help, "labelnames": list(self.labelnames), "values": values}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def set_total(self, labels: Labels, total: float):
+        """Mirror a running total kept elsewhere, such as a cache's hit count"""
+        with self._lock:
+            self._values[labels] = float(total)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, labels: Labels = ()):
+        with self._lock:
+            self._values[labels] = float(value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, labels: Labels = ()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (last slot is +Inf), then sum and count
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = super().snapshot()
+        snapshot["buckets"] = list(self.buckets)
+        return snapshot
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def on_collect(self, collector: Callable[[], None]):
+        """Run collector before every scrape or snapshot, to copy in values kept elsewhere"""
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        for collector in self._collectors:
+            collector()
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+
+registry = Registry()
+
+http_requests = registry.counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_latency = registry.histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+db_queries_per_request = registry.histogram(
+    "db_queries_per_request", "Database queries issued while serving one request", ("route",), COUNT_BUCKETS
+)
+db_time_per_request = registry.histogram("db_query_seconds_per_request", "Time spent in database queries per request", ("route",))
+db_query_latency = registry.histogram("db_query_duration_seconds", "Database query latency by statement type", ("statement",))
+llm_latency = registry.histogram("llm_call_duration_seconds", "AI provider call latency", ("provider",))
+llm_calls = registry.counter("llm_calls_total", "AI provider calls by outcome", ("provider", "outcome"))
+llm_tokens = registry.counter("llm_tokens_total", "Tokens (characters for TTS) sent to and received from AI providers", ("provider", "direction"))
+course_responses = registry.counter(
+    "course_responses_total", "Generated courses by how their JSON was recovered: valid, repaired, salvaged, partial or fallback", ("outcome",)
+)
+cache_hits = registry.counter("cache_hits_total", "In-process cache hits", ("cache",))
+cache_misses = registry.counter("cache_misses_total", "In-process cache misses", ("cache",))
+cache_entries = registry.gauge("cache_entries", "Entries held by each in-process cache", ("cache",))
+loop_lag = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a timer", (), (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+
+# Query totals for the request being served, so the middleware can report them per route
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+current_queries: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("current_queries", default=None)
+
+
+def instrument_engine(engine):
+    """Time every statement run through a (sync) SQLAlchemy engine"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def finish_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_started
+        db_query_latency.observe(elapsed, (statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other",))
+        stats = current_queries.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+
+
+def track_cache(name: str, cache):
+    """Report an LRUTTLCache's hits, misses and size on every scrape"""
+    def collect():
+        stats = cache.stats()
+        cache_hits.set_total((name,), stats["hits"])
+        cache_misses.set_total((name,), stats["misses"])
+        cache_entries.set(stats["entries"], (name,))
+    registry.on_collect(collect)
+
+
+@contextmanager
+def track_llm_call(provider: str) -> Iterator[None]:
+    """Time an AI provider call and count it as ok, timeout or error"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except (asyncio.TimeoutError, TimeoutError):
+        outcome = "timeout"
+        raise
+    finally:
+        llm_latency.observe(time.perf_counter() - started, (provider,))
+        llm_calls.inc((provider, outcome))
+
+
+def record_llm_tokens(provider: str, sent: Optional[int], received: Optional[int]):
+    if sent:
+        llm_tokens.inc((provider, "sent"), sent)
+    if received:
+        llm_tokens.inc((provider, "received"), received)
+
+
+def record_course_response(outcome: str):
+    course_responses.inc((outcome,))
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        """ASGI middleware recording latency, status and database work per route"""
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+        stats = QueryStats()
+        token = current_queries.set(stats)
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_queries.reset(token)
+            route = route_label(scope)
+            method = scope["method"]
+            http_latency.observe(time.perf_counter() - started, (method, route))
+            http_requests.inc((method, route, str(status[0])))
+            db_queries_per_request.observe(stats.count, (route,))
+            db_time_per_request.observe(stats.seconds, (route,))
+
+
+def route_label(scope) -> str:
+    """Route template rather than the raw path, so ids don't explode the label set"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope.get("root_path"):
+        return scope["root_path"] + "/*"  # A mounted app such as /assets
+    return "unmatched"
+
+
+async def monitor_event_loop(interval: float = 0.5):
+    """Sample how late the loop wakes from a sleep, for as long as the task runs"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        loop_lag.observe(max(0.0, loop.time() - started - interval))
+
+
+def snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"metrics_{pid}.json")
+
+
+def write_snapshot(directory: str):
+    """Publish this worker's samples for the others to merge"""
+    path = snapshot_path(directory, os.getpid())
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(temp_path, path)
+
+
+async def write_snapshots(directory: str, interval: float = 5.0):
+    """Write a snapshot every interval until cancelled, and once more on the way out"""
+    os.makedirs(directory, exist_ok=True)
+    try:
+        while True:
+            write_snapshot(directory)
+            await asyncio.sleep(interval)
+    finally:
+        write_snapshot(directory)
+
+
+def merge_snapshots(snapshots: List[Tuple[str, Dict[str, Dict[str, Any]], bool]]) -> Dict[str, Dict[str, Any]]:
+    """Sum counters and histograms across workers; keep gauges per worker"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for worker, snapshot, fresh in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "values": {}})
+            if metric["kind"] == "gauge":
+                if not fresh:
+                    continue
+                target["labelnames"] = metric["labelnames"] + ["worker"]
+                for labels, value in metric["values"]:
+                    target["values"][tuple(labels) + (worker,)] = value
+                continue
+            for labels, value in metric["values"]:
+                key = tuple(labels)
+                current = target["values"].get(key)
+                if current is None:
+                    target["values"][key] = value
+                elif metric["kind"] == "histogram":
+                    target["values"][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target["values"][key] = current + value
+    return merged
+
+
+def collect(directory: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """This worker's live samples, merged with every other worker's latest snapshot"""
+    own = (str(os.getpid()), registry.snapshot(), True)
+    if not directory or not os.path.isdir(directory):
+        return merge_snapshots([own])
+
+    snapshots = [own]
+    now = time.time()
+    for name in os.listdir(directory):
+        if not (name.startswith("metrics_") and name.endswith(".json")) or name == os.path.basename(snapshot_path(directory, os.getpid())):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+            fresh = now - os.path.getmtime(path) < STALE_SNAPSHOT_SECONDS
+        except (OSError, ValueError):
+            continue
+        snapshots.append((name[len("metrics_"):-len(".json")], snapshot, fresh))
+    return merge_snapshots(snapshots)
+
+
+def escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Sequence[str], values: Sequence[Any], extra: Optional[Tuple[str, Any]] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}" if pairs else ""
+
+
+def render(metrics: Dict[str, Dict[str, Any]]) -> str:
+    """Prometheus text exposition format"""
+    lines = []
+    for name, metric in metrics.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric["labelnames"]
+        for labels, value in sorted(metric["values"].items()):
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{format_labels(names, labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric["buckets"]) + ["+Inf"], value[:-2]):
+                cumulative += count
+                lines.append(f"{name}_bucket{format_labels(names, labels, ('le', bound))} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(names, labels)} {value[-2]}")
+            lines.append(f"{name}_count{format_labels(names, labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,19 @@
+"""
+Database Migration - creates tables and upgrades databases from older releases
+Run once per deploy when workers start with AUTO_MIGRATE=false
+"""
+
+import argparse
+
+from app import migrate_database, vacuum_database
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and upgrade the database tables")
+    parser.add_argument("--vacuum", action="store_true", help="shrink a SQLite file even if nothing was migrated")
+    args = parser.parse_args()
+
+    moved = migrate_database()
+    if moved or args.vacuum:
+        # Moving content out of rows leaves free pages that SQLite only returns to the filesystem on VACUUM
+        vacuum_database()
+    print("✅ Database is up to date")
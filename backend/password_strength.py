@@ -0,0 +1,326 @@
+"""
+Password Strength Engine - entropy estimate with pattern and breached-password checks
+Scans a password once, discounts predictable patterns and looks up a memory-mapped Bloom filter
+"""
+
+import os
+import re
+import math
+import mmap
+import struct
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+WORDLIST_PATH = os.path.join(DATA_DIR, "common_passwords.txt")
+FILTER_PATH = os.path.join(DATA_DIR, "common_passwords.bloom")
+
+# Only the first characters are analysed; anything longer is already out of reach
+MAX_ANALYSED_LENGTH = 128
+
+# Character classes, looked up per character instead of one regex per class
+LOWER, UPPER, DIGIT, SYMBOL, OTHER = 1, 2, 4, 8, 16
+SYMBOLS = "!@#$%^&*()-_=+[]{};:'\",.<>/?\\|`~ "
+CLASS_POOL = {LOWER: 26, UPPER: 26, DIGIT: 10, SYMBOL: len(SYMBOLS), OTHER: 100}
+
+CHAR_CLASS = [OTHER] * 128
+for _code in range(128):
+    _char = chr(_code)
+    if "a" <= _char <= "z":
+        CHAR_CLASS[_code] = LOWER
+    elif "A" <= _char <= "Z":
+        CHAR_CLASS[_code] = UPPER
+    elif "0" <= _char <= "9":
+        CHAR_CLASS[_code] = DIGIT
+    elif _char in SYMBOLS:
+        CHAR_CLASS[_code] = SYMBOL
+
+# Physical key positions on a US QWERTY keyboard, shifted symbols folded onto their keys
+KEYBOARD_ROWS = ["1234567890-=", "qwertyuiop[]", "asdfghjkl;'", "zxcvbnm,./"]
+SHIFTED = dict(zip("!@#$%^&*()_+{}:\"<>?", "1234567890-=[];',./"))
+
+KEY_POSITION = {}
+for _row, _keys in enumerate(KEYBOARD_ROWS):
+    for _col, _key in enumerate(_keys):
+        KEY_POSITION[_key] = (_row, _col)
+
+LEET = str.maketrans({"4": "a", "@": "a", "8": "b", "3": "e", "6": "g", "1": "i", "!": "i", "0": "o", "5": "s", "$": "s", "7": "t", "+": "t", "2": "z"})
+
+DATE_RE = re.compile(r"(?:(?:19|20)\d\d)|(?:\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4})|(?:[01]\d[0-3]\d(?:19|20)?\d\d)")
+AFFIX_RE = re.compile(r"^[^a-z]*(.*?)[^a-z]*$")
+
+# Rough search-space sizes, in bits, for each kind of pattern
+KEYBOARD_WALK_BITS = math.log2(len(KEY_POSITION) * 4)
+SEQUENCE_BITS = math.log2(26 + 10) + 1
+DATE_BITS = math.log2(366 * 200)
+
+
+def key_of(char: str) -> Optional[Tuple[int, int]]:
+    """Keyboard position of a character, if it is on the main keys"""
+    char = char.lower()
+    return KEY_POSITION.get(SHIFTED.get(char, char))
+
+
+def keys_adjacent(a: Optional[Tuple[int, int]], b: Optional[Tuple[int, int]]) -> bool:
+    """Whether two keys touch on a staggered keyboard"""
+    if a is None or b is None:
+        return False
+    row_step, col_step = b[0] - a[0], b[1] - a[1]
+    if row_step == 0:
+        return abs(col_step) == 1
+    # The row below sits half a key to the right, so its neighbours are col and col - 1
+    if row_step == 1:
+        return col_step in (0, -1)
+    if row_step == -1:
+        return col_step in (0, 1)
+    return False
+
+
+class BloomFilter:
+    """Read-only Bloom filter over a memory-mapped file, or bytes compiled in memory"""
+
+    MAGIC = b"CQBF"
+    HEADER = struct.Struct("<4sQII")  # magic, bit count, hash count, item count
+
+    def __init__(self, data: Union[bytes, mmap.mmap], source: str = "filter"):
+        self._map = data
+        magic, self.bit_count, self.hash_count, self.item_count = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC:
+            raise ValueError(f"{source} is not a password Bloom filter")
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), path)
+
+    @staticmethod
+    def _positions(word: str, bit_count: int, hash_count: int) -> Iterable[int]:
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=16).digest()
+        first, second = struct.unpack("<QQ", digest)
+        second |= 1
+        return ((first + i * second) % bit_count for i in range(hash_count))
+
+    def __contains__(self, word: str) -> bool:
+        offset = self.HEADER.size
+        return all(
+            self._map[offset + (position >> 3)] & (1 << (position & 7))
+            for position in self._positions(word, self.bit_count, self.hash_count)
+        )
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+    @classmethod
+    def compile(cls, words: List[str], false_positive_rate: float = 0.001) -> bytes:
+        """A filter sized for the words at the target false-positive rate"""
+        item_count = max(len(words), 1)
+        bit_count = max(64, int(-item_count * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        hash_count = max(1, round(bit_count / item_count * math.log(2)))
+
+        bits = bytearray((bit_count + 7) // 8)
+        for word in words:
+            for position in cls._positions(word, bit_count, hash_count):
+                bits[position >> 3] |= 1 << (position & 7)
+
+        return cls.HEADER.pack(cls.MAGIC, bit_count, hash_count, len(words)) + bytes(bits)
+
+    @classmethod
+    def build(cls, words: List[str], path: str, false_positive_rate: float = 0.001):
+        """Write a filter file for the words"""
+        data = cls.compile(words, false_positive_rate)
+        # Write then rename so readers never map a half-written file
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+
+def load_wordlist(path: str = WORDLIST_PATH) -> List[str]:
+    """Read the bundled wordlist, normalized the way passwords are checked"""
+    with open(path, encoding="utf-8") as f:
+        words = {line.strip().lower().translate(LEET) for line in f if line.strip() and not line.startswith("#")}
+    return sorted(words)
+
+
+def build_filter(wordlist_path: str = WORDLIST_PATH, filter_path: str = FILTER_PATH) -> int:
+    """Compile the wordlist into the Bloom filter file; returns the number of words"""
+    words = load_wordlist(wordlist_path)
+    BloomFilter.build(words, filter_path)
+    return len(words)
+
+
+_common_passwords: Optional[BloomFilter] = None
+
+
+def common_passwords() -> Optional[BloomFilter]:
+    """Open the filter once per process, rebuilding it if the wordlist is newer
+
+    The deploy scripts build it ahead of time; where that was skipped and the data directory
+    is read-only, the filter is compiled in memory instead
+    """
+    global _common_passwords
+    if _common_passwords is None:
+        if not os.path.exists(WORDLIST_PATH):
+            return None
+        if not os.path.exists(FILTER_PATH) or os.path.getmtime(FILTER_PATH) < os.path.getmtime(WORDLIST_PATH):
+            try:
+                build_filter()
+            except OSError as e:
+                print(f"⚠️ Could not write {FILTER_PATH} ({e}); compiling the password filter in memory")
+                _common_passwords = BloomFilter(BloomFilter.compile(load_wordlist()), "in-memory filter")
+                return _common_passwords
+        _common_passwords = BloomFilter.load(FILTER_PATH)
+    return _common_passwords
+
+
+def scan(password: str) -> Tuple[int, List[Tuple[int, int, float, str]]]:
+    """One pass over the password collecting its character classes and runs of walks, sequences and repeats"""
+    classes = 0
+    patterns = []
+    walk_start = sequence_start = repeat_start = 0
+    step = 0
+    previous_key = None
+
+    for i, char in enumerate(password + "\0"):
+        at_end = i == len(password)
+        code = ord(char)
+        if not at_end:
+            classes |= CHAR_CLASS[code] if code < 128 else OTHER
+        key = None if at_end else key_of(char)
+
+        if i and (at_end or not keys_adjacent(previous_key, key)):
+            if i - walk_start >= 4:
+                patterns.append((walk_start, i, KEYBOARD_WALK_BITS + (i - walk_start - 1) * 0.5, "keyboard_walk"))
+            walk_start = i
+
+        if i and not at_end:
+            this_step = code - ord(password[i - 1])
+        else:
+            this_step = None
+        if i and (this_step not in (1, -1) or (i - sequence_start > 1 and this_step != step)):
+            if i - sequence_start >= 3:
+                patterns.append((sequence_start, i, SEQUENCE_BITS, "sequence"))
+            sequence_start = i - 1 if this_step in (1, -1) else i
+        step = this_step
+
+        if i and (at_end or char != password[i - 1]):
+            if i - repeat_start >= 3:
+                patterns.append((repeat_start, i, 0.0, "repeat"))
+            repeat_start = i
+
+        previous_key = key
+
+    for match in DATE_RE.finditer(password):
+        patterns.append((match.start(), match.end(), DATE_BITS, "date"))
+
+    return classes, patterns
+
+
+def dictionary_match(password: str, bloom: Optional[BloomFilter]) -> Optional[Tuple[int, int, float, str]]:
+    """Find the password, or its core word with digits and symbols stripped, in the common list"""
+    if bloom is None:
+        return None
+    lowered = password.lower()
+    if lowered.translate(LEET) in bloom:
+        return 0, len(password), math.log2(max(bloom.item_count, 2)), "common_password"
+
+    core = AFFIX_RE.match(lowered)
+    start, end = core.span(1)
+    if end - start >= 4 and (start or end < len(password)):
+        word = lowered[start:end].translate(LEET)
+        if word in bloom:
+            bits = math.log2(max(bloom.item_count, 2))
+            bits += sum(1 for char in lowered[start:end] if char != char.translate(LEET))  # l33t swaps
+            bits += 1 if password[start:end] != lowered[start:end] else 0  # capitalisation
+            return start, end, bits, "common_word"
+    return None
+
+
+def estimate_entropy(password: str) -> Tuple[float, int, List[str], bool]:
+    """Bits of guessing work, character classes present, patterns found and whether it is a common password"""
+    password = password[:MAX_ANALYSED_LENGTH]
+    classes, patterns = scan(password)
+    match = dictionary_match(password, common_passwords())
+    if match:
+        patterns.insert(0, match)
+
+    pool = sum(size for flag, size in CLASS_POOL.items() if classes & flag) or 1
+    bits_per_char = math.log2(pool)
+
+    # Take the longest non-overlapping patterns first; everything else is random characters
+    covered = [False] * len(password)
+    found = []
+    entropy = 0.0
+    for start, end, bits, name in sorted(patterns, key=lambda p: (p[3] not in ("common_password", "common_word"), p[0] - p[1])):
+        if any(covered[start:end]):
+            continue
+        covered[start:end] = [True] * (end - start)
+        if name == "repeat":
+            bits = bits_per_char + math.log2(end - start)
+        entropy += bits
+        found.append(name)
+    entropy += covered.count(False) * bits_per_char
+
+    return entropy, classes, found, bool(match and match[3] == "common_password")
+
+
+FEEDBACK = {
+    "common_password": "This password is on lists of common or breached passwords",
+    "common_word": "Avoid common words, even with numbers or symbols added",
+    "keyboard_walk": "Avoid keyboard patterns like 'qwerty' or 'asdf'",
+    "sequence": "Avoid sequences like 'abc' or '123'",
+    "repeat": "Avoid repeating the same character",
+    "date": "Avoid dates and years, they are easy to guess",
+}
+
+
+def validate_password_strength(password: str) -> Dict[str, Any]:
+    """Validate password strength with detailed feedback"""
+    entropy, classes, patterns, is_common = estimate_entropy(password)
+    feedback = []
+
+    if len(password) < 8:
+        feedback.append("Password should be at least 8 characters long")
+    if not classes & UPPER:
+        feedback.append("Include at least one uppercase letter")
+    if not classes & LOWER:
+        feedback.append("Include at least one lowercase letter")
+    if not classes & DIGIT:
+        feedback.append("Include at least one number")
+    if not classes & (SYMBOL | OTHER):
+        feedback.append("Include at least one special character")
+    for name in dict.fromkeys(patterns):
+        feedback.append(FEEDBACK[name])
+
+    # Every 10 bits is a point: 50 bits (Strong) is out of reach of offline guessing for a long time
+    score = min(6, int(entropy // 10))
+    if is_common:
+        score = 0
+
+    strength = "Weak"
+    if score >= 5:
+        strength = "Strong"
+    elif score >= 3:
+        strength = "Medium"
+
+    return {
+        "score": score,
+        "max_score": 6,
+        "strength": strength,
+        "feedback": feedback,
+        "is_strong": score >= 5,
+        "entropy_bits": round(entropy, 1),
+        "patterns": patterns,
+        "is_common": is_common
+    }
+
+
+if __name__ == "__main__":
+    count = build_filter()
+    print(f"✅ Built {FILTER_PATH} from {count} passwords")
@@ -0,0 +1,347 @@
+"""
+Phishing Detector - multi-pattern analysis of pasted emails
+Scans headers, links and body text in linear time against rule files loaded once per process
+"""
+
+import os
+import re
+import ipaddress
+import unicodedata
+from email.utils import getaddresses, parseaddr
+from urllib.parse import urlsplit
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+KEYWORDS_PATH = os.path.join(DATA_DIR, "phishing_keywords.txt")
+DOMAINS_PATH = os.path.join(DATA_DIR, "phishing_domains.txt")
+BRANDS_PATH = os.path.join(DATA_DIR, "brand_domains.txt")
+CONFUSABLES_PATH = os.path.join(DATA_DIR, "confusables.txt")
+
+# Longest pasted email analysed; the rest is ignored
+MAX_EMAIL_LENGTH = 200_000
+
+# Scores at or below this are reported as suspicious
+SUSPICIOUS_AT = 70
+
+# Weights of structural findings, on the same scale as keyword weights
+KNOWN_DOMAIN_WEIGHT = 60
+LOOKALIKE_WEIGHT = 50
+BRAND_IN_DOMAIN_WEIGHT = 40
+SENDER_NAME_WEIGHT = 40
+REPLY_TO_WEIGHT = 30
+IP_LINK_WEIGHT = 40
+HIDDEN_LINK_WEIGHT = 40
+LINK_TEXT_WEIGHT = 40
+PUNYCODE_WEIGHT = 30
+
+# A paste is treated as a raw email only when it starts with one of these headers
+KNOWN_HEADERS = {
+    "from", "to", "cc", "subject", "date", "reply-to", "return-path", "sender", "received",
+    "message-id", "delivered-to", "mime-version", "content-type", "x-mailer"
+}
+
+HEADER_RE = re.compile(r"([A-Za-z][A-Za-z0-9-]*):[ \t]*(.*)")
+URL_RE = re.compile(r"(?:https?://|www\.)[^\s<>\"'()\[\]]+", re.IGNORECASE)
+ANCHOR_RE = re.compile(r"<a\s[^>]*?href\s*=\s*[\"']([^\"']+)[\"'][^>]*>(.*?)</a\s*>", re.IGNORECASE | re.DOTALL)
+ADDRESS_RE = re.compile(r"[\w.+-]+@([A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)+)")
+DOMAIN_TEXT_RE = re.compile(r"^(?:https?://)?((?:[\w-]+\.)+[a-z]{2,})(?:[/:?#].*)?$", re.IGNORECASE)
+TAG_RE = re.compile(r"<[^>]+>")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+class AhoCorasick:
+    """Automaton matching every pattern in one pass over the text"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+
+    def add(self, pattern: str, value: Any):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((len(pattern), value))
+
+    def build(self):
+        """Compute failure links breadth-first, merging each state's outputs with its fallback's"""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+                queue.append(next_state)
+
+    def search(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (start, end, value) for every occurrence of every pattern"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, value in out[state]:
+                yield i + 1 - length, i + 1, value
+
+
+def read_rules(path: str) -> List[List[str]]:
+    """Non-comment lines of a rule file, split on '|'"""
+    with open(path, encoding="utf-8") as f:
+        return [line.rstrip("\n").split("|") for line in f if line.strip() and not line.startswith("#")]
+
+
+class PhishingRules:
+    def __init__(self):
+        """Compile the bundled rule files"""
+        single, multi = {}, {}
+        for lookalike, plain in read_rules(CONFUSABLES_PATH):
+            (single if len(lookalike) == 1 else multi)[lookalike] = plain
+        self._fold_table = str.maketrans(single)
+        self._fold_multi = multi
+        self._fold_multi_re = re.compile("|".join(map(re.escape, multi))) if multi else None
+
+        self.keywords = AhoCorasick()
+        for weight, phrase in read_rules(KEYWORDS_PATH):
+            self.keywords.add(self.normalize(phrase), (phrase, int(weight)))
+        self.keywords.build()
+
+        self.suspicious_domains = {domain.strip().lower() for (domain,) in read_rules(DOMAINS_PATH)}
+
+        self.brands: Dict[str, Tuple[str, str]] = {}
+        for name, domain in read_rules(BRANDS_PATH):
+            self.brands[self.fold(name)] = (name, domain.lower())
+
+    def normalize(self, text: str) -> str:
+        """NFKC-normalize, case-fold and collapse whitespace, leaving the letters themselves alone"""
+        return WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text).casefold())
+
+    def fold(self, text: str) -> str:
+        """Lowercase, map look-alike characters to plain ones and collapse whitespace
+
+        Only for domain labels and names compared with brands: in prose it turns "learn" into "leam"
+        """
+        folded = text.lower().translate(self._fold_table)
+        if self._fold_multi_re is not None:
+            folded = self._fold_multi_re.sub(lambda match: self._fold_multi[match.group(0)], folded)
+        return WHITESPACE_RE.sub(" ", folded)
+
+    def brand_for(self, token: str) -> Optional[Tuple[str, str]]:
+        return self.brands.get(self.fold(token))
+
+
+_rules: Optional[PhishingRules] = None
+
+
+def load_rules() -> PhishingRules:
+    """Compile the rule files once per process"""
+    global _rules
+    if _rules is None:
+        _rules = PhishingRules()
+    return _rules
+
+
+def decode_host(host: str) -> str:
+    """Lowercase a hostname, decoding punycode labels to what the reader sees"""
+    host = host.strip(".").lower()
+    if "xn--" in host:
+        try:
+            return host.encode("ascii").decode("idna")
+        except UnicodeError:
+            return host
+    return host
+
+
+def registered_domain(host: str) -> str:
+    """Last two labels of a hostname"""
+    return ".".join(host.split(".")[-2:])
+
+
+def split_headers(text: str) -> Tuple[Dict[str, str], str]:
+    """Separate a leading RFC 822 header block, if the paste starts with one"""
+    lines = text.splitlines()
+    first = HEADER_RE.fullmatch(lines[0]) if lines else None
+    if not first or first.group(1).lower() not in KNOWN_HEADERS:
+        return {}, text
+
+    headers: Dict[str, str] = {}
+    name = None
+    for i, line in enumerate(lines):
+        if not line.strip():
+            return headers, "\n".join(lines[i + 1:])
+        if line[0] in " \t" and name:
+            headers[name] += " " + line.strip()  # Folded continuation line
+            continue
+        match = HEADER_RE.fullmatch(line)
+        if not match:
+            return headers, "\n".join(lines[i:])
+        name = match.group(1).lower()
+        headers[name] = match.group(2).strip()
+    return headers, ""
+
+
+class EmailAnalysis:
+    def __init__(self, rules: PhishingRules):
+        self.rules = rules
+        self.findings: List[Dict[str, Any]] = []
+        self.links: List[str] = []
+        self._checked_hosts = set()
+
+    def add(self, kind: str, detail: str, weight: int):
+        self.findings.append({"type": kind, "detail": detail, "weight": weight})
+
+    def check_host(self, host: str):
+        """Known-bad, look-alike and brand-abusing domain checks, once per host"""
+        host = decode_host(host)
+        if not host or host in self._checked_hosts:
+            return
+        self._checked_hosts.add(host)
+
+        labels = host.split(".")
+        if any(".".join(labels[i:]) in self.rules.suspicious_domains for i in range(len(labels) - 1)):
+            self.add("suspicious_domain", f"Domain '{host}' is known to be suspicious", KNOWN_DOMAIN_WEIGHT)
+            return
+
+        if any(not char.isascii() for char in host):
+            self.add("punycode", f"Domain '{host}' uses non-English letters that can hide a fake address", PUNYCODE_WEIGHT)
+
+        registered = registered_domain(host)
+        for token in re.split(r"[.-]", host):
+            brand = self.rules.brand_for(token)
+            if brand is None:
+                continue
+            name, official = brand
+            if registered == official or host.endswith("." + official):
+                return
+            if token != name:
+                # Only equal once look-alike characters are folded, e.g. paypa1 or аpple
+                self.add("lookalike_domain", f"Domain '{host}' looks like {official}", LOOKALIKE_WEIGHT)
+            else:
+                detail = f"Domain '{host}' uses the name '{name}' but is not {official}"
+                self.add("brand_impersonation", detail, BRAND_IN_DOMAIN_WEIGHT)
+            return
+
+    def check_link(self, url: str) -> Optional[str]:
+        """Inspect one link and return its host"""
+        if not url.lower().startswith(("http://", "https://")):
+            url = "http://" + url
+        try:
+            parts = urlsplit(url)
+            host = parts.hostname or ""
+        except ValueError:
+            return None
+        if not host:
+            return None
+
+        if host not in self.links:
+            self.links.append(host)
+            if parts.username:
+                self.add("hidden_link", f"Link hides its real destination '{host}' behind '@'", HIDDEN_LINK_WEIGHT)
+            try:
+                ipaddress.ip_address(host)
+                self.add("ip_link", f"Link goes to a bare IP address ({host})", IP_LINK_WEIGHT)
+            except ValueError:
+                self.check_host(host)
+        return host
+
+    def check_headers(self, headers: Dict[str, str]):
+        """Compare the sender's name and address with Reply-To and Return-Path"""
+        display_name, sender = parseaddr(headers.get("from", ""))
+        sender_domain = decode_host(sender.rpartition("@")[2]) if "@" in sender else ""
+        if sender_domain:
+            self.check_host(sender_domain)
+
+        for token in re.findall(r"[\w-]+", display_name):
+            brand = self.rules.brand_for(token)
+            if brand and sender_domain and registered_domain(sender_domain) != brand[1] and not sender_domain.endswith("." + brand[1]):
+                self.add("sender_name", f"Sender name says '{display_name}' but the address is from '{sender_domain}'", SENDER_NAME_WEIGHT)
+                break
+
+        for header in ("reply-to", "return-path"):
+            for _, address in getaddresses([headers.get(header, "")]):
+                if "@" not in address:
+                    continue
+                domain = decode_host(address.rpartition("@")[2])
+                self.check_host(domain)
+                if sender_domain and registered_domain(domain) != registered_domain(sender_domain):
+                    label = "Replies go" if header == "reply-to" else "Bounces go"
+                    self.add("reply_to_mismatch", f"{label} to '{domain}', not the sender's domain '{sender_domain}'", REPLY_TO_WEIGHT)
+
+    def check_body(self, body: str):
+        """Links, link text, addresses and phrases in the message body"""
+        for href, link_text in ANCHOR_RE.findall(body):
+            host = self.check_link(href)
+            shown = DOMAIN_TEXT_RE.match(TAG_RE.sub("", link_text).strip())
+            if host and shown:
+                shown_host = decode_host(shown.group(1))
+                if registered_domain(shown_host) != registered_domain(decode_host(host)):
+                    self.add("link_text_mismatch", f"Link text shows '{shown_host}' but goes to '{host}'", LINK_TEXT_WEIGHT)
+
+        for url in URL_RE.findall(body):
+            self.check_link(url.rstrip(".,;:!?"))
+
+        for domain in ADDRESS_RE.findall(body):
+            self.check_host(domain)
+
+        self.check_keywords(body)
+
+    def check_keywords(self, text: str):
+        """Weight each phrase once, letting longer phrases absorb the words inside them"""
+        normalized = self.rules.normalize(TAG_RE.sub(" ", text))
+        matches = [
+            (start, end, value) for start, end, value in self.rules.keywords.search(normalized)
+            if (start == 0 or not normalized[start - 1].isalnum()) and (end == len(normalized) or not normalized[end].isalnum())
+        ]
+        matches.sort(key=lambda match: (match[0], match[0] - match[1]))
+
+        seen = set()
+        covered_until = 0
+        for start, end, (phrase, weight) in matches:
+            if start < covered_until and end <= covered_until:
+                continue
+            covered_until = max(covered_until, end)
+            if phrase not in seen:
+                seen.add(phrase)
+                self.add("keyword", f"Contains suspicious keyword: '{phrase}'", weight)
+
+
+def analyze_email(email: str, rules: Optional[PhishingRules] = None) -> EmailAnalysis:
+    """Run every check over a pasted email, or over a bare sender address"""
+    analysis = EmailAnalysis(rules or load_rules())
+    email = email[:MAX_EMAIL_LENGTH]
+
+    stripped = email.strip()
+    if "@" in stripped and not any(char.isspace() for char in stripped) and "://" not in stripped:
+        analysis.check_headers({"from": stripped})
+        analysis.check_keywords(stripped.replace("@", " "))
+        return analysis
+
+    headers, body = split_headers(email)
+    if headers:
+        analysis.check_headers(headers)
+        body = headers.get("subject", "") + "\n" + body
+    analysis.check_body(body)
+    return analysis
+
+
+def validate_email_safety(email: str) -> Dict[str, Any]:
+    """Check if an email looks suspicious"""
+    analysis = analyze_email(email)
+    safety_score = max(0, 100 - sum(finding["weight"] for finding in analysis.findings))
+
+    return {
+        "is_suspicious": safety_score <= SUSPICIOUS_AT,
+        "warnings": [finding["detail"] for finding in analysis.findings],
+        "safety_score": safety_score,
+        "findings": analysis.findings,
+        "links": analysis.links
+    }
@@ -0,0 +1,59 @@
+"""
+Pre-generation Queue - in-process background job queue with a worker pool
+Runs course generation jobs in priority order without blocking requests
+"""
+
+import asyncio
+import itertools
+from typing import Any, Awaitable, Callable, List, Optional
+
+
+class JobQueue:
+    def __init__(self, handler: Callable[[Any], Awaitable[None]], workers: int = 2):
+        """Queue that feeds job ids to handler from a fixed pool of worker tasks"""
+        self.handler = handler
+        self.worker_count = workers
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._order = itertools.count()  # Keeps FIFO order within a priority
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self):
+        """Start the worker tasks on the running event loop"""
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        """Cancel the workers; queued jobs stay persisted for the next start"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def enqueue(self, job_id: Any, priority: int = 0):
+        """Schedule a job; lower priority values run first"""
+        if self._queue is None:
+            return
+        self._queue.put_nowait((priority, next(self._order), job_id))
+
+    def pending(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _work(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                await self.handler(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Background job {job_id} failed: {e}")
+            finally:
+                self._queue.task_done()
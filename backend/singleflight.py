@@ -0,0 +1,69 @@
+"""
+Single-Flight - coalesces concurrent identical async calls
+Callers with the same key await one in-flight task and share its result, and any progress it reports
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class SingleFlight:
+    def __init__(self):
+        """Track at most one running task per key"""
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._progress: Dict[Hashable, Tuple[List[Any], List[Callable[[Any], None]]]] = {}  # Items so far, listeners
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run func for key, or join the call already in flight for it"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+
+        # Shield so one caller disconnecting doesn't cancel the shared work
+        return await asyncio.shield(task)
+
+    async def do_streaming(self, key: Hashable, func: Callable[[Callable[[Any], None]], Awaitable[Any]],
+                           on_progress: Optional[Callable[[Any], None]] = None) -> Any:
+        """Like do, but func reports progress through the callback it is passed (on the event loop)
+
+        on_progress receives every item, including those reported before this caller joined
+        """
+        task = self._calls.get(key)
+        if task is None:
+            emitted: List[Any] = []
+            listeners: List[Callable[[Any], None]] = []
+
+            def publish(item: Any):
+                emitted.append(item)
+                for listener in list(listeners):
+                    listener(item)
+
+            task = asyncio.ensure_future(func(publish))
+            self._calls[key] = task
+            self._progress[key] = (emitted, listeners)
+            task.add_done_callback(lambda _: self._forget(key, task))
+
+        emitted, listeners = self._progress.get(key, ([], []))
+        if on_progress is not None:
+            for item in list(emitted):
+                on_progress(item)
+            listeners.append(on_progress)
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if on_progress in listeners:
+                listeners.remove(on_progress)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            self._progress.pop(key, None)
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether a call for key is currently running"""
+        return key in self._calls
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,35 @@
+"""
+Speech Segments - splits speech text into sentences while it is still being generated
+Each finished sentence can go to text-to-speech before the rest of the speech exists
+"""
+
+import re
+from typing import List
+
+# Terminal punctuation, any closing quotes or brackets, then the whitespace that proves the sentence ended
+SENTENCE_END_RE = re.compile(r"[.!?…]+[\"'”’)\]]*\s+")
+
+
+class SentenceBuffer:
+    def __init__(self, min_chars: int = 50):
+        """Streamed text split into segments of whole sentences, at least min_chars long"""
+        self.min_chars = min_chars  # Short sentences are joined to the next: fewer TTS calls, smoother delivery
+        self.text = ""
+        self.start = 0  # Where the segment being collected begins
+
+    def feed(self, delta: str) -> List[str]:
+        """Add generated text and return the segments it completed"""
+        self.text += delta
+        segments = []
+        for match in SENTENCE_END_RE.finditer(self.text, self.start):
+            segment = self.text[self.start:match.end()].strip()
+            if len(segment) >= self.min_chars:
+                segments.append(segment)
+                self.start = match.end()
+        return segments
+
+    def flush(self) -> List[str]:
+        """The text left over once generation has finished"""
+        segment = self.text[self.start:].strip()
+        self.start = len(self.text)
+        return [segment] if segment else []
@@ -0,0 +1,290 @@
+"""
+Static Assets - cached SPA shell and precompressed frontend assets
+Serves .br/.gz siblings by content negotiation with strong ETags and long-lived caching for hashed files
+"""
+
+import os
+import re
+import sys
+import gzip
+import time
+import hashlib
+import mimetypes
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Preferred first; file suffix of each precompressed sibling
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+COMPRESSIBLE_SUFFIXES = {".js", ".mjs", ".css", ".html", ".svg", ".json", ".map", ".txt", ".xml", ".ico", ".wasm"}
+
+# Vite names the files it emits into assets/ name-<8 character hash>.ext, so their contents never change
+HASHED_NAME_RE = re.compile(r"-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def accepted_encodings(header: str) -> set:
+    """Content codings the client accepts, from an Accept-Encoding header"""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding == "*":
+            accepted.update(encoding for encoding, _ in ENCODINGS)
+        elif coding:
+            accepted.add(coding)
+    return accepted
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names this ETag"""
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+
+def file_digest(path: str) -> str:
+    """Short content hash used as a strong ETag"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+class Asset(NamedTuple):
+    path: str
+    stat: os.stat_result
+    digest: str  # Content hash; the strong ETag of the uncompressed file
+    media_type: str
+    variants: Dict[str, Tuple[str, os.stat_result]]  # Content coding -> precompressed sibling
+
+
+class AssetIndex:
+    def __init__(self, directory: str, rescan_interval: float = 2.0):
+        """Every file in a build directory with its ETag and precompressed siblings, built on the first lookup"""
+        self.directory = directory
+        self.rescan_interval = rescan_interval
+        self._assets: Optional[Dict[str, Asset]] = None  # Relative path -> asset; None until first used
+        self._scanned_at = 0.0
+
+    def index(self, path: str) -> Asset:
+        """One file with its ETag and any up-to-date precompressed siblings"""
+        stat_result = os.stat(path)
+        variants = {}
+        for encoding, suffix in ENCODINGS:
+            try:
+                variant_stat = os.stat(path + suffix)
+            except FileNotFoundError:
+                continue
+            if variant_stat.st_mtime >= stat_result.st_mtime:
+                variants[encoding] = (path + suffix, variant_stat)
+
+        return Asset(
+            path=path,
+            stat=stat_result,
+            digest=file_digest(path),
+            media_type=mimetypes.guess_type(os.path.basename(path))[0] or "application/octet-stream",
+            variants=variants
+        )
+
+    def scan(self):
+        """Index every file in the directory"""
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            names = set(files)
+            for name in files:
+                if name.endswith((".br", ".gz")) and name[:-3] in names:
+                    continue
+                path = os.path.join(root, name)
+                assets[os.path.relpath(path, self.directory).replace(os.sep, "/")] = self.index(path)
+        self._assets = assets
+        self._scanned_at = time.monotonic()
+
+    def get(self, key: str, revalidate: bool) -> Optional[Asset]:
+        """The asset at a relative path; with revalidate, re-checked on disk in case it was rewritten in place"""
+        if self._assets is None:
+            self.scan()
+        asset = self._assets.get(key)
+        if asset is None and time.monotonic() - self._scanned_at > self.rescan_interval:
+            # A new build may have been copied in; misses rescan at most once per interval
+            self.scan()
+            asset = self._assets.get(key)
+        if asset is not None and revalidate:
+            try:
+                stat_result = os.stat(asset.path)
+            except FileNotFoundError:
+                self._assets.pop(key, None)
+                return None
+            if (stat_result.st_mtime_ns, stat_result.st_size) != (asset.stat.st_mtime_ns, asset.stat.st_size):
+                asset = self._assets[key] = self.index(asset.path)
+        return asset
+
+
+class StaticAssets:
+    def __init__(self, directory: str, hashed_names: bool = False, rescan_interval: float = 2.0,
+                 index: Optional[AssetIndex] = None):
+        """ASGI app serving a build directory from an in-memory index
+
+        With hashed_names (Vite's assets/ output) files named with a content hash are cached for a year and
+        never re-checked; everything else is revalidated and re-checked on disk on each request. Mounts of a
+        directory and one of its subdirectories can share the parent's index, so each file is hashed once.
+        """
+        self.directory = directory
+        self.hashed_names = hashed_names
+        if index is None:
+            index = AssetIndex(directory, rescan_interval)
+        self.assets = index
+        prefix = os.path.relpath(directory, index.directory).replace(os.sep, "/")
+        self.prefix = "" if prefix == "." else prefix + "/"
+
+    def cache_control(self, key: str) -> str:
+        return IMMUTABLE if self.hashed_names and HASHED_NAME_RE.search(key) else REVALIDATE
+
+    def lookup(self, key: str) -> Optional[Asset]:
+        # Files without a content hash in their name can be rewritten in place
+        return self.assets.get(self.prefix + key, revalidate=self.cache_control(key) != IMMUTABLE)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        assert scope["type"] == "http"
+        request = Request(scope)
+        response = self.response(request, scope["path"].lstrip("/"))
+        await response(scope, receive, send)
+
+    def response(self, request: Request, key: str) -> Response:
+        if request.method not in ("GET", "HEAD"):
+            return PlainTextResponse("Method Not Allowed", status_code=405)
+        asset = self.lookup(key)
+        if asset is None:
+            return PlainTextResponse("Not Found", status_code=404)
+
+        cache_control = self.cache_control(key)
+        path, stat_result, etag = asset.path, asset.stat, f'"{asset.digest}"'
+        headers = {"cache-control": cache_control}
+        if asset.variants:
+            headers["vary"] = "Accept-Encoding"
+            accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+            for encoding, _ in ENCODINGS:
+                if encoding in asset.variants and encoding in accepted:
+                    path, stat_result = asset.variants[encoding]
+                    headers["content-encoding"] = encoding
+                    # Each representation needs its own strong ETag
+                    etag = f'"{asset.digest}-{encoding}"'
+                    break
+        headers["etag"] = etag
+
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if cache_control != IMMUTABLE:
+            stat_result = None  # A sibling rewritten since indexing would get the wrong length; stat it fresh
+        return FileResponse(path, headers=headers, media_type=asset.media_type, stat_result=stat_result, method=request.method)
+
+
+class SPAShell:
+    def __init__(self, path: str, check_interval: float = 2.0):
+        """index.html held in memory, re-checked on disk at most once per interval"""
+        self.path = path
+        self.check_interval = check_interval
+        self._checked_at = float("-inf")
+        self._signature: Optional[Tuple[float, int]] = None
+        self._bodies: Dict[str, bytes] = {}
+        self._etag = ""
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            stat_result = os.stat(self.path)
+        except FileNotFoundError:
+            self._signature, self._bodies = None, {}
+            return
+
+        signature = (stat_result.st_mtime, stat_result.st_size)
+        if signature == self._signature:
+            return
+        with open(self.path, "rb") as f:
+            body = f.read()
+        bodies = {"identity": body, "gzip": gzip.compress(body, 9, mtime=0)}
+        if BROTLI_AVAILABLE:
+            bodies["br"] = brotli.compress(body, quality=11)
+        self._bodies = bodies
+        self._etag = hashlib.sha256(body).hexdigest()[:32]
+        self._signature = signature
+
+    def response(self, request: Request) -> Optional[Response]:
+        """The shell negotiated for this request, or None if the frontend is not built"""
+        self.refresh()
+        if not self._bodies:
+            return None
+
+        encoding = "identity"
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        for candidate, _ in ENCODINGS:
+            if candidate in self._bodies and candidate in accepted:
+                encoding = candidate
+                break
+
+        etag = f'"{self._etag}"' if encoding == "identity" else f'"{self._etag}-{encoding}"'
+        headers = {"etag": etag, "cache-control": REVALIDATE, "vary": "Accept-Encoding"}
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(self._bodies[encoding], media_type="text/html", headers=headers)
+
+
+def compress_directory(directory: str, min_size: int = 1024) -> int:
+    """Write .gz (and .br with brotli installed) siblings for compressible files; returns files written"""
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_SUFFIXES:
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+
+            encoders = [(".gz", lambda data: gzip.compress(data, 9, mtime=0))]
+            if BROTLI_AVAILABLE:
+                encoders.append((".br", lambda data: brotli.compress(data, quality=11)))
+            for suffix, encode in encoders:
+                compressed = encode(data)
+                if len(compressed) >= len(data):
+                    continue
+                # Write then rename so a running server never serves a partial file
+                temp_path = f"{path}{suffix}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(compressed)
+                os.replace(temp_path, path + suffix)
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else "static"
+    count = compress_directory(target)
+    codings = "gzip and brotli" if BROTLI_AVAILABLE else "gzip (pip install brotli for .br files)"
+    print(f"✅ Wrote {count} precompressed files in {target} using {codings}")
@@ -0,0 +1,38 @@
+"""
+Test setup - points the app at a throwaway database before it is imported
+Run from the backend directory: python -m pytest -q tests
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_database_dir = tempfile.mkdtemp(prefix="cyberquest_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_database_dir, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("GEMINI_API_KEY", None)
+os.environ["PREGENERATE_COURSES"] = "false"
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app
+    app.migrate_database()
+    return app
+
+
+@pytest.fixture
+def new_user(app_module):
+    """Create a user and return their id"""
+    def create(name: str = "Learner") -> int:
+        with app_module.SessionLocal() as db:
+            user = app_module.User(name=name, age=12, experience_level="Beginner", interests="[]")
+            db.add(user)
+            db.commit()
+            return user.id
+    return create
@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+CHUNKS = ['{"content": "', "Strong passwords ", "are long ", "and unique.", '"}']
+
+
+def test_late_joiner_gets_the_text_generated_before_it_joined(app_module, new_user, monkeypatch):
+    user_id = new_user()
+    course_id = next(iter(app_module.COURSES))
+
+    async def generate(course_info, age, experience_level, interests, on_text=None):
+        def stream():
+            # Like the Gemini stream: chunks arrive on a worker thread over time
+            for chunk in CHUNKS:
+                on_text(chunk)
+                time.sleep(0.02)
+        await asyncio.get_running_loop().run_in_executor(None, stream)
+        return {"content": "".join(CHUNKS[1:4])}, False
+
+    monkeypatch.setattr(app_module, "generate_course_with_ai", generate)
+
+    async def run():
+        # A pregeneration job starts the flight without listening; a streaming request joins it midway
+        job = asyncio.ensure_future(app_module.build_course_for_user(user_id, course_id, 12, "Beginner", []))
+        await asyncio.sleep(0.05)
+        received = []
+        content = await app_module.build_course_for_user(user_id, course_id, 12, "Beginner", [], on_text=received.append)
+        assert await job == content
+        return received
+
+    assert asyncio.run(run()) == CHUNKS
@@ -0,0 +1,19 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# SDKs that must only load on first use
+LAZY_MODULES = ["google.generativeai", "openai", "elevenlabs"]
+
+
+def test_importing_the_app_leaves_the_sdks_unloaded(tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'import.db'}")
+    env.pop("GEMINI_API_KEY", None)
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, app; print('loaded:', [m for m in {LAZY_MODULES!r} if m in sys.modules])"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-1] == "loaded: []"
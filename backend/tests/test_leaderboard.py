@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+
+@pytest.mark.parametrize("upsert_dialects", [("sqlite", "postgresql"), ()], ids=["on-conflict", "portable"])
+def test_concurrent_first_completions_are_both_counted(app_module, new_user, monkeypatch, upsert_dialects):
+    monkeypatch.setattr(app_module, "UPSERT_DIALECTS", upsert_dialects)
+    user_id = new_user()
+
+    async def complete(score: float):
+        async with app_module.AsyncSessionLocal() as db:
+            await app_module.record_leaderboard_completion(db, user_id, score)
+            await db.commit()
+
+    async def run():
+        await asyncio.gather(complete(80.0), complete(100.0))
+        async with app_module.AsyncSessionLocal() as db:
+            return (await db.execute(
+                select(app_module.LeaderboardEntry).where(app_module.LeaderboardEntry.user_id == user_id)
+            )).scalars().all()
+
+    entries = asyncio.run(run())
+    assert len(entries) == len(app_module.LEADERBOARD_WINDOWS)
+    for entry in entries:
+        assert entry.completed_courses == 2
+        assert entry.total_score == 180.0
+        assert entry.average_score == 90.0
+        assert entry.name == "Learner"
+
+
+def test_unknown_user_is_left_off_the_board(app_module):
+    async def run():
+        async with app_module.AsyncSessionLocal() as db:
+            await app_module.record_leaderboard_completion(db, 10 ** 9, 100.0)
+            await db.commit()
+            return (await db.execute(
+                select(app_module.LeaderboardEntry).where(app_module.LeaderboardEntry.user_id == 10 ** 9)
+            )).scalars().all()
+
+    assert asyncio.run(run()) == []
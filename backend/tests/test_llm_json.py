@@ -0,0 +1,36 @@
+import json
+
+from llm_json import extract_json, parse_course
+
+COURSE = {
+    "content": "<h2>Passwords</h2><p>Long passphrases beat short, complex passwords.</p>",
+    "exercises": [{"title": "Build a passphrase", "description": "Pick four random words."}],
+    "quiz": {"questions": [{"question": "Which is stronger?", "options": ["P@ss1", "correct horse battery staple"],
+                            "correct_answer": 1}]},
+}
+
+
+def test_chatter_braces_before_the_course_are_skipped():
+    text = f"Here is {{your}} course: {json.dumps(COURSE)} Enjoy!"
+    parsed = parse_course(text)
+    assert parsed.course == COURSE
+    assert parsed.missing == []
+
+
+def test_chatter_braces_before_a_truncated_course_are_skipped():
+    text = "Here is {your} course:\n```json\n" + json.dumps(COURSE)[:-40]
+    parsed = parse_course(text)
+    assert parsed.course["content"] == COURSE["content"]
+    assert parsed.missing == ["quiz"]
+
+
+def test_an_array_in_chatter_is_not_taken_for_the_course():
+    text = f"Step [1] of 1: {json.dumps(COURSE)}"
+    assert extract_json(text, dict).value == COURSE
+    assert extract_json(text).value == [1]
+
+
+def test_text_without_a_course_still_fails():
+    parsed = parse_course("Sorry, I can't write {that} course.")
+    assert parsed.course is None
+    assert parsed.problems
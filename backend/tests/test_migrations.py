@@ -0,0 +1,43 @@
+from sqlalchemy import create_engine, inspect, text
+
+
+def test_duplicate_progress_rows_are_merged_before_the_unique_index(app_module, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        # course_progress as older releases created it, without the (user_id, course_id) constraint
+        conn.execute(text(
+            "CREATE TABLE course_progress (id INTEGER PRIMARY KEY, user_id INTEGER, course_id VARCHAR, "
+            "completed BOOLEAN, score FLOAT, completion_date DATETIME, course_content TEXT, content_hash VARCHAR, "
+            "quiz_attempts INTEGER, best_quiz_score FLOAT)"
+        ))
+        conn.execute(text(
+            "INSERT INTO course_progress (id, user_id, course_id, completed, score, content_hash, quiz_attempts, best_quiz_score) "
+            "VALUES (1, 7, 'passwords', 0, 0, NULL, 1, 40), (2, 7, 'passwords', 1, 90, 'abc', 2, 90), "
+            "(3, 8, 'passwords', 0, 0, NULL, 0, 0)"
+        ))
+
+    app_module.add_course_progress_unique_index(engine)
+    app_module.add_course_progress_unique_index(engine)  # Already applied: nothing to do
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT id, user_id, completed, score, content_hash, quiz_attempts, best_quiz_score FROM course_progress ORDER BY id"
+        )).all()
+    assert rows == [(1, 7, 1, 90.0, "abc", 3, 90.0), (3, 8, 0, 0.0, None, 0, 0.0)]
+    indexes = inspect(engine).get_indexes("course_progress")
+    assert any(index["unique"] and index["column_names"] == ["user_id", "course_id"] for index in indexes)
+
+
+def test_inline_course_content_is_moved_out_and_never_loaded(app_module, new_user):
+    user_id = new_user()
+    with app_module.SessionLocal() as db:
+        db.add(app_module.CourseProgress(user_id=user_id, course_id="passwords", course_content='{"content": "old"}'))
+        db.commit()
+        # Progress scans leave the dead column out of the SELECT
+        assert "course_content" not in str(db.query(app_module.CourseProgress).statement.compile())
+
+    assert app_module.migrate_inline_course_content() >= 1
+    assert app_module.migrate_inline_course_content() == 0
+    with app_module.engine.connect() as conn:
+        left = conn.execute(text("SELECT course_content FROM course_progress WHERE user_id = :u"), {"u": user_id}).scalar()
+    assert left is None
@@ -0,0 +1,22 @@
+from phishing_detector import validate_email_safety
+
+
+def keywords(result):
+    return [finding["detail"] for finding in result["findings"] if finding["type"] == "keyword"]
+
+
+def test_ordinary_words_are_not_folded_into_keywords():
+    result = validate_email_safety("Let's learn modern warning signs in 2024, then review the homework.")
+    assert keywords(result) == []
+    assert not result["is_suspicious"]
+
+
+def test_keywords_match_regardless_of_case_and_width():
+    result = validate_email_safety("ＵＲＧＥＮＴ: Please VERIFY   your account today.")
+    assert "Contains suspicious keyword: 'urgent'" in keywords(result)
+    assert "Contains suspicious keyword: 'verify your account'" in keywords(result)
+
+
+def test_look_alike_domains_are_still_caught():
+    result = validate_email_safety("From: PayPal <security@paypa1.com>\nSubject: Hello\n\nSee you soon.")
+    assert any(finding["type"] == "lookalike_domain" for finding in result["findings"])
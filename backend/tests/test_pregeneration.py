@@ -0,0 +1,48 @@
+import asyncio
+from datetime import datetime, timedelta
+
+
+def add_job(app_module, user_id: int, status: str = "pending", started_at=None) -> int:
+    with app_module.SessionLocal() as db:
+        job = app_module.CourseGenerationJob(user_id=user_id, course_id=next(iter(app_module.COURSES)),
+                                             status=status, started_at=started_at)
+        db.add(job)
+        db.commit()
+        return job.id
+
+
+def job_status(app_module, job_id: int) -> str:
+    with app_module.SessionLocal() as db:
+        return db.get(app_module.CourseGenerationJob, job_id).status
+
+
+def test_a_job_enqueued_by_two_workers_runs_once(app_module, new_user, monkeypatch):
+    job_id = add_job(app_module, new_user())
+    builds = []
+
+    async def build(*args):
+        builds.append(args)
+        await asyncio.sleep(0.05)
+
+    monkeypatch.setattr(app_module, "build_course_for_user", build)
+
+    async def run():
+        await asyncio.gather(app_module.run_course_generation_job(job_id), app_module.run_course_generation_job(job_id))
+
+    asyncio.run(run())
+    assert len(builds) == 1
+    assert job_status(app_module, job_id) == "done"
+
+
+def test_startup_resets_only_stale_running_jobs(app_module, new_user, monkeypatch):
+    now = datetime.utcnow()
+    live = add_job(app_module, new_user(), "running", now)
+    stale = add_job(app_module, new_user(), "running", now - timedelta(seconds=app_module.PREGENERATION_STALE_SECONDS + 60))
+    enqueued = []
+    monkeypatch.setattr(app_module.pregeneration_queue, "start", lambda: None)
+    monkeypatch.setattr(app_module.pregeneration_queue, "enqueue", lambda job_id, priority: enqueued.append(job_id))
+
+    asyncio.run(app_module.start_pregeneration_workers())
+    assert job_status(app_module, live) == "running"
+    assert job_status(app_module, stale) == "pending"
+    assert stale in enqueued and live not in enqueued
@@ -0,0 +1,58 @@
+import os
+
+from starlette.testclient import TestClient
+
+import static_assets
+from static_assets import IMMUTABLE, REVALIDATE, AssetIndex, StaticAssets
+
+
+def write(path, body: bytes):
+    with open(path, "wb") as f:
+        f.write(body)
+
+
+def test_file_rewritten_in_place_gets_a_new_etag_and_length(tmp_path):
+    write(tmp_path / "robots.txt", b"User-agent: *\n")
+    client = TestClient(StaticAssets(str(tmp_path)))
+    first = client.get("/robots.txt")
+
+    modified = os.stat(tmp_path / "robots.txt").st_mtime_ns + 10**9
+    write(tmp_path / "robots.txt", b"User-agent: *\nDisallow: /api/\n")
+    os.utime(tmp_path / "robots.txt", ns=(modified, modified))
+    second = client.get("/robots.txt", headers={"if-none-match": first.headers["etag"]})
+
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
+    assert second.content == b"User-agent: *\nDisallow: /api/\n"
+    assert second.headers["content-length"] == str(len(second.content))
+
+
+def test_only_hashed_vite_assets_are_immutable(tmp_path):
+    write(tmp_path / "index-abcd1234.js", b"console.log(1)")
+    write(tmp_path / "index-template.html", b"<html></html>")
+
+    assets = TestClient(StaticAssets(str(tmp_path), hashed_names=True))
+    assert assets.get("/index-abcd1234.js").headers["cache-control"] == IMMUTABLE
+
+    static = TestClient(StaticAssets(str(tmp_path)))
+    assert static.get("/index-abcd1234.js").headers["cache-control"] == REVALIDATE
+    assert static.get("/index-template.html").headers["cache-control"] == REVALIDATE
+
+
+def test_mounts_share_one_index_built_on_the_first_request(tmp_path, monkeypatch):
+    os.mkdir(tmp_path / "assets")
+    write(tmp_path / "assets" / "index-abcd1234.js", b"console.log(1)")
+    write(tmp_path / "favicon.svg", b"<svg/>")
+    hashed = []
+    real_digest = static_assets.file_digest
+    monkeypatch.setattr(static_assets, "file_digest", lambda path: hashed.append(path) or real_digest(path))
+
+    index = AssetIndex(str(tmp_path))
+    assets = TestClient(StaticAssets(str(tmp_path / "assets"), hashed_names=True, index=index))
+    static = TestClient(StaticAssets(str(tmp_path), index=index))
+    assert hashed == []
+
+    assert assets.get("/index-abcd1234.js").headers["cache-control"] == IMMUTABLE
+    assert static.get("/assets/index-abcd1234.js").headers["cache-control"] == REVALIDATE
+    assert static.get("/favicon.svg").content == b"<svg/>"
+    assert len(hashed) == 2
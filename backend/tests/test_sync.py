@@ -0,0 +1,33 @@
+import asyncio
+
+
+def sync(app_module, user_id: int, submission_id: str, password: str):
+    batch = app_module.SyncBatch(user_id=user_id, submissions=[
+        app_module.SyncSubmission(submission_id=submission_id, type="exercise",
+                                  exercise={"type": "password", "answer": password})
+    ])
+
+    async def run():
+        async with app_module.AsyncSessionLocal() as db:
+            return await app_module.process_sync_batch(db, batch)
+
+    return asyncio.run(run())[0]
+
+
+def test_replay_returns_the_stored_result(app_module, new_user):
+    user_id = new_user()
+    first = sync(app_module, user_id, "device-1:1", "password")
+    replay = sync(app_module, user_id, "device-1:1", "Tr0ub4dor&3-horse-staple")
+    assert first["status"] == "processed"
+    assert replay["status"] == "replayed"
+    assert replay["result"] == first["result"]
+
+
+def test_submission_ids_are_scoped_to_their_user(app_module, new_user):
+    alice, bob = new_user("Alice"), new_user("Bob")
+    alices = sync(app_module, alice, "device-1:1", "password")
+    bobs = sync(app_module, bob, "device-1:1", "Tr0ub4dor&3-horse-staple")
+    # Bob's submission is graded on its own rather than treated as a replay of Alice's
+    assert bobs["status"] == "processed"
+    assert bobs["result"] != alices["result"]
+    assert sync(app_module, alice, "device-1:1", "anything")["result"] == alices["result"]
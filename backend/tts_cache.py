@@ -0,0 +1,183 @@
+"""
+TTS Cache - content-addressed on-disk cache for synthesized speech
+Keys audio by a hash of everything that shapes it and evicts least recently used files past a size budget
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio_cache")
+
+# <sha256>.<extension>, the only names the cache ever writes or serves
+ENTRY_NAME_RE = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]+)$")
+
+# Recency is persisted through mtime, but at most this often per file
+TOUCH_INTERVAL = 60.0
+
+
+def cache_key(text: str, voice_id: str, model_id: str, voice_settings: Dict[str, Any], output_format: str) -> str:
+    """Hash of every input that changes the audio"""
+    payload = json.dumps(
+        {"text": text, "voice_id": voice_id, "model_id": model_id, "voice_settings": voice_settings, "output_format": output_format},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def extension_for(output_format: str) -> str:
+    """File extension for an ElevenLabs output format such as mp3_22050_32"""
+    return output_format.split("_", 1)[0]
+
+
+class TTSCache:
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, max_bytes: int = 200 * 1024 * 1024):
+        """Audio files in one directory, indexed in memory from least to most recently used"""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # File name -> size
+        self._touched: Dict[str, float] = {}
+        self._bytes = 0
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        # Done on first use so importing the module stays cheap
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and ENTRY_NAME_RE.match(entry.name):
+                stat_result = entry.stat()
+                found.append((stat_result.st_mtime, entry.name, stat_result.st_size))
+            elif entry.name.endswith(".tmp") and time.time() - entry.stat().st_mtime > 3600:
+                os.unlink(entry.path)  # Left behind by a crash mid-write
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._bytes += size
+        self._loaded = True
+        self._evict()
+
+    def path_for(self, filename: str) -> Optional[str]:
+        """Path of a cached file by name, or None if the name isn't a cache entry"""
+        if not ENTRY_NAME_RE.match(filename):
+            return None
+        path = os.path.join(self.directory, filename)
+        return path if os.path.exists(path) else None
+
+    def get(self, key: str, output_format: str) -> Optional[str]:
+        """File name of the cached audio, marking it recently used"""
+        filename = f"{key}.{extension_for(output_format)}"
+        path = os.path.join(self.directory, filename)
+        now = time.monotonic()
+        with self._lock:
+            self._load()
+            size = self._entries.get(filename)
+            check = size is None or now - self._touched.get(filename, float("-inf")) > TOUCH_INTERVAL
+
+        if check:
+            # Another worker may have written or evicted the file; touching it also keeps the order across restarts
+            try:
+                os.utime(path)
+                size = os.path.getsize(path)
+            except OSError:
+                with self._lock:
+                    self._discard(filename)
+                    self.misses += 1
+                return None
+
+        with self._lock:
+            if filename not in self._entries:
+                self._entries[filename] = size
+                self._bytes += size
+            self._entries.move_to_end(filename)
+            if check:
+                self._touched[filename] = now
+            self.hits += 1
+        return filename
+
+    def store(self, key: str, output_format: str, chunks: Iterable[bytes]) -> str:
+        """Write audio chunks to the cache atomically and return the file name"""
+        filename = f"{key}.{extension_for(output_format)}"
+        path = os.path.join(self.directory, filename)
+        with self._lock:
+            self._load()
+
+        # Readers only ever see complete files: write beside the target, then rename over it
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        size = 0
+        try:
+            with open(temp_path, "wb") as f:
+                for chunk in chunks:
+                    if isinstance(chunk, bytes):
+                        f.write(chunk)
+                        size += len(chunk)
+            if not size:
+                raise ValueError("no audio received")
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        with self._lock:
+            self._discard(filename)
+            self._entries[filename] = size
+            self._bytes += size
+            self._evict()
+        return filename
+
+    def _discard(self, filename: str):
+        size = self._entries.pop(filename, None)
+        if size is not None:
+            self._bytes -= size
+        self._touched.pop(filename, None)
+
+    def _evict(self):
+        # Keep at least the newest file even if it alone is over budget
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            filename, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._touched.pop(filename, None)
+            try:
+                os.unlink(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Report size and hit ratio"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_tts_cache: Optional[TTSCache] = None
+_tts_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> TTSCache:
+    """Process-wide cache configured by TTS_CACHE_DIR and TTS_CACHE_MAX_MB"""
+    global _tts_cache
+    if _tts_cache is None:
+        with _tts_cache_lock:
+            if _tts_cache is None:
+                _tts_cache = TTSCache(
+                    directory=os.getenv("TTS_CACHE_DIR", DEFAULT_DIRECTORY),
+                    max_bytes=int(float(os.getenv("TTS_CACHE_MAX_MB", 200)) * 1024 * 1024)
+                )
+    return _tts_cache
@@ -0,0 +1,141 @@
+"""
+Voice Pack - Ayora's fallback lines recorded once, ahead of time
+Build with `cd backend && python voice_pack.py`; packed lines then play without any call to ElevenLabs
+"""
+
+import os
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from tts_cache import TTSCache, ENTRY_NAME_RE, extension_for
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "voice_pack")
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    """The pack's manifest, or an empty one if the pack hasn't been built"""
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get("version") == MANIFEST_VERSION else {}
+
+
+class VoicePack:
+    def __init__(self, directory: str = DEFAULT_DIRECTORY):
+        """Read-only audio files named like TTS cache entries, listed in the manifest"""
+        self.directory = directory
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None  # File name -> line it speaks
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        # Done on first use; a missing pack just means every line goes to live TTS
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    entries = read_manifest(self.directory).get("entries", {})
+                    self._entries = {name: entry for name, entry in entries.items()
+                                     if os.path.isfile(os.path.join(self.directory, name))}
+        return self._entries
+
+    def get(self, key: str, output_format: str) -> Optional[str]:
+        """File name of the packed audio for a TTS cache key, if the pack has it"""
+        filename = f"{key}.{extension_for(output_format)}"
+        return filename if filename in self._load() else None
+
+    def path_for(self, filename: str) -> Optional[str]:
+        """Path of a packed file by name, or None if the name isn't in the manifest"""
+        if filename not in self._load():
+            return None
+        return os.path.join(self.directory, filename)
+
+
+_voice_pack: Optional[VoicePack] = None
+_voice_pack_lock = threading.Lock()
+
+
+def get_voice_pack() -> VoicePack:
+    """Process-wide pack read from VOICE_PACK_DIR"""
+    global _voice_pack
+    if _voice_pack is None:
+        with _voice_pack_lock:
+            if _voice_pack is None:
+                _voice_pack = VoicePack(os.getenv("VOICE_PACK_DIR", DEFAULT_DIRECTORY))
+    return _voice_pack
+
+
+def pack_lines() -> List[Tuple[str, str]]:
+    """Every line Ayora speaks without OpenAI, with the context it belongs to"""
+    from ayora_voice import FALLBACK_SPEECH, DEFAULT_FALLBACK_SPEECH
+    lines = [(context.value, text) for context, text in FALLBACK_SPEECH.items()]
+    lines.append(("default", DEFAULT_FALLBACK_SPEECH))
+    return lines
+
+
+def build_pack(directory: str = DEFAULT_DIRECTORY, force: bool = False) -> Tuple[int, int]:
+    """Record every fallback line with the engine's voice, keeping audio that is still current
+
+    Returns how many lines were recorded and how many were already in the pack
+    """
+    import ayora_voice
+    engine = ayora_voice.ayora_voice
+    if not getattr(engine, "elevenlabs_client", None):
+        raise RuntimeError("ELEVENLABS_API_KEY is required to build the voice pack")
+
+    # Written through a cache with no size limit for its atomic, content-addressed file names
+    store = TTSCache(directory=directory, max_bytes=float("inf"))
+    entries: Dict[str, Dict[str, Any]] = {}
+    recorded = 0
+    for context, text in pack_lines():
+        # Named by cache key, so a change to the text or the voice settings records the line again
+        key = engine.audio_key(text)
+        filename = f"{key}.{extension_for(ayora_voice.TTS_OUTPUT_FORMAT)}"
+        path = os.path.join(directory, filename)
+        if force or not os.path.exists(path):
+            print(f"🎙️ Recording {context}: {text[:60]}")
+            audio = engine.elevenlabs_client.text_to_speech.stream(
+                text=text,
+                voice_id=engine.voice_id,
+                model_id=ayora_voice.TTS_MODEL_ID,
+                voice_settings=engine.voice_settings,
+                output_format=ayora_voice.TTS_OUTPUT_FORMAT
+            )
+            store.store(key, ayora_voice.TTS_OUTPUT_FORMAT, audio)
+            recorded += 1
+        entries[filename] = {"context": context, "text": text, "bytes": os.path.getsize(path)}
+
+    # Audio for lines that have since changed is no longer reachable
+    for name in os.listdir(directory):
+        if ENTRY_NAME_RE.match(name) and name not in entries:
+            os.unlink(os.path.join(directory, name))
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "voice_id": engine.voice_id,
+        "model_id": ayora_voice.TTS_MODEL_ID,
+        "voice_settings": engine.voice_settings_config,
+        "output_format": ayora_voice.TTS_OUTPUT_FORMAT,
+        "entries": entries
+    }
+    with open(os.path.join(directory, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write("\n")
+    return recorded, len(entries) - recorded
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Record Ayora's fallback lines into the voice pack")
+    parser.add_argument("--directory", default=os.getenv("VOICE_PACK_DIR", DEFAULT_DIRECTORY))
+    parser.add_argument("--force", action="store_true", help="record every line again")
+    args = parser.parse_args()
+
+    recorded, kept = build_pack(args.directory, force=args.force)
+    print(f"✅ Built {args.directory}: {recorded} lines recorded, {kept} already current")
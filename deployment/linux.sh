@@ -191,14 +191,16 @@ mkdir -p backend/static
 cp -r frontend/dist/* backend/static/
 print_success "Frontend files copied to backend/static"
 
+# Precompress assets so the server can send .br/.gz files directly
+(cd backend && $PYTHON_CMD static_assets.py static)
+
+# Compile the common-password filter now rather than on the first password check
+(cd backend && $PYTHON_CMD password_strength.py)
+
 # Create database
 print_status "🗄️  Initializing database..."
 cd backend
-$PYTHON_CMD -c "
-from app import Base, engine
-Base.metadata.create_all(bind=engine)
-print('Database initialized successfully')
-"
+$PYTHON_CMD migrate.py
 
 if [ $? -eq 0 ]; then
     print_success "Database initialized"
@@ -364,6 +366,12 @@ if [ -f "package.json" ]; then
     mkdir -p backend/static
     cp -r frontend/dist/* backend/static/
     print_success "Frontend files copied to backend/static"
+
+    # Precompress assets so the server can send .br/.gz files directly
+    (cd backend && $PYTHON_CMD static_assets.py static)
+
+    # Compile the common-password filter now rather than on the first password check
+    (cd backend && $PYTHON_CMD password_strength.py)
 else
     print_error "package.json not found!"
     exit 1
@@ -372,6 +380,14 @@ fi
 # Go back to project root
 cd backend
 
+# Bring the database schema up to date
+print_status "🗄️  Migrating database..."
+if $PYTHON_CMD migrate.py; then
+    print_success "Database migrated"
+else
+    print_warning "Database migration had issues"
+fi
+
 # Check environment configuration
 print_status "Checking environment configuration..."
 if [ -f ".env" ]; then
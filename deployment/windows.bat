@@ -183,10 +183,20 @@ mkdir "backend\static"
 xcopy "frontend\dist\*" "backend\static\" /s /e /y >nul
 echo [SUCCESS] Frontend files copied to backend\static
 
+rem Precompress assets so the server can send .br/.gz files directly
+cd backend
+%PYTHON_CMD% static_assets.py static
+cd ..
+
+rem Compile the common-password filter now rather than on the first password check
+cd backend
+%PYTHON_CMD% password_strength.py
+cd ..
+
 rem Create database
 echo [INFO] 🗄️  Initializing database...
 cd backend
-%PYTHON_CMD% -c "from app import Base, engine; Base.metadata.create_all(bind=engine); print('Database initialized successfully')"
+%PYTHON_CMD% migrate.py
 
 if errorlevel 1 (
     echo [WARNING] Database initialization had issues (may already exist)
@@ -15,6 +15,7 @@ interface AyoraSpeechData {
   context: string;
   estimated_duration: number;
   audio_filename?: string;
+  audio_url?: string; // Plays while it is still being synthesized
   error?: string;
 }
 
@@ -100,11 +101,14 @@ const AyoraCompanion: React.FC<AyoraCompanionProps> = ({
     });
   }, [handleAnimationChange]);
 
-  const playAudio = useCallback((audioFilename: string) => {
-    if (!audioFilename) return;
+  const audioUrlFor = (data: AyoraSpeechData): string | null => {
+    if (data.audio_url) return data.audio_url;
+    return data.audio_filename ? `/Audio/${data.audio_filename}` : null;
+  };
+
+  const playAudio = useCallback((audioUrl: string) => {
+    if (!audioUrl) return;
 
-    const audioUrl = `/Audio/${audioFilename}`;
-    
     if (audioRef.current) {
       audioRef.current.pause();
     }
@@ -116,7 +120,8 @@ const AyoraCompanion: React.FC<AyoraCompanionProps> = ({
       console.log('🎵 Audio loading started');
     });
 
-    audio.addEventListener('canplaythrough', () => {
+    // Start as soon as the first audio arrives instead of waiting for the whole stream
+    audio.addEventListener('canplay', () => {
       console.log('🎵 Audio ready to play');
       setIsPlaying(true);
       if (onSpeechStart) onSpeechStart();
@@ -124,7 +129,7 @@ const AyoraCompanion: React.FC<AyoraCompanionProps> = ({
         console.error('Audio play failed:', err);
         setAudioError('Failed to play audio');
       });
-    });
+    }, { once: true });
 
     audio.addEventListener('ended', () => {
       console.log('🎵 Audio ended');
@@ -150,7 +155,9 @@ const AyoraCompanion: React.FC<AyoraCompanionProps> = ({
     try {
       console.log('🚀 Starting Ayora landing introduction...');
       
-      const response = await api.post('/api/ayora/landing-introduction');
+      const response = await api.post('/api/ayora/landing-introduction', null, {
+        params: { stream_audio: true }
+      });
       const data: AyoraSpeechData = response.data;
       
       if (!data.success) {
@@ -166,9 +173,10 @@ const AyoraCompanion: React.FC<AyoraCompanionProps> = ({
       executeAnimationSequence(data.animation_sequence, data.estimated_duration);
 
       // Play audio if available
-      if (data.audio_filename) {
+      const audioUrl = audioUrlFor(data);
+      if (audioUrl) {
         setTimeout(() => {
-          playAudio(data.audio_filename!);
+          playAudio(audioUrl);
         }, 3000); // Start audio after waving animation (3 seconds)
       } else {
         console.log('📢 No audio file generated, showing text only');
@@ -187,7 +195,8 @@ const AyoraCompanion: React.FC<AyoraCompanionProps> = ({
       const response = await api.post('/api/ayora/contextual-speech', {
         context,
         context_data: contextData,
-        trigger_animations: true
+        trigger_animations: true,
+        stream_audio: true
       });
       
       const data: AyoraSpeechData = response.data;
@@ -205,8 +214,9 @@ const AyoraCompanion: React.FC<AyoraCompanionProps> = ({
       executeAnimationSequence(data.animation_sequence, data.estimated_duration);
 
       // Play audio if available
-      if (data.audio_filename) {
-        playAudio(data.audio_filename);
+      const audioUrl = audioUrlFor(data);
+      if (audioUrl) {
+        playAudio(audioUrl);
       }
 
     } catch (error) {
@@ -8,7 +8,7 @@ export const api = axios.create({
 
 // User API
 export const userAPI = {
-  createUser: async (userData: { name: string; age: number; experience_level: string; interests: string[] }) => {
+  createUser: async (userData: { name: string; age: number; experience_level: string; interests: string[]; cohort?: string }) => {
     const response = await api.post('/api/users', userData);
     return response.data;
   },
@@ -41,10 +41,51 @@ export const courseAPI = {
     return response.data;
   },
 
+  // Streams the lesson text as it is generated, then the exercises and quiz
+  streamCourseContent: (
+    userId: number,
+    courseId: string,
+    handlers: {
+      onContent: (text: string) => void;
+      onExercises: (exercises: any[]) => void;
+      onQuiz: (quiz: any) => void;
+      onDone?: () => void;
+      onError?: (detail: string) => void;
+    }
+  ) => {
+    const params = new URLSearchParams({ user_id: String(userId), course_id: courseId });
+    const source = new EventSource(`${API_BASE_URL}/api/courses/generate/stream?${params}`);
+    let text = '';
+
+    source.addEventListener('content', (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      text = data.replace !== undefined ? data.replace : text + data.delta;
+      handlers.onContent(text);
+    });
+    source.addEventListener('exercises', (event) => handlers.onExercises(JSON.parse((event as MessageEvent).data)));
+    source.addEventListener('quiz', (event) => handlers.onQuiz(JSON.parse((event as MessageEvent).data)));
+    source.addEventListener('done', () => {
+      source.close();
+      handlers.onDone?.();
+    });
+    source.addEventListener('error', (event) => {
+      source.close();
+      const data = (event as MessageEvent).data;
+      handlers.onError?.(data ? JSON.parse(data).detail : 'Connection lost');
+    });
+
+    return () => source.close();
+  },
+
   submitQuiz: async (userId: number, courseId: string, answers: Record<string, any>) => {
     const response = await api.post('/api/courses/submit-quiz', { user_id: userId, course_id: courseId, answers });
     return response.data;
   },
+
+  getQuizAttempts: async (userId: number, params: { course_id?: string; limit?: number; cursor?: number } = {}) => {
+    const response = await api.get(`/api/users/${userId}/quiz-attempts`, { params });
+    return response.data;
+  },
 };
 
 // Exercise API
@@ -55,10 +96,38 @@ export const exerciseAPI = {
   },
 };
 
+// Offline sync API
+export interface SyncSubmission {
+  submission_id: string;
+  type: 'quiz' | 'exercise';
+  course_id?: string;
+  answers?: Record<string, any>;
+  exercise?: { type: string; answer: string };
+}
+
+export const syncAPI = {
+  // Replays queued submissions in one request; resending an id returns its original result
+  syncSubmissions: async (userId: number, submissions: SyncSubmission[]) => {
+    const response = await api.post('/api/sync/submissions', { user_id: userId, submissions });
+    return response.data;
+  },
+};
+
 // Leaderboard API
+export interface LeaderboardParams {
+  window?: 'all' | 'week' | 'month';
+  experience_level?: string;
+  cohort?: string;
+}
+
 export const leaderboardAPI = {
-  getLeaderboard: async () => {
-    const response = await api.get('/api/leaderboard');
+  getLeaderboard: async (params: LeaderboardParams & { limit?: number; cursor?: string } = {}) => {
+    const response = await api.get('/api/leaderboard', { params });
+    return response.data;
+  },
+
+  getUserRank: async (userId: number, params: LeaderboardParams & { neighbours?: number } = {}) => {
+    const response = await api.get(`/api/leaderboard/users/${userId}`, { params });
     return response.data;
   },
 };
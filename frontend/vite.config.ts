@@ -16,6 +16,10 @@ export default defineConfig({
         target: 'http://localhost:8000',
         changeOrigin: true,
       },
+      '/Audio': {
+        target: 'http://localhost:8000',
+        changeOrigin: true,
+      },
     },
   },
 })